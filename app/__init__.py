@@ -6,6 +6,7 @@ from flask import Flask, got_request_exception
 from flask_alembic import Alembic
 from flask_sqlalchemy_lite import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
+from werkzeug.exceptions import RequestEntityTooLarge
 
 from app.lib.util.lenient import lenient_wrap
 from app.lib.util.security import MissingCSRFToken
@@ -38,28 +39,46 @@ def create_app(test_mode: bool = False):
         SESSION_COOKIE_SAMESITE="Lax",
     )
 
+    # The only uploads are history imports (see `views.settings.import_history`), anything bigger is refused unread
+    app.config.setdefault("MAX_CONTENT_LENGTH", 16 * 1024 * 1024)
+
     # Initialise database
-    app.config["SQLALCHEMY_ENGINES"] = {"default": "sqlite:////home/app/log-my-time/db/time.db"}
+    from app.lib.events import worker_threads
+
+    database = "sqlite:////home/app/log-my-time/db/time.db"
 
     if test_mode or os.getenv("TEST_MODE") == "yes":
         app.testing = True
-        app.config["SQLALCHEMY_ENGINES"] = {"default": "sqlite:////home/app/log-my-time/db/time.test.db"}
+        database = "sqlite:////home/app/log-my-time/db/time.test.db"
+
+    # One connection for every request thread, see `app.lib.events`
+    app.config["SQLALCHEMY_ENGINES"] = {"default": {"url": database, "pool_size": worker_threads(app.config)}}
 
     db.init_app(app)
     alembic.init_app(app)
 
+    with app.app_context():
+        from app.lib.sqlite import enable_sqlite_pragmas
+
+        enable_sqlite_pragmas(app, db)
+
     app.jinja_env.add_extension("jinja2.ext.do")
     app.jinja_env.add_extension("jinja2.ext.loopcontrols")
     app.jinja_env.add_extension("jinja2.ext.debug")
     app.jinja_env.globals["lenient_wrap"] = lenient_wrap
 
     with app.app_context():
-        from app.cli import data
+        from app.cli import data, email
+        from app.lib.cache import enable_cache_invalidation
+        from app.lib.timing import enable_timing
         from app.lib.util.security import enable_csrf_protection
-        from app.views import callback, core, holidays, leave, settings, time, user
+        from app.views import callback, core, holidays, leave, reports, settings, time, user
 
         init_rollbar(app)
+        # Before anything else that runs before requests, so it's timed too
+        enable_timing(app, db)
         enable_csrf_protection(app)
+        enable_cache_invalidation(app)
 
         app.register_blueprint(time.v)
         app.register_blueprint(leave.v)
@@ -67,14 +86,18 @@ def create_app(test_mode: bool = False):
         app.register_blueprint(user.v)
         app.register_blueprint(core.v)
         app.register_blueprint(data.v)
+        app.register_blueprint(email.v)
         app.register_blueprint(callback.v)
 
         app.register_blueprint(holidays.v)
+        app.register_blueprint(reports.v)
 
         add_error_handlers(app)
         add_globals(app)
         add_jinja_filters(app)
 
+        warm_holiday_calendars(app)
+
     return app
 
 
@@ -110,6 +133,21 @@ def init_rollbar(app):
     rollbar.events.add_payload_handler(inject_user_to_rollbar_payload)
 
 
+def warm_holiday_calendars(app):
+    """
+    Build the holiday calendars for last year to next year so the first requests don't have to
+    """
+    import datetime
+
+    from app.lib import holiday_calendar
+
+    if app.testing:
+        return
+
+    year = datetime.date.today().year
+    holiday_calendar.warm(range(year - 1, year + 2))
+
+
 def add_error_handlers(app):
     @app.errorhandler(MissingCSRFToken)
     def handle_missing_csrf_token(e):
@@ -121,6 +159,13 @@ def add_error_handlers(app):
         response.headers["X-Dynamic-Frame-Page-Redirect"] = "/login"
         return response
 
+    @app.errorhandler(RequestEntityTooLarge)
+    def handle_request_too_large(e):
+        from flask import flash, redirect
+
+        flash(f"Uploads can be at most {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)}MB.", "danger")
+        return redirect("/settings/account")
+
 
 def add_globals(app):
     # Inject some values into ALL templates
@@ -135,13 +180,15 @@ def add_globals(app):
         from app.lib.util.date import humanize_seconds
         from app.lib.util.security import get_csrf_token
 
+        logged_in = is_logged_in()
+
         globals = {
             "theme": "light",
             "arrow": arrow,
             "humanize_seconds": humanize_seconds,
-            "is_logged_in": is_logged_in(),
-            "is_admin": is_logged_in() and is_admin(),
-            "unseen_whats_new": is_logged_in() and unseen_whats_new(),
+            "is_logged_in": logged_in,
+            "is_admin": logged_in and is_admin(),
+            "unseen_whats_new": logged_in and unseen_whats_new(),
             "settings": None,
             "host": app.config["HOST"],
             "csrf_token": get_csrf_token,
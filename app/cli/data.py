@@ -20,3 +20,132 @@ def seed_test_db():
     test_user.verify()
 
     click.echo("Completed database seeding.")
+
+
+@v.cli.command("import")
+@click.argument("email")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(["json", "ndjson", "csv"]), help="Defaults to the extension")
+def import_history(email: str, path: str, file_format: str | None):
+    """
+    Imports time, break and leave records for a user from an export or CSV file
+    Files ending in .gz are decompressed
+    """
+    import gzip
+
+    import sqlalchemy as sa
+
+    from app import db
+    from app.controllers.user.importer import InvalidImport, import_data
+    from app.models import User
+
+    user = db.session.scalars(sa.select(User).filter_by(email=email)).first()
+    if not user:
+        raise click.ClickException(f"No user with email {email}")
+
+    name = path.removesuffix(".gz")
+    file_format = file_format or name.rsplit(".", 1)[-1]
+
+    click.echo(f"Importing {path} for {email}...")
+
+    with gzip.open(path, "rt") if path.endswith(".gz") else open(path) as f:
+        try:
+            result = import_data(user, f, file_format)
+        except InvalidImport as e:
+            raise click.ClickException("\n".join(e.errors))
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+    click.echo(
+        f"Imported {result.time} time, {result.breaks} break and {result.leave} leave records "
+        f"in {result.seconds:.2f}s ({result.rows_per_second:.0f} rows/s)."
+    )
+
+
+@v.cli.command("holiday-leave")
+@click.option("--year", type=int, help="Defaults to the current year")
+@click.option("--include-past", is_flag=True, help="Also add holidays earlier in the year than today")
+def holiday_leave(year: int | None, include_past: bool):
+    """
+    Adds public holiday leave for every user with a holiday location
+    Safe to run repeatedly, eg. daily from cron with `flask data holiday-leave`
+    """
+    import datetime
+
+    from app.controllers.holidays import generate_public_holiday_leave
+
+    today = datetime.date.today()
+    year = year or today.year
+    since = datetime.date(year, 1, 1) if include_past else today
+
+    click.echo(f"Adding public holiday leave for {year}...")
+    added = generate_public_holiday_leave(year, since)
+    click.echo(f"Added {added} public holidays.")
+
+
+@v.cli.command("rebuild-totals")
+@click.argument("email", required=False)
+def rebuild_totals(email: str | None):
+    """
+    Rebuilds the daily totals for a user, or every user if no email is given
+    Needed to backfill the totals, otherwise they're rebuilt as needed
+    """
+    import sqlalchemy as sa
+    from sqlalchemy.orm import selectinload
+
+    from app import db
+    from app.controllers import daily_totals
+    from app.models import Settings, User
+
+    query = sa.select(User).options(selectinload(User.settings))
+    if email:
+        query = query.filter(User.email == email)
+
+    users = db.session.scalars(query).all()
+    if email and not users:
+        raise click.ClickException(f"No user with email {email}")
+
+    for user in users:
+        days = daily_totals.rebuild(user.settings or Settings.default(user.id))
+        click.echo(f"Rebuilt {days} days for {user.email}.")
+
+
+@v.cli.command("optimize")
+@click.option("--analyze", is_flag=True, help="Run a full ANALYZE rather than PRAGMA optimize")
+def optimize_database(analyze: bool):
+    """
+    Checkpoints and truncates the SQLite WAL and updates the query planner statistics
+    Can be run periodically, eg. daily from cron
+    """
+    from app import db
+    from app.lib.sqlite import optimize
+
+    busy, wal_pages, checkpointed = optimize(db.engine, analyze=analyze)
+
+    if busy:
+        click.echo(f"Checkpoint was blocked by another connection, {checkpointed} of {wal_pages} pages checkpointed.")
+    else:
+        click.echo(f"Checkpointed {checkpointed} pages.")
+
+
+@v.cli.command("sweep-sessions")
+def sweep_sessions():
+    """
+    Removes expired login sessions from the session store
+    Can be run periodically, eg. daily from cron
+    """
+    from app.lib.session_store import session_store
+
+    removed = session_store().sweep()
+    click.echo(f"Removed {removed} expired sessions.")
+
+
+@v.cli.command("migrate-sessions")
+def migrate_sessions():
+    """
+    Copies every unexpired login session from the database into redis, see `app.lib.session_store`
+    """
+    from app.lib.session_store import migrate_to_redis
+
+    copied = migrate_to_redis()
+    click.echo(f"Copied {copied} sessions to redis.")
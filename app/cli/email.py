@@ -0,0 +1,41 @@
+import click
+from flask import Blueprint
+
+v = Blueprint("email", __name__)
+
+
+@v.cli.command("drain")
+def drain():
+    """
+    Sends everything that is due in the email outbox
+    """
+    from app.lib.email import drain_outbox
+
+    click.echo("Draining email outbox...")
+
+    total = 0
+    while attempted := drain_outbox():
+        total += attempted
+
+    click.echo(f"Attempted {total} emails.")
+
+
+@v.cli.command("retry-failed")
+def retry_failed():
+    """
+    Moves any emails that were given up on back into the outbox
+    """
+    import arrow
+    import sqlalchemy as sa
+
+    from app import db
+    from app.models import OutboxEmail
+
+    result = db.session.execute(
+        sa.update(OutboxEmail)
+        .where(OutboxEmail.status == "failed")
+        .values(status="pending", attempts=0, next_attempt_at=arrow.utcnow().int_timestamp)
+    )
+    db.session.commit()
+
+    click.echo(f"Requeued {result.rowcount} emails.")  # type: ignore[attr-defined]
@@ -1,3 +1,4 @@
+from datetime import date, timedelta
 from typing import Optional
 
 import arrow
@@ -6,9 +7,11 @@ import sqlalchemy as sa
 from app import db
 from app.controllers import settings
 from app.controllers.user.util import get_user
+from app.lib.cache import cache
+from app.lib.util.week import Range, current_week_key, resolve_day, resolve_week, week_key, weeks_between
 from app.models import Break, Leave, Time, WhatsNew
 from app.types import DayOfWeek0Indexed, TimeInSeconds
-from app.viewmodels import TimeStats
+from app.viewmodels import DashboardSnapshot, TimeStats
 
 
 def _get_first_record_time() -> int | None:
@@ -31,6 +34,8 @@ def _get_first_record_time() -> int | None:
 
 
 # TODO: Need to break this out into smaller functions
+# Stats are displayed to the minute so they can be cached until the minute changes
+@cache.cached("stats", ttl=60, key=lambda: arrow.utcnow().int_timestamp // 60, per_user=True)
 def stats() -> TimeStats:
     """Return the weekly stats"""
     from app.lib.util.date import humanize_seconds
@@ -39,24 +44,32 @@ def stats() -> TimeStats:
     _tz = _settings.timezone
 
     now = arrow.now(tz=_tz)
-    today_start = now.replace(hour=0, minute=0, second=0)
-    today_end = now.replace(hour=23, minute=59, second=59)
+    today = resolve_day(now.date(), _tz)
+    today_start = arrow.get(today.start).to(_tz)
+    today_end = arrow.get(today.end - 1).to(_tz)
 
     # Set the start point to the first working day of the current week
-    if now.weekday() != _settings.week_start_0:
-        week_start = today_start.shift(weekday=_settings.week_start_0).shift(days=-7)
-    else:
-        week_start = today_start
+    week_start = arrow.get(resolve_week(None, _settings.week_start_0, _tz, now.date()).start).to(_tz)
 
     # Time logged
-    entries_today = [
-        *Time.between(today_start.int_timestamp, today_end.int_timestamp),
-        *Leave.between(today_start.int_timestamp, today_end.int_timestamp),
-    ]
-    logged_today = sum([rec.logged() for rec in entries_today])
-
-    entries_this_week = [*Time.since(week_start.int_timestamp), *Leave.since(week_start.int_timestamp)]
-    logged_this_week = sum([rec.logged() for rec in entries_this_week])
+    # Earlier days this week come from the daily totals so only today onwards needs loading
+    from app.controllers import daily_totals
+
+    logged_earlier_this_week = 0
+    if week_start < today_start:
+        logged_earlier_this_week = daily_totals.between(
+            _settings, week_start.date(), today_start.shift(days=-1).date()
+        ).logged
+
+    entries_from_today = [*Time.since(today_start.int_timestamp), *Leave.since(today_start.int_timestamp)]
+    logged_today = sum([rec.logged() for rec in entries_from_today if rec.start <= today_end.int_timestamp])
+    logged_this_week = logged_earlier_this_week + sum([rec.logged() for rec in entries_from_today])
+
+    # Clocked in and not on a break, so the time logged goes up by the second
+    running = any(
+        isinstance(rec, Time) and rec.end is None and all(brk.end is not None for brk in rec.breaks)
+        for rec in entries_from_today
+    )
 
     # Time to do
     current_day = now.format("dddd")
@@ -79,28 +92,12 @@ def stats() -> TimeStats:
         remaining_this_week = 0
 
     # Overtime (all time)
-    # TODO: This is a little inefficient as it must go through all records from the beginning
-    # It would probably be better to save the overtime each week in a background task
-    # Though this is nice and simple
+    # Earlier days come from the daily totals, today is counted from the records loaded above
     overtime = 0
 
-    if first_time := _get_first_record_time():
-        from app.lib.util.date import calculate_expected_hours
-
-        first_day = arrow.get(first_time).to(_tz)
-        expected_hours = calculate_expected_hours(
-            start=first_day,
-            end=today_end,
-            hours_per_day=_settings.hours_per_day,
-            days_worked=_settings.work_days,
-        )
-
-        # First take off the time we _should_ have worked
-        overtime = -(expected_hours * 60 * 60)  # Convert to seconds
-
-        # Now add on what we have worked/taken as leave
-        overtime += sum([rec.logged() for rec in Time.between(0, today_end.int_timestamp)])
-        overtime += sum([rec.logged() for rec in Leave.between(0, today_end.int_timestamp)])
+    if _get_first_record_time():
+        before_today = daily_totals.between(_settings, date.min, today_start.shift(days=-1).date())
+        overtime = int(before_today.logged + logged_today - (before_today.expected + todo_today))
 
     # Calculate estimated finish time
     estimated_finish_time = "N/A"
@@ -114,19 +111,7 @@ def stats() -> TimeStats:
         ).all()
 
         breaks_taken_today = sum(b.duration for b in breaks_taken_today)
-        expected_break_duration_today = _average_break_duration_for_day(now, now.weekday())
-        expected_break_duration_today -= breaks_taken_today
-
-        # We've already taken our expected breaks today
-        # We ignore expected breaks shorter than 5 minutes
-        if expected_break_duration_today < 300:
-            expected_break_duration_today = 0
-
-        # Round expected breaks to nearest 5 minutes
-        if expected_break_duration_today > 0:
-            expected_break_duration_today_mins = expected_break_duration_today / 60
-            expected_break_duration_today_mins = 5 * round(expected_break_duration_today_mins / 5)
-            expected_break_duration_today = expected_break_duration_today_mins * 60
+        expected_break_duration_today = _expected_break_duration(break_profile(now)[now.weekday()] - breaks_taken_today)
 
         time_left_with_breaks = remaining_today + expected_break_duration_today
 
@@ -142,12 +127,102 @@ def stats() -> TimeStats:
         remaining_today=humanize_seconds(remaining_today, short=True),
         overtime=humanize_seconds(overtime, short=True),
         estimated_finish_time=estimated_finish_time,
+        running=running,
+        as_of=now.int_timestamp,
+        day_ends=today.end,
+        seconds={
+            "logged_this_week": int(logged_this_week),
+            "logged_today": int(logged_today),
+            "remaining_this_week": int(remaining_this_week),
+            "remaining_today": int(remaining_today),
+            "overtime": int(overtime),
+        },
     )
 
 
-def week_list() -> list[str]:
+# How many weeks the week picker shows before loading more
+WEEK_LIST_PAGE_SIZE = 52
+
+
+def week_range(week: Optional[str] = None) -> Range:
     """
-    Returns a list of weeks since the first record in the format ${year}-W${week}, eg. 2022-W25
+    Returns the bounds of a week in the user's timezone, defaults to the current week
+
+    Week should be in the format ${YEAR}-W${WEEK_NUMBER}, eg 2022-W25
+    """
+    _settings = settings.fetch()
+    return resolve_week(week, _settings.week_start_0, _settings.timezone, arrow.now(_settings.timezone).date())
+
+
+def records_for_week(week: Optional[str] = None) -> list[Time | Leave]:
+    """
+    Return all time and leave records for the given week, most recent first
+
+    Each is a single indexed query on `(user_id, start)`, with the breaks for all the time records loaded in one more
+    """
+    from sqlalchemy.orm import selectinload
+
+    _range = week_range(week)
+    user = get_user()
+
+    def in_week(model):
+        return model.user_id == user.id, model.start >= _range.start, model.start < _range.end
+
+    times = db.session.scalars(sa.select(Time).options(selectinload(Time.breaks)).filter(*in_week(Time))).all()
+    leaves = db.session.scalars(sa.select(Leave).filter(*in_week(Leave))).all()
+
+    return sorted([*times, *leaves], key=lambda rec: (rec.start, rec.id), reverse=True)
+
+
+def dashboard(week: Optional[str] = None) -> DashboardSnapshot:
+    """
+    Returns everything the dashboard shows, the clock state, the stats and the records for `week`
+
+    When viewing the current week the clock state comes from its records rather than separate queries
+    """
+    records = records_for_week(week)
+
+    current = None
+    if not week or week == _current_week_key():
+        current = next((rec for rec in records if isinstance(rec, Time) and rec.end is None), None)
+
+    if current:
+        on_break = any(brk.end is None for brk in current.breaks)
+    else:
+        from app.controllers import time
+
+        current = time.current()
+        on_break = current is not None and time.current_break() is not None
+
+    return DashboardSnapshot(
+        clocked_in=current is not None,
+        on_break=on_break,
+        stats=stats(),
+        records=records,
+    )
+
+
+def _current_week_key() -> str:
+    _settings = settings.fetch()
+    return current_week_key(_settings.week_start_0, arrow.now(_settings.timezone).date())
+
+
+def weeks_ago(week: str) -> int:
+    """
+    Returns how many weeks before the current week `week` is
+    """
+    return weeks_between(week, _current_week_key())
+
+
+@cache.cached(
+    "week_list",
+    ttl=24 * 60 * 60,
+    key=lambda: f"{settings.fetch().week_start}:{_current_week_key()}",
+    per_user=True,
+)
+def _all_weeks() -> list[str]:
+    """
+    Returns every week from the current week back to the week of the first record
     """
     _settings = settings.fetch()
     _tz = _settings.timezone
@@ -157,20 +232,73 @@ def week_list() -> list[str]:
     if not first_time:
         return []
 
-    first = arrow.get(first_time)
-    now = arrow.now(tz=_tz)
-
     # Adjust the starting day to the first working day of the week
-    while first.weekday() > _settings.week_start_0:
-        first = first.shift(days=-1)
+    first = arrow.get(first_time).to(_tz).date()
+    first -= timedelta(days=max(first.weekday() - _settings.week_start_0, 0))
+
+    # Step back a week at a time from the last of those days up to today
+    today = arrow.now(tz=_tz).date()
+    last = first + timedelta(weeks=(today - first).days // 7)
+
+    return [week_key(date.fromordinal(day)) for day in range(last.toordinal(), first.toordinal() - 1, -7)]
 
-    # Go through each week since the first time record until now
-    weeks = []
-    while first.date() <= now.date():
-        weeks.append(first.format("W").rsplit("-", 1)[0])
-        first = first.shift(weeks=1)
 
-    return list(reversed(weeks))
+@cache.cached(
+    "weeks_with_data",
+    ttl=24 * 60 * 60,
+    key=lambda: f"{settings.fetch().week_start}:{_current_week_key()}",
+    per_user=True,
+)
+def _weeks_with_data() -> list[str]:
+    """
+    Returns the current week and every earlier week with any time or leave logged
+    """
+    from app.controllers import daily_totals
+    from app.models import DailyTotal
+
+    _settings = settings.fetch()
+    today = arrow.now(_settings.timezone).date()
+
+    # Let the database bucket the stored days by the first day of their week, %w is 0 for Sunday
+    days_into_week = (
+        sa.cast(sa.func.strftime("%w", DailyTotal.local_date), sa.Integer) + 6 - _settings.week_start_0
+    ) % 7
+    week_start = sa.func.date(DailyTotal.local_date, sa.func.printf("-%d days", days_into_week))
+
+    last = daily_totals.stored_until(_settings, today)
+    week_starts = {
+        date.fromisoformat(week)
+        for week in db.session.scalars(
+            sa.select(week_start)
+            .filter(DailyTotal.user_id == _settings.user_id, (DailyTotal.worked > 0) | (DailyTotal.leave > 0))
+            .distinct()
+        )
+    }
+
+    for day, totals in daily_totals.unstored_days(_settings, date.min, today, last).items():
+        if totals.logged > 0:
+            week_starts.add(day - timedelta(days=(day.weekday() - _settings.week_start_0) % 7))
+
+    # `resolve_week()` shows the week before the one asked for when the week starts later in the week than today
+    if _settings.week_start_0 > today.weekday():
+        week_starts = {week + timedelta(weeks=1) for week in week_starts}
+
+    # Week keys sort in date order
+    current_week = _current_week_key()
+    weeks = {week_key(week) for week in week_starts} | {current_week}
+    return sorted((week for week in weeks if week <= current_week), reverse=True)
+
+
+def week_list(offset: int = 0, limit: Optional[int] = None, with_data_only: bool = False) -> list[str]:
+    """
+    Returns a list of weeks since the first record in the format ${year}-W${week}, eg. 2022-W25
+    Most recent first, starting with the current week
+
+    `offset` / `limit`: Return a page of the weeks
+    `with_data_only`: Skip weeks with nothing logged, the current week is always included
+    """
+    weeks = _weeks_with_data() if with_data_only else _all_weeks()
+    return weeks[offset : offset + limit if limit else None]
 
 
 def whats_new(limit: Optional[int] = None) -> list[WhatsNew]:
@@ -191,35 +319,73 @@ def whats_new(limit: Optional[int] = None) -> list[WhatsNew]:
     return new
 
 
-def _average_break_duration_for_day(now: arrow.Arrow, day: DayOfWeek0Indexed) -> TimeInSeconds:
+def break_profile(now: arrow.Arrow, weeks: Optional[int] = None) -> dict[DayOfWeek0Indexed, TimeInSeconds]:
     """
-    Get the average total break duration for a given day over the last 5 weeks
+    Get the average total break duration for each day of the week over the last few weeks
+    Days without any breaks are left out of the average
+
+    `now`: The current time in the user's timezone
+    `weeks`: How many weeks to look back over, defaults to `BREAK_PROFILE_WEEKS` or 5
     """
-    break_durations = []
+    from flask import current_app as app
+
+    weeks = weeks or app.config.get("BREAK_PROFILE_WEEKS", 5)
+    today = now.floor("day")
+
+    # Work out the bounds of each day in the user's timezone, so DST changes are handled,
+    # then let the database total up the breaks by day and average each weekday
+    days_ago = sa.case(
+        *[
+            (
+                sa.and_(
+                    Break.start >= today.shift(days=-i).int_timestamp,
+                    Break.start < today.shift(days=-i + 1).int_timestamp,
+                ),
+                i,
+            )
+            for i in range(1, weeks * 7 + 1)
+        ]
+    )
 
-    while now.weekday() != day:
-        now = now.shift(days=-1)
+    daily_totals = (
+        sa.select(
+            days_ago.label("days_ago"),
+            sa.func.sum(sa.func.coalesce(Break.end, arrow.utcnow().int_timestamp) - Break.start).label("total"),
+        )
+        .filter(
+            Break.user_id == get_user().id,
+            Break.start >= today.shift(weeks=-weeks).int_timestamp,
+            Break.start < today.int_timestamp,
+        )
+        .group_by("days_ago")
+        .subquery()
+    )
 
-    for _ in range(5):
-        now = now.shift(weeks=-1)
-        start = now.replace(hour=0, minute=0, second=0).int_timestamp
-        end = now.replace(hour=23, minute=59, second=59).int_timestamp
+    averages = db.session.execute(
+        sa.select(daily_totals.c.days_ago % 7, sa.func.avg(daily_totals.c.total)).group_by(daily_totals.c.days_ago % 7)
+    ).all()
 
-        breaks = db.session.scalars(
-            sa.select(Break).filter(
-                Break.user_id == get_user().id,
-                Break.start >= start,
-                Break.start <= end,
-            )
-        ).all()
+    profile = {day: 0 for day in range(7)}
+    for days_ago_mod_7, average in averages:
+        profile[(today.weekday() - days_ago_mod_7) % 7] = int(average)
+
+    return profile
 
-        if not breaks:
-            continue
 
-        break_durations.append(sum(b.duration for b in breaks))
+def _expected_break_duration(duration: TimeInSeconds) -> TimeInSeconds:
+    """
+    Round the expected break duration still to be taken
+
+    Anything shorter than `BREAK_PROFILE_MINIMUM` (default 5 minutes) is ignored,
+    the rest is rounded to the nearest `BREAK_PROFILE_ROUND_TO` (default 5 minutes)
+    """
+    from flask import current_app as app
+
+    minimum = app.config.get("BREAK_PROFILE_MINIMUM", 300)
+    round_to = app.config.get("BREAK_PROFILE_ROUND_TO", 300)
 
-    if not break_durations:
+    # We've already taken our expected breaks today
+    if duration < minimum:
         return 0
 
-    average_breaks_for_day = int(sum(break_durations) / len(break_durations))
-    return average_breaks_for_day
+    return round_to * round(duration / round_to) if round_to else duration
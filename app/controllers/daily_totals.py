@@ -0,0 +1,304 @@
+"""
+daily_totals.py
+---
+Maintains a `DailyTotal` row for each closed day since a user's first record, so the totals for any
+range of days (a week, a month, all time) come from two indexed lookups rather than loading every record.
+
+```python3
+from app.controllers import daily_totals
+
+totals = daily_totals.between(settings, date(2024, 1, 1), date(2024, 12, 31))
+totals.logged - totals.expected
+```
+
+Each row holds the totals for the day along with running totals from the first day, the totals for a range
+are the running totals at the end of it less the running totals on the day before it starts.
+
+Rows aren't updated on write, any write that changes a day must call `invalidate()` which removes the rows
+from that day onwards, they are rebuilt from the raw records the next time they're needed.
+
+Records are counted on the day they start. Today is never stored, and neither is any day from the first
+record which is still open, those days are always totalled from the raw records.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+import arrow
+import sqlalchemy as sa
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.lib.logger import get_logger
+from app.models import DailyTotal, Leave, Settings, Time
+from app.types import TimeInSeconds
+
+logger = get_logger(__name__)
+
+# Settings which change how much time is logged or expected on a day
+TOTALS_SETTINGS = ("timezone", "hours_per_day", "work_days")
+
+# Days can be 25 hours long when the clocks change, so pad the window
+_INVALIDATE_WINDOW = 25 * 60 * 60
+
+# Records are loaded this many days at a time when rebuilding
+REBUILD_DAYS = 366
+
+
+@dataclass
+class Totals:
+    worked: TimeInSeconds = 0
+    breaks: TimeInSeconds = 0
+    leave: TimeInSeconds = 0
+    expected: TimeInSeconds = 0
+
+    @property
+    def logged(self) -> TimeInSeconds:
+        """
+        Time worked plus leave, which is what counts towards the expected hours
+        """
+        return self.worked + self.leave
+
+    def __add__(self, other: "Totals") -> "Totals":
+        return Totals(
+            self.worked + other.worked,
+            self.breaks + other.breaks,
+            self.leave + other.leave,
+            self.expected + other.expected,
+        )
+
+    def __sub__(self, other: "Totals") -> "Totals":
+        return Totals(
+            self.worked - other.worked,
+            self.breaks - other.breaks,
+            self.leave - other.leave,
+            self.expected - other.expected,
+        )
+
+
+def invalidate(user_id: int, *timestamps: int | None):
+    """
+    Removes the rows from the earliest day containing any of `timestamps` onwards
+
+    This does not commit, it should be called as part of the write that changed the data
+    """
+    if not (timestamps := tuple(ts for ts in timestamps if ts is not None)):
+        return
+
+    db.session.execute(
+        sa.delete(DailyTotal).where(
+            DailyTotal.user_id == user_id, DailyTotal.day_start > min(timestamps) - _INVALIDATE_WINDOW
+        )
+    )
+
+
+def invalidate_since(user_ids: Iterable[int], timestamp: int):
+    """
+    Removes the rows for several users from the day containing `timestamp` onwards
+
+    This does not commit, it should be called as part of the write that changed the data
+    """
+    db.session.execute(
+        sa.delete(DailyTotal).where(
+            DailyTotal.user_id.in_(list(user_ids)), DailyTotal.day_start > timestamp - _INVALIDATE_WINDOW
+        )
+    )
+
+
+def invalidate_all(user_id: int):
+    """
+    Removes all rows for a user, eg. when their timezone or working pattern changes
+
+    This does not commit, it should be called as part of the write that changed the data
+    """
+    db.session.execute(sa.delete(DailyTotal).where(DailyTotal.user_id == user_id))
+
+
+def _running(row: DailyTotal) -> Totals:
+    return Totals(row.worked_to_date, row.breaks_to_date, row.leave_to_date, row.expected_to_date)
+
+
+def _day_start(day: date, tz: str) -> int:
+    return arrow.get(day, tzinfo=tz).int_timestamp
+
+
+def first_day(settings: Settings) -> Optional[date]:
+    """
+    Returns the day of the user's first time or leave record in their timezone
+    """
+    first = db.session.execute(
+        sa.select(
+            sa.select(sa.func.min(Time.start)).filter(Time.user_id == settings.user_id).scalar_subquery(),
+            sa.select(sa.func.min(Leave.start)).filter(Leave.user_id == settings.user_id).scalar_subquery(),
+        )
+    ).one()
+
+    if not (starts := [start for start in first if start is not None]):
+        return None
+    return arrow.get(min(starts)).to(settings.timezone).date()
+
+
+def by_day(settings: Settings, start: date, end: date) -> tuple[dict[date, Totals], Optional[date]]:
+    """
+    Totals up every day from `start` to `end` (inclusive) from the raw records
+
+    Returns the totals for each day in order, along with the first day which has an open record or break
+    Open records are counted up to now
+    """
+    tz = settings.timezone
+    day_seconds = int(settings.hours_per_day * 60 * 60)
+    now = arrow.utcnow().int_timestamp
+
+    days = {
+        day: Totals(expected=day_seconds if settings.work_days[day.weekday()] != "-" else 0)
+        for day in (start + timedelta(days=i) for i in range((end - start).days + 1))
+    }
+
+    in_range = (_day_start(start, tz), _day_start(end + timedelta(days=1), tz))
+
+    times = db.session.scalars(
+        sa.select(Time)
+        .options(selectinload(Time.breaks))
+        .filter(Time.user_id == settings.user_id, Time.start >= in_range[0], Time.start < in_range[1])
+    ).all()
+    leaves = db.session.execute(
+        sa.select(Leave.start, Leave.duration).filter(
+            Leave.user_id == settings.user_id, Leave.start >= in_range[0], Leave.start < in_range[1]
+        )
+    ).all()
+
+    first_open = None
+    for rec in times:
+        day = arrow.get(rec.start).to(tz).date()
+        days[day].worked += rec.logged()
+        days[day].breaks += sum((brk.end or now) - brk.start for brk in rec.breaks)
+
+        if rec.end is None or any(brk.end is None for brk in rec.breaks):
+            first_open = min(first_open or day, day)
+
+    for leave_start, duration in leaves:
+        days[arrow.get(leave_start).to(tz).date()].leave += int(duration * settings.hours_per_day * 60 * 60)
+
+    return days, first_open
+
+
+def stored_until(settings: Settings, until: date) -> Optional[DailyTotal]:
+    """
+    Stores every closed day up to `until` which isn't already stored and returns the last stored row, if any
+    """
+    until = min(until, arrow.now(settings.timezone).date() - timedelta(days=1))
+
+    last = db.session.scalars(
+        sa.select(DailyTotal)
+        .filter(DailyTotal.user_id == settings.user_id, DailyTotal.local_date <= until)
+        .order_by(DailyTotal.local_date.desc())
+        .limit(1)
+    ).first()
+
+    if last and last.local_date == until:
+        return last
+
+    start = last.local_date + timedelta(days=1) if last else first_day(settings)
+    if start is None or start > until:
+        return last
+
+    logger.debug(f"Rebuilding daily totals for user {settings.user_id} from {start} to {until}")
+
+    running = _running(last) if last else Totals()
+    rows: list[dict] = []
+
+    while start <= until:
+        end = min(start + timedelta(days=REBUILD_DAYS - 1), until)
+        days, first_open = by_day(settings, start, end)
+
+        for day, totals in days.items():
+            if first_open and day >= first_open:
+                break
+
+            running += totals
+            rows.append(
+                {
+                    "user_id": settings.user_id,
+                    "local_date": day,
+                    "day_start": _day_start(day, settings.timezone),
+                    "worked": totals.worked,
+                    "breaks": totals.breaks,
+                    "leave": totals.leave,
+                    "expected": totals.expected,
+                    "worked_to_date": running.worked,
+                    "breaks_to_date": running.breaks,
+                    "leave_to_date": running.leave,
+                    "expected_to_date": running.expected,
+                }
+            )
+
+        if first_open:
+            break
+        start = end + timedelta(days=1)
+
+    if not rows:
+        return last
+
+    try:
+        db.session.execute(sa.insert(DailyTotal), rows)
+        db.session.commit()
+    except sa.exc.IntegrityError:
+        # Another request stored the same days first
+        db.session.rollback()
+        return last
+
+    return db.session.scalars(
+        sa.select(DailyTotal).filter_by(user_id=settings.user_id, local_date=rows[-1]["local_date"])
+    ).one()
+
+
+def between(settings: Settings, start: date, end: date) -> Totals:
+    """
+    Returns the totals for every day from `start` to `end` (inclusive) in the user's timezone
+    Days before the user's first record aren't counted, so don't add to `expected`
+    """
+    totals = Totals()
+
+    if (last := stored_until(settings, end)) and last.local_date >= start:
+        before = db.session.scalars(
+            sa.select(DailyTotal)
+            .filter(DailyTotal.user_id == settings.user_id, DailyTotal.local_date < start)
+            .order_by(DailyTotal.local_date.desc())
+            .limit(1)
+        ).first()
+
+        totals = _running(last) - (_running(before) if before else Totals())
+
+    return sum(unstored_days(settings, start, end, last).values(), totals)
+
+
+def unstored_days(settings: Settings, start: date, end: date, last: Optional[DailyTotal]) -> dict[date, Totals]:
+    """
+    Totals up the days from `start` to `end` which come after `last`, the last stored row, from the raw records
+    Days before the user's first record are left out
+    """
+    if last:
+        live_from = max(start, last.local_date + timedelta(days=1))
+    elif first := first_day(settings):
+        # Nothing is stored before `end` so the range may start before the first record
+        live_from = max(start, first)
+    else:
+        return {}
+
+    if live_from > end:
+        return {}
+
+    days, _ = by_day(settings, live_from, end)
+    return days
+
+
+def rebuild(settings: Settings) -> int:
+    """
+    Removes and rebuilds every row for a user, returns the number of days stored
+    """
+    invalidate_all(settings.user_id)
+    db.session.commit()
+
+    stored_until(settings, arrow.now(settings.timezone).date())
+    return db.session.scalar(sa.select(sa.func.count()).filter(DailyTotal.user_id == settings.user_id))
@@ -2,6 +2,7 @@ from datetime import date
 from typing import Optional
 
 from app.controllers import settings
+from app.lib import holiday_calendar
 
 
 def get_holiday_location() -> tuple[str, str]:
@@ -15,63 +16,124 @@ def get_next_public_holiday() -> Optional[dict]:
     """
     Get the next public holiday
     """
-    import datetime
+    if holiday := holiday_calendar.next_holiday("/".join(get_holiday_location()), date.today()):
+        dt, name = holiday
+        return {"name": name, "date": dt}
+    return None
 
-    import holidays
 
-    today = datetime.date.today()
-    current_year = today.year
-    next_year = current_year + 1
-
-    country, region = get_holiday_location()
-    for year in (current_year, next_year):
-        h = holidays.country_holidays(country, subdiv=region, years=[year])
-        for dt, name in h.items():
-            if dt > today:
-                return {"name": name, "date": dt}
-
-
-def get_upcoming_holidays() -> dict[str, date]:
+def get_upcoming_holidays() -> dict[date, str]:
     """
     Get all holidays for the current year and the next year
     Returned as a dict of {date: name}
     """
-    import holidays
-
     today = date.today()
-    current_year = today.year
-    next_year = current_year + 1
-
-    next_holidays = {}
+    location = "/".join(get_holiday_location())
 
-    country, region = get_holiday_location()
-    for year in (current_year, next_year):
-        h = holidays.country_holidays(country, subdiv=region, years=[year])
-        for dt, name in h.items():
-            if dt >= today:
-                next_holidays.update({dt: name})
+    return dict(holiday_calendar.between(location, today, date(today.year + 1, 12, 31)))
 
-    return dict(sorted(next_holidays.items()))
 
-
-def get_previous_holidays() -> dict[str, date]:
+def get_previous_holidays() -> dict[date, str]:
     """
     Get all passed holidays for the current year and the previous year
     Returned as a dict of {date: name}
     """
-    import holidays
+    from datetime import timedelta
 
     today = date.today()
-    current_year = today.year
-    last_year = current_year - 1
+    location = "/".join(get_holiday_location())
+
+    return dict(holiday_calendar.between(location, date(today.year - 1, 1, 1), today - timedelta(days=1)))
 
-    previous_holidays = {}
 
-    country, region = get_holiday_location()
-    for year in (current_year, last_year):
-        h = holidays.country_holidays(country, subdiv=region, years=[year])
-        for dt, name in h.items():
-            if dt < today:
-                previous_holidays.update({dt: name})
+def generate_public_holiday_leave(year: int, since: date, batch_size: int = 1000) -> int:
+    """
+    Adds a day of public holiday leave for every holiday in `year` from `since` onwards,
+    for every user with a `holiday_location`, and returns how many were added
 
-    return dict(sorted(previous_holidays.items()))
+    Only holidays on the user's work days are added and any the user already has are skipped,
+    so this can be run as often as needed. Users are handled in batches of `batch_size`,
+    each batch is committed on its own.
+    """
+    from zoneinfo import ZoneInfo
+
+    import arrow
+    import sqlalchemy as sa
+
+    from app import db
+    from app.controllers import daily_totals
+    from app.lib.cache import mark_user_changed
+    from app.models import Leave, Settings
+
+    start = max(date(year, 1, 1), since)
+    end = date(year, 12, 31)
+    if start > end:
+        return 0
+
+    # Holidays are the same for everyone in a location
+    holidays_for: dict[str, list[tuple[date, str]]] = {}
+
+    # Leave is stored at midnight in the user's timezone, allow for any timezone when searching
+    search_from = arrow.get(start).shift(days=-1).int_timestamp
+    search_to = arrow.get(end).shift(days=2).int_timestamp
+
+    added = 0
+    last_user_id = 0
+    while True:
+        users = db.session.execute(
+            sa.select(Settings.user_id, Settings.holiday_location, Settings.timezone, Settings.work_days)
+            .filter(Settings.holiday_location != None, Settings.holiday_location != "", Settings.user_id > last_user_id)
+            .order_by(Settings.user_id)
+            .limit(batch_size)
+        ).all()
+
+        if not users:
+            return added
+
+        last_user_id = users[-1].user_id
+
+        existing = db.session.execute(
+            sa.select(Leave.user_id, sa.func.group_concat(Leave.start))
+            .filter(
+                Leave.user_id.in_([user.user_id for user in users]),
+                Leave.public_holiday == True,
+                Leave.start >= search_from,
+                Leave.start < search_to,
+            )
+            .group_by(Leave.user_id)
+        ).all()
+        existing_starts = {user_id: {int(ts) for ts in starts.split(",")} for user_id, starts in existing}
+
+        rows = []
+        for user in users:
+            if user.holiday_location not in holidays_for:
+                holidays_for[user.holiday_location] = holiday_calendar.between(user.holiday_location, start, end)
+
+            tz = ZoneInfo(user.timezone)
+            already_added = {arrow.get(ts).to(tz).date() for ts in existing_starts.get(user.user_id, ())}
+
+            for dt, name in holidays_for[user.holiday_location]:
+                if user.work_days[dt.weekday()] == "-" or dt in already_added:
+                    continue
+
+                rows.append(
+                    {
+                        "leave_type": "annual",
+                        "start": arrow.get(dt, tzinfo=tz).int_timestamp,
+                        "duration": 1,
+                        "public_holiday": True,
+                        "note": name,
+                        "user_id": user.user_id,
+                    }
+                )
+
+        if rows:
+            db.session.execute(sa.insert(Leave), rows)
+
+            changed_user_ids = {row["user_id"] for row in rows}
+            daily_totals.invalidate_since(changed_user_ids, arrow.get(start).shift(days=-1).int_timestamp)
+            for user_id in changed_user_ids:
+                mark_user_changed(db.session, user_id)
+
+        db.session.commit()
+        added += len(rows)
@@ -1,11 +1,11 @@
-from typing import Optional, Sequence
+from typing import Optional
 
 import arrow
 import sqlalchemy as sa
 from flask import abort
 
 from app import db
-from app.controllers import settings
+from app.controllers import daily_totals, settings
 from app.controllers.user.util import get_user
 from app.models import Leave
 
@@ -20,6 +20,7 @@ def delete(row_id: int) -> bool:
     Returns True if deleted and False if not
     """
     if record := db.session.scalars(sa.select(Leave).filter(Leave.id == row_id, Leave.user == get_user())).first():
+        daily_totals.invalidate(record.user_id, record.start)
         db.session.delete(record)
         db.session.commit()
         return True
@@ -40,6 +41,7 @@ def create(leave_type: str, start: int, duration: float, note: str = "", public_
         public_holiday=public_holiday,
     )
     db.session.add(leave)
+    daily_totals.invalidate(leave.user_id, leave.start)
     db.session.commit()
 
     return leave
@@ -56,6 +58,8 @@ def update(
     _tz = _settings.timezone
     start_dt = arrow.get(start, tzinfo=_tz).int_timestamp
 
+    daily_totals.invalidate(leave.user_id, leave.start, start_dt)
+
     leave.leave_type = leave_type
     leave.start = start_dt
     leave.duration = duration
@@ -64,47 +68,3 @@ def update(
     db.session.commit()
 
     return leave
-
-
-def all_for_week(week: Optional[str] = None) -> Sequence[Leave]:
-    """
-    Return all leave records sorted by start date for the given week
-
-    Week should be in the format ${YEAR}-W${WEEK_NUMBER}, eg 2022-W25
-    """
-
-    # TODO: A lot of duplicated logic between this and `time.all_for_week()`
-    _settings = settings.fetch()
-    _tz = _settings.timezone
-
-    local_now = arrow.now(tz=_tz)
-
-    if not week:
-        now = arrow.utcnow()
-
-        # Adjust the starting day to the first working day of the week
-        while now.weekday() > _settings.week_start_0:
-            now = now.shift(days=-1)
-
-        week = now.format("W").rsplit("-", 1)[0]
-
-    week_start = arrow.get(week)
-
-    # Adjust for `settings.week_start`
-    if _settings.week_start_0 > 0:
-        week_start = week_start.shift(weekday=_settings.week_start_0)
-
-        if _settings.week_start_0 > local_now.weekday():
-            week_start = week_start.shift(weeks=-1)
-
-    week_end = week_start.shift(days=7)
-
-    return db.session.scalars(
-        sa.select(Leave)
-        .filter(
-            Leave.user == get_user(),
-            Leave.start >= week_start.int_timestamp,
-            Leave.start < week_end.int_timestamp,
-        )
-        .order_by(Leave.start.desc(), Leave.id.desc())
-    ).all()
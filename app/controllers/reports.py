@@ -0,0 +1,220 @@
+"""
+reports.py
+---
+Month, quarter and year summaries of the time logged along with a calendar heatmap of the time worked each day.
+
+```python3
+from app.controllers import reports
+
+report = reports.year_report(2024)
+report.months  # [PeriodSummary(label="2024-01", ...), ...]
+report.heatmap  # Weeks of `HeatmapDay`, for a calendar
+```
+
+Everything is read from the daily totals (see `app.controllers.daily_totals`) and grouped by the database,
+so a year is at most 366 rows however many records and breaks it has. Days which aren't stored yet
+(today, or anything after a record which is still open) are totalled from the raw records and merged in.
+
+Reports are cached per user data version, open records count up to now so today can be up to `CACHE_TTL` behind.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Literal, Optional
+
+import arrow
+import sqlalchemy as sa
+
+from app import db
+from app.controllers import daily_totals, settings
+from app.lib.cache import cache
+from app.models import DailyTotal, Settings
+from app.types import TimeInSeconds
+
+Period = Literal["month", "quarter", "year"]
+
+CACHE_TTL = 5 * 60
+
+# How many shades the heatmap uses for days with time worked, the darkest is a full day or more
+HEATMAP_LEVELS = 4
+
+
+@dataclass
+class PeriodSummary:
+    # eg. 2024-03, 2024-Q1 or 2024
+    label: str
+    worked: TimeInSeconds = 0
+    breaks: TimeInSeconds = 0
+    leave: TimeInSeconds = 0
+    expected: TimeInSeconds = 0
+    days_worked: int = 0
+
+    @property
+    def logged(self) -> TimeInSeconds:
+        return self.worked + self.leave
+
+    @property
+    def overtime(self) -> TimeInSeconds:
+        return self.logged - self.expected
+
+
+@dataclass
+class HeatmapDay:
+    day: date
+    worked: TimeInSeconds
+    # 0 for nothing worked up to `HEATMAP_LEVELS`
+    level: int
+
+
+@dataclass
+class YearReport:
+    year: int
+    total: PeriodSummary
+    quarters: list[PeriodSummary]
+    months: list[PeriodSummary]
+    # One list of 7 days per week, starting on the user's first day of the week, days outside the year are `None`
+    heatmap: list[list[Optional[HeatmapDay]]]
+
+
+def _label(day: date, period: Period) -> str:
+    match period:
+        case "month":
+            return f"{day.year}-{day.month:02}"
+        case "quarter":
+            return f"{day.year}-Q{(day.month + 2) // 3}"
+        case "year":
+            return str(day.year)
+
+
+def _bucket(period: Period) -> sa.ColumnElement:
+    """
+    SQL for `_label()`
+    """
+    match period:
+        case "month":
+            return sa.func.strftime("%Y-%m", DailyTotal.local_date)
+        case "quarter":
+            quarter = (sa.cast(sa.func.strftime("%m", DailyTotal.local_date), sa.Integer) + 2) // 3
+            return sa.func.strftime("%Y", DailyTotal.local_date) + "-Q" + sa.cast(quarter, sa.String)
+        case "year":
+            return sa.func.strftime("%Y", DailyTotal.local_date)
+
+
+def summaries(_settings: Settings, start: date, end: date, period: Period) -> list[PeriodSummary]:
+    """
+    Returns the totals for each month, quarter or year from `start` to `end` (inclusive) in date order
+    """
+    last = daily_totals.stored_until(_settings, end)
+
+    bucket = _bucket(period).label("label")
+    rows = db.session.execute(
+        sa.select(
+            bucket,
+            sa.func.sum(DailyTotal.worked),
+            sa.func.sum(DailyTotal.breaks),
+            sa.func.sum(DailyTotal.leave),
+            sa.func.sum(DailyTotal.expected),
+            sa.func.count().filter(DailyTotal.worked > 0),
+        )
+        .filter(
+            DailyTotal.user_id == _settings.user_id,
+            DailyTotal.local_date >= start,
+            DailyTotal.local_date <= end,
+        )
+        .group_by(bucket)
+    ).all()
+
+    by_label = {row[0]: PeriodSummary(*row) for row in rows}
+
+    for day, totals in daily_totals.unstored_days(_settings, start, end, last).items():
+        summary = by_label.setdefault(_label(day, period), PeriodSummary(_label(day, period)))
+        summary.worked += totals.worked
+        summary.breaks += totals.breaks
+        summary.leave += totals.leave
+        summary.expected += totals.expected
+        summary.days_worked += 1 if totals.worked > 0 else 0
+
+    return [by_label[label] for label in sorted(by_label)]
+
+
+def heatmap(_settings: Settings, start: date, end: date) -> list[list[Optional[HeatmapDay]]]:
+    """
+    Returns the time worked each day from `start` to `end` (inclusive) laid out in weeks for a calendar
+    """
+    # Nothing is worked in the future, but the calendar still shows the whole range
+    until = min(end, arrow.now(_settings.timezone).date())
+    last = daily_totals.stored_until(_settings, until)
+
+    worked: dict[date, int] = dict(
+        db.session.execute(
+            sa.select(DailyTotal.local_date, DailyTotal.worked).filter(
+                DailyTotal.user_id == _settings.user_id,
+                DailyTotal.local_date >= start,
+                DailyTotal.local_date <= until,
+            )
+        ).all()
+    )
+    for day, totals in daily_totals.unstored_days(_settings, start, until, last).items():
+        worked[day] = totals.worked
+
+    full_day = _settings.hours_per_day * 60 * 60
+
+    # Pad the first week back to the start of the week, counted rather than as dates as it could be before `date.min`
+    days: list[Optional[HeatmapDay]] = [None] * ((start.weekday() - _settings.week_start_0) % 7)
+    for i in range((end - start).days + 1):
+        day = start + timedelta(days=i)
+        seconds = worked.get(day, 0)
+        level = min(HEATMAP_LEVELS, -(-seconds * HEATMAP_LEVELS // full_day)) if seconds > 0 and full_day else 0
+        days.append(HeatmapDay(day, seconds, int(level)))
+
+    # And the last week forward to the end
+    days.extend([None] * (-len(days) % 7))
+
+    return [days[i : i + 7] for i in range(0, len(days), 7)]
+
+
+def _today_key(*args) -> str:
+    today = arrow.now(settings.fetch().timezone).date()
+    return ":".join(str(arg) for arg in [*args, today])
+
+
+@cache.cached("year_report", ttl=CACHE_TTL, key=_today_key, per_user=True)
+def year_report(year: int) -> YearReport:
+    """
+    Returns the summaries and heatmap for a year
+    """
+    _settings = settings.fetch()
+    start, end = date(year, 1, 1), date(year, 12, 31)
+
+    # Only count up to today, otherwise the rest of the year would be expected already
+    until = min(end, arrow.now(_settings.timezone).date())
+    months = summaries(_settings, start, until, "month") if until >= start else []
+
+    total = PeriodSummary(str(year))
+    for month in months:
+        total.worked += month.worked
+        total.breaks += month.breaks
+        total.leave += month.leave
+        total.expected += month.expected
+        total.days_worked += month.days_worked
+
+    return YearReport(
+        year=year,
+        total=total,
+        quarters=summaries(_settings, start, until, "quarter") if until >= start else [],
+        months=months,
+        heatmap=heatmap(_settings, start, end),
+    )
+
+
+@cache.cached("all_years_report", ttl=CACHE_TTL, key=_today_key, per_user=True)
+def all_years() -> list[PeriodSummary]:
+    """
+    Returns a summary of every year since the user's first record, most recent first
+    """
+    _settings = settings.fetch()
+    if not (first := daily_totals.first_day(_settings)):
+        return []
+
+    today = arrow.now(_settings.timezone).date()
+    return list(reversed(summaries(_settings, date(first.year, 1, 1), today, "year")))
@@ -1,7 +1,8 @@
 import sqlalchemy as sa
-from flask import abort
+from flask import abort, g
 
 from app import db
+from app.controllers import daily_totals
 from app.lib.logger import get_logger
 from app.models import Settings
 
@@ -9,9 +10,15 @@ logger = get_logger(__name__)
 
 
 def fetch() -> Settings:
+    """
+    Fetch the settings for the current user, memoized on `flask.g` for the rest of the request
+    """
     from app.controllers.user.util import get_user
 
     user = get_user()
+    if (cached := g.get("_settings")) and cached.user_id == user.id:
+        return cached
+
     settings = db.session.scalars(sa.select(Settings).filter(Settings.user == user)).first()
 
     if not settings:
@@ -25,12 +32,14 @@ def fetch() -> Settings:
         )
         db.session.add(settings)
         db.session.commit()
+
+    g._settings = settings
     return settings
 
 
 def update(**values):
     """Updates the settings row"""
-    from app.controllers.user.util import get_user
+    from app.controllers.user.util import forget_user, get_user
 
     user = get_user()
     settings = db.session.scalars(sa.select(Settings).filter(Settings.user == user)).first()
@@ -52,8 +61,13 @@ def update(**values):
     if has_work_days:
         values["work_days"] = "".join(work_days)
 
+    # Changes to the working pattern affect every day so all the daily totals need rebuilding
+    if any(str(getattr(settings, key)) != str(values[key]) for key in daily_totals.TOTALS_SETTINGS if key in values):
+        daily_totals.invalidate_all(user.id)
+
     settings.update(**values)
     db.session.commit()
+    forget_user()
 
 
 def add_whats_new(title: str, content: str):
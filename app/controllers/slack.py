@@ -1,10 +1,14 @@
-import requests
-
 from app.controllers import settings
 from app.controllers.user.util import get_user
 
 
 def update_status(on_break: bool):
+    """
+    Queue a status update for each of the user's connected Slack accounts
+    These are sent in the background by `app.lib.slack`
+    """
+    from app.lib.slack import status_updater
+
     user = get_user()
     _settings = settings.fetch()
     if not _settings.auto_update_slack_status:
@@ -16,17 +20,11 @@ def update_status(on_break: bool):
 
     # Update all connected accounts
     for token in user.slack_tokens:
-        requests.post(
-            "https://slack.com/api/users.profile.set",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": "Bearer " + token.slack_token,
-            },
-            json={
-                "profile": {
-                    "status_text": message,
-                    "status_emoji": emoji,
-                    "status_expiration": 0,
-                },
+        status_updater.enqueue(
+            token.slack_token,
+            {
+                "status_text": message,
+                "status_emoji": emoji,
+                "status_expiration": 0,
             },
         )
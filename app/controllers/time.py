@@ -3,10 +3,12 @@ from typing import Optional, Sequence
 import arrow
 import sqlalchemy as sa
 from flask import abort
+from sqlalchemy.orm import selectinload
 
 from app import db
-from app.controllers import settings, slack
+from app.controllers import daily_totals, settings, slack
 from app.controllers.user.util import get_user
+from app.lib.cache import mark_user_changed
 from app.lib.logger import get_logger
 from app.models import Break, Time
 
@@ -25,6 +27,7 @@ def all() -> Sequence[Time]:
 
     return db.session.scalars(
         sa.select(Time)
+        .options(selectinload(Time.breaks))
         .filter(
             Time.user == get_user(),
         )
@@ -53,54 +56,13 @@ def current_break() -> Optional[Break]:
     return db.session.scalars(
         sa.select(Break)
         .filter(
-            Break.time.has(user=get_user()),
+            Break.user_id == get_user().id,
             Break.end == None,
         )
         .order_by(Break.start.desc())
     ).first()
 
 
-def all_for_week(week: Optional[str] = None) -> Sequence[Time]:
-    """
-    Return all time records sorted by start date for the given week
-
-    Week should be in the format ${YEAR}-W${WEEK_NUMBER}, eg 2022-W25
-    """
-    _settings = settings.fetch()
-    _tz = _settings.timezone
-
-    local_now = arrow.now(tz=_tz)
-
-    if not week:
-        now = arrow.utcnow()
-
-        # Adjust the starting day to the first working day of the week
-        while now.weekday() > _settings.week_start_0:
-            now = now.shift(days=-1)
-
-        week = now.format("W").rsplit("-", 1)[0]
-
-    week_start = arrow.get(week)
-
-    # Adjust for `settings.week_start`
-    if _settings.week_start_0 > 0:
-        week_start = week_start.shift(weekday=_settings.week_start_0)
-
-        if _settings.week_start_0 > local_now.weekday():
-            week_start = week_start.shift(weeks=-1)
-
-    week_end = week_start.shift(days=7)
-    return db.session.scalars(
-        sa.select(Time)
-        .filter(
-            Time.user == get_user(),
-            Time.start >= week_start.int_timestamp,
-            Time.start < week_end.int_timestamp,
-        )
-        .order_by(Time.start.desc(), Time.id.desc())
-    ).all()
-
-
 def create(start: str, end: Optional[str] = None, note: str = "") -> Time:
     """Create a new time record"""
     _settings = settings.fetch()
@@ -120,11 +82,25 @@ def create(start: str, end: Optional[str] = None, note: str = "") -> Time:
     )
 
     db.session.add(new_record)
+    daily_totals.invalidate(new_record.user_id, new_record.start)
     db.session.commit()
     return new_record
 
 
-def update(row_id: str, start: str, end: Optional[str] = None, note: str = "") -> Time:
+def update(
+    row_id: str,
+    start: str,
+    end: Optional[str] = None,
+    note: str = "",
+    breaks: Optional[dict[int, dict]] = None,
+    new_breaks: Sequence[tuple[str, Optional[str]]] = (),
+) -> Time:
+    """
+    Update a time record along with any of its breaks in a single commit
+
+    `breaks`: Changes to existing breaks as {break_id: {column: value}}, see `bulk_update()`
+    `new_breaks`: Breaks to add as (start, end) pairs
+    """
     _settings = settings.fetch()
     _tz = _settings.timezone
 
@@ -134,14 +110,41 @@ def update(row_id: str, start: str, end: Optional[str] = None, note: str = "") -
     if end:
         end_dt = arrow.get(end, tzinfo=_tz).int_timestamp
 
-    t = db.session.scalars(sa.select(Time).filter(Time.id == row_id, Time.user == get_user())).first()
+    t = db.session.scalars(
+        sa.select(Time).options(selectinload(Time.breaks)).filter(Time.id == row_id, Time.user == get_user())
+    ).first()
     if not t:
         abort(403)
 
+    daily_totals.invalidate(t.user_id, t.start, start_dt)
+
     t.start = start_dt
     t.end = end_dt
     t.note = note
 
+    if breaks:
+        existing = {brk.id: brk for brk in t.breaks}
+        if {int(break_id) for break_id in breaks} - existing.keys():
+            abort(403)
+
+        for break_id, values in breaks.items():
+            _apply(existing[int(break_id)], values, _tz)
+
+    if new_breaks:
+        db.session.execute(
+            sa.insert(Break),
+            [
+                {
+                    "time_id": t.id,
+                    "start": arrow.get(brk_start, tzinfo=_tz).int_timestamp,
+                    "end": arrow.get(brk_end, tzinfo=_tz).int_timestamp if brk_end else None,
+                    "user_id": t.user_id,
+                }
+                for brk_start, brk_end in new_breaks
+            ],
+        )
+        mark_user_changed(db.session, t.user_id)
+
     db.session.commit()
     return t
 
@@ -152,6 +155,7 @@ def delete(row_id: int) -> bool:
     Returns True if deleted and False if not
     """
     if record := db.session.scalars(sa.select(Time).filter(Time.id == row_id, Time.user == get_user())).first():
+        daily_totals.invalidate(record.user_id, record.start)
         db.session.delete(record)
         db.session.commit()
         return True
@@ -177,6 +181,7 @@ def clock_out(end: str):
     if current_record:
         break_end(end)  # If clocking out, call end break function
         current_record.end = end_dt.int_timestamp
+        daily_totals.invalidate(current_record.user_id, current_record.start)
         db.session.commit()
 
 
@@ -207,6 +212,7 @@ def break_start(start: str):
         )
     )
 
+    daily_totals.invalidate(current_record.user_id, current_record.start)
     db.session.commit()
     slack.update_status(on_break=True)
 
@@ -239,6 +245,7 @@ def break_end(end: str):
 
     if brk := current_break.first():
         brk.end = end_dt.int_timestamp
+        daily_totals.invalidate(current_record.user_id, current_record.start)
 
     db.session.commit()
     slack.update_status(on_break=False)
@@ -264,6 +271,7 @@ def add_break(time_id: str, break_start: str, break_end: str | None):
         )
     )
 
+    daily_totals.invalidate(time_record.user_id, time_record.start)
     db.session.commit()
 
 
@@ -274,17 +282,45 @@ def bulk_update(table, data: dict[int, dict]):
     `table`: "time" or "break"
     `data`: A dict of {row_id: {column1: value1, column2: value2}}
     """
+    if not data:
+        return
+
     _settings = settings.fetch()
     _tz = _settings.timezone
 
     model = Time if table == "time" else Break
+    user_id = get_user().id
+
+    rows = db.session.scalars(
+        sa.select(model).filter(model.id.in_([int(row_id) for row_id in data]), model.user_id == user_id)
+    ).all()
+    if len(rows) != len(data):
+        abort(403)
+
+    # Breaks count towards the week of the time record they belong to
+    if model is Break:
+        parents = db.session.execute(sa.select(Time.id, Time.start).filter(Time.id.in_({row.time_id for row in rows})))
+        parent_starts = dict(parents.tuples().all())
+        starts = [parent_starts.get(row.time_id) for row in rows]
+    else:
+        starts = [row.start for row in rows]
 
+    by_id = {row.id: row for row in rows}
     for row_id, values in data.items():
-        row = db.session.scalars(sa.select(model).filter_by(id=row_id)).one()
-        for key, value in values.items():
-            # Convert string dates to int timestamps
-            if key in ("start", "end") and value:
-                value = arrow.get(value, tzinfo=_tz).int_timestamp
-            setattr(row, key, value if value else None)
+        _apply(by_id[int(row_id)], values, _tz)
 
+    if model is Time:
+        starts += [row.start for row in rows]
+
+    daily_totals.invalidate(user_id, *starts)
     db.session.commit()
+
+
+def _apply(row: Time | Break, values: dict, tz: str):
+    """
+    Set the columns in `values` on a row, string dates are converted to timestamps and empty values to None
+    """
+    for key, value in values.items():
+        if key in ("start", "end") and value:
+            value = arrow.get(value, tzinfo=tz).int_timestamp
+        setattr(row, key, value if value else None)
@@ -6,7 +6,8 @@ from app import db
 from app.controllers.user.exceptions import UserAlreadyExistsError, UserAuthFailed, UserNotVerifiedError
 from app.controllers.user.token import create_token
 from app.lib.email import send_email
-from app.models import LoginSession, User
+from app.lib.session_store import StoredSession, session_store
+from app.models import User
 
 
 def register(email: str, password: str) -> User:
@@ -59,9 +60,9 @@ def register(email: str, password: str) -> User:
     return new_user
 
 
-def login(email: str, password: str) -> LoginSession:
+def login(email: str, password: str) -> StoredSession:
     """
-    Authenticates a user and returns a LoginSession
+    Authenticates a user and returns their new login session
     If the user cannot be authenticated a UserAuthFailed is raised
     If the user has not verified their email a UserNotVerifiedError is raised
     """
@@ -86,34 +87,33 @@ def login(email: str, password: str) -> LoginSession:
     # Generate a new CSRF token for this session
     generate_csrf_token(user.id)
 
+    # Set the last login time
+    user.last_login_at = arrow.utcnow().int_timestamp
+    db.session.commit()
+
     # Log in
-    session = LoginSession(
+    # Expired sessions are cleaned up by `flask data sweep-sessions`
+    session = StoredSession(
         key=secrets.token_hex(),
         expires=arrow.utcnow().shift(hours=7 * 24).int_timestamp,
         user_id=user.id,
     )
-
-    # Set the last login time
-    user.last_login_at = arrow.utcnow().int_timestamp
-
-    # Clean up any expired sessions
-    now = arrow.utcnow().int_timestamp
-    db.session.execute(sa.delete(LoginSession).where(LoginSession.expires < now))
-
-    db.session.add(session)
-    db.session.commit()
+    session_store().add(session)
     return session
 
 
 def logout():
     from flask import session as flask_session
 
+    from app.controllers.user.util import forget_user
+
     if login_session_key := flask_session.get("login_session_key"):
-        if login_session := db.session.scalars(sa.select(LoginSession).filter_by(key=login_session_key)).first():
-            db.session.delete(login_session)
-            db.session.commit()
+        session_store().delete(login_session_key)
         flask_session.pop("login_session_key")
 
+    flask_session.pop("user_id", None)
+    forget_user()
+
 
 def send_password_reset(email: str):
     """
@@ -190,26 +190,3 @@ def delete_account(user: User):
     user = db.session.scalars(sa.select(User).where(User.id == user.id)).one()
     db.session.delete(user)
     db.session.commit()
-
-
-def export_data(user: User) -> str:
-    import json
-
-    from app.controllers import settings, time
-
-    time_records = []
-    for t in time.all():
-        rec = t.asdict(exclude=["id", "user"])
-        rec["breaks"] = []
-        for brk in t.breaks:
-            rec["breaks"].append(brk.asdict(exclude=["id", "time"]))
-
-        time_records.append(rec)
-
-    export = {
-        "time": time_records,
-        "settings": settings.fetch().asdict(exclude=["id", "user"]),
-        "user": user.asdict(exclude=["id", "password", "settings"]),
-    }
-
-    return json.dumps(export)
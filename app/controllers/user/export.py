@@ -0,0 +1,211 @@
+"""
+export.py
+---
+Streams a complete export of a user's data.
+
+```python3
+from app.controllers.user.export import export_data
+
+for chunk in export_data(user, "ndjson", compress=True):
+    ...
+```
+
+Records are read a page at a time using keyset pagination so memory use doesn't grow with the size of the history.
+
+Formats:
+- `json`: A single object with `user`, `settings`, `slack_teams`, `time` (with `breaks`) and `leave`
+- `ndjson`: One object per line, each with a `type` of `user`, `settings`, `slack_team`, `time` or `leave`
+- `csv`: One row per time, break and leave record, breaks follow the time record they belong to
+
+Time records keep their `id` and each break has the `time_id` of the record it belongs to,
+so the links survive a round trip through `app.controllers.user.importer`.
+"""
+
+import csv
+import io
+import json
+import zlib
+from itertools import groupby
+from typing import Any, Iterator
+
+import sqlalchemy as sa
+
+from app import db
+from app.models import Break, Leave, Settings, Time, User, UserToSlackToken
+
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+PAGE_SIZE = 1000
+
+CSV_COLUMNS = ["type", "id", "time_id", "start", "end", "duration", "leave_type", "public_holiday", "note"]
+
+
+def _columns(model, exclude: list[str]) -> list[sa.Column]:
+    return [col for col in model.__table__.columns if col.name not in exclude]
+
+
+def _times(user_id: int) -> Iterator[dict]:
+    """
+    Yields every time record for a user, oldest first, each with a list of its breaks
+    """
+    time_columns = _columns(Time, exclude=[])
+    break_columns = _columns(Break, exclude=["id"])
+
+    last_id = 0
+    while True:
+        page = (
+            sa.select(*time_columns)
+            .filter(Time.user_id == user_id, Time.id > last_id)
+            .order_by(Time.id)
+            .limit(PAGE_SIZE)
+            .subquery()
+        )
+
+        rows = db.session.execute(
+            sa.select(page, *[col.label(f"break_{col.name}") for col in break_columns])
+            .outerjoin(Break, Break.time_id == page.c.id)
+            .order_by(page.c.id, Break.id)
+        ).all()
+
+        if not rows:
+            return
+
+        for time_id, group in groupby(rows, key=lambda row: row.id):
+            group = list(group)
+
+            rec = {col.name: getattr(group[0], col.name) for col in time_columns}
+            rec["breaks"] = [
+                {col.name: getattr(row, f"break_{col.name}") for col in break_columns}
+                for row in group
+                if row.break_time_id is not None
+            ]
+            yield rec
+
+            last_id = time_id
+
+
+def _leave(user_id: int) -> Iterator[dict]:
+    """
+    Yields every leave record for a user, oldest first
+    """
+    columns = _columns(Leave, exclude=["id"])
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            sa.select(Leave.id, *columns)
+            .filter(Leave.user_id == user_id, Leave.id > last_id)
+            .order_by(Leave.id)
+            .limit(PAGE_SIZE)
+        ).all()
+
+        if not rows:
+            return
+
+        for row in rows:
+            yield {col.name: getattr(row, col.name) for col in columns}
+
+        last_id = rows[-1].id
+
+
+def _account(user: User) -> dict[str, Any]:
+    """
+    Returns the user, their settings and the names of any connected Slack teams
+    """
+    settings = db.session.scalars(sa.select(Settings).filter_by(user_id=user.id)).first()
+    slack_teams = db.session.scalars(sa.select(UserToSlackToken.team_name).filter_by(user_id=user.id)).all()
+
+    return {
+        "user": user.asdict(exclude=["id", "password", "settings"]),
+        "settings": settings.asdict(exclude=["id", "user"]) if settings else None,
+        "slack_teams": list(slack_teams),
+    }
+
+
+def _json(user: User) -> Iterator[str]:
+    account = _account(user)
+
+    yield "{"
+    yield ", ".join(f"{json.dumps(key)}: {json.dumps(value)}" for key, value in account.items())
+
+    for key, records in (("time", _times(user.id)), ("leave", _leave(user.id))):
+        yield f', "{key}": ['
+        for i, rec in enumerate(records):
+            yield ("," if i else "") + json.dumps(rec)
+        yield "]"
+
+    yield "}"
+
+
+def _ndjson(user: User) -> Iterator[str]:
+    account = _account(user)
+
+    yield json.dumps({"type": "user", **account["user"]}) + "\n"
+    if account["settings"]:
+        yield json.dumps({"type": "settings", **account["settings"]}) + "\n"
+    for team_name in account["slack_teams"]:
+        yield json.dumps({"type": "slack_team", "team_name": team_name}) + "\n"
+
+    for rec in _times(user.id):
+        yield json.dumps({"type": "time", **rec}) + "\n"
+    for rec in _leave(user.id):
+        yield json.dumps({"type": "leave", **rec}) + "\n"
+
+
+def _csv(user: User) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+
+    def flush() -> str:
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writeheader()
+    yield flush()
+
+    for rec in _times(user.id):
+        writer.writerow({"type": "time", **rec})
+        for brk in rec["breaks"]:
+            writer.writerow({"type": "break", **brk})
+        yield flush()
+
+    for rec in _leave(user.id):
+        writer.writerow({"type": "leave", **rec})
+        yield flush()
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip headers
+
+    for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+
+    yield compressor.flush()
+
+
+def export_data(user: User, format: str = "json", compress: bool = False) -> Iterator[bytes]:
+    """
+    Yields a complete export of a user's data in chunks
+
+    `format`: One of `EXPORT_FORMATS`
+    `compress`: Gzip the output
+    """
+    match format:
+        case "json":
+            chunks = _json(user)
+        case "ndjson":
+            chunks = _ndjson(user)
+        case "csv":
+            chunks = _csv(user)
+        case _:
+            raise ValueError(f"Unknown export format {format!r}")
+
+    encoded = (chunk.encode() for chunk in chunks)
+    return _gzip(encoded) if compress else encoded
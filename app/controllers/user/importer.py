@@ -0,0 +1,325 @@
+"""
+importer.py
+---
+Imports time, break and leave history for a user in bulk.
+
+```python3
+from app.controllers.user.importer import import_data
+
+with open("log-my-time.ndjson") as f:
+    result = import_data(user, f, "ndjson")
+```
+
+Accepts the formats produced by `app.controllers.user.export`, with `start` and `end` either as
+unix timestamps or as ISO 8601 date times, which are taken to be in the user's timezone unless they have an offset.
+
+Records are given new IDs. Breaks are linked to the time record they're listed under (or follow, in CSV files),
+if a break has a `time_id` it must match that record's `id`.
+
+Everything is validated before anything is written, then rows are inserted with batched `INSERT` statements
+in a single transaction so either the whole file is imported or none of it is.
+"""
+
+import csv
+import io
+import json
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, tzinfo
+from typing import IO, Any, Iterator, Optional
+from zoneinfo import ZoneInfo
+
+import sqlalchemy as sa
+
+from app import db
+from app.lib.cache import mark_user_changed
+from app.models import Break, Leave, Settings, Time, User
+
+IMPORT_FORMATS = ("json", "ndjson", "csv")
+LEAVE_TYPES = ("annual", "sick")
+
+BATCH_SIZE = 5000
+
+# Only report this many errors, if there are more the file is probably in the wrong format
+MAX_ERRORS = 20
+
+# The most an import can be once decompressed, a small gzip file can expand to many times its size
+MAX_IMPORT_BYTES = 64 * 1024 * 1024
+
+
+class InvalidImport(Exception):
+    """
+    Raised when an import fails validation, nothing is imported
+    """
+
+    def __init__(self, errors: list[str]):
+        self.errors = errors
+        super().__init__(f"Import failed with {len(errors)} error(s): " + "; ".join(errors[:3]))
+
+
+class LimitedReader(io.RawIOBase):
+    """
+    Reads from a binary file, raising `InvalidImport` once more than `limit` bytes have been read
+    """
+
+    def __init__(self, file: IO[bytes], limit: int = MAX_IMPORT_BYTES):
+        self.file = file
+        self.limit = limit
+        self.total = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.file.read(len(buffer))
+        self.total += len(data)
+        if self.total > self.limit:
+            raise InvalidImport([f"Imports can be at most {self.limit // (1024 * 1024)}MB uncompressed"])
+
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def open_upload(file: IO[bytes], compressed: bool, limit: int = MAX_IMPORT_BYTES) -> IO[str]:
+    """
+    Opens an uploaded file for `import_data()`, decompressing it if needed and reading at most `limit` bytes
+    """
+    import gzip
+
+    raw = gzip.GzipFile(fileobj=file) if compressed else file
+    return io.TextIOWrapper(io.BufferedReader(LimitedReader(raw, limit)), encoding="utf-8")
+
+
+@dataclass
+class ImportResult:
+    time: int = 0
+    breaks: int = 0
+    leave: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return self.time + self.breaks + self.leave
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class _Records:
+    time: list[dict] = field(default_factory=list)
+    leave: list[dict] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+def _read(file: IO[str], format: str) -> Iterator[tuple[str, dict]]:
+    """
+    Yields `(location, record)` for each time and leave record in the file
+    Time records from CSV files have their breaks collected into a `breaks` list like the other formats
+    """
+    match format:
+        case "json":
+            export = json.load(file)
+            for i, rec in enumerate(export.get("time", [])):
+                yield f"time[{i}]", {"type": "time", **rec}
+            for i, rec in enumerate(export.get("leave", [])):
+                yield f"leave[{i}]", {"type": "leave", **rec}
+
+        case "ndjson":
+            for i, line in enumerate(file, start=1):
+                if line.strip():
+                    yield f"line {i}", json.loads(line)
+
+        case "csv":
+            last_time = None
+            for i, row in enumerate(csv.DictReader(file), start=2):
+                rec = {key: value for key, value in row.items() if value != ""}
+                if rec.get("type") == "break":
+                    if last_time is None:
+                        raise InvalidImport([f"line {i}: break before any time record"])
+                    last_time[1]["breaks"].append(rec)
+                    continue
+
+                if last_time:
+                    yield last_time
+                    last_time = None
+
+                if rec.get("type") == "time":
+                    last_time = (f"line {i}", {**rec, "breaks": []})
+                else:
+                    yield f"line {i}", rec
+
+            if last_time:
+                yield last_time
+
+        case _:
+            raise ValueError(f"Unknown import format {format!r}")
+
+
+def _timestamp(value: Any, tz: tzinfo) -> Optional[int]:
+    """
+    Returns a unix timestamp from a timestamp or an ISO 8601 date time in `tz`
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+        return int(value)
+
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz)
+    return int(dt.timestamp())
+
+
+def _belongs_to(brk: dict, time_rec: dict) -> bool:
+    """
+    Checks a break's `time_id` matches the time record it's listed under, when both have IDs
+    """
+    if brk.get("time_id") is None or time_rec.get("id") is None:
+        return True
+    return str(brk["time_id"]) == str(time_rec["id"])
+
+
+def _validate(user_id: int, records: Iterator[tuple[str, dict]], tz: tzinfo) -> _Records:
+    valid = _Records()
+
+    def error(location: str, message: str):
+        valid.errors.append(f"{location}: {message}")
+
+    for location, rec in records:
+        if len(valid.errors) >= MAX_ERRORS:
+            break
+
+        # User, settings and Slack records from an export aren't imported
+        if rec.get("type") not in ("time", "leave"):
+            continue
+
+        try:
+            start = _timestamp(rec.get("start"), tz)
+            end = _timestamp(rec.get("end"), tz)
+        except (TypeError, ValueError):
+            error(location, "invalid start or end")
+            continue
+
+        if start is None:
+            error(location, "missing start")
+            continue
+
+        if end is not None and end < start:
+            error(location, "ends before it starts")
+            continue
+
+        match rec.get("type"):
+            case "time":
+                breaks = []
+                for brk in rec.get("breaks") or []:
+                    if not _belongs_to(brk, rec):
+                        error(location, f"break for time record {brk.get('time_id')} is listed under {rec.get('id')}")
+                        continue
+
+                    try:
+                        brk_start = _timestamp(brk.get("start"), tz)
+                        brk_end = _timestamp(brk.get("end"), tz)
+                    except (TypeError, ValueError):
+                        brk_start, brk_end = None, None
+
+                    if brk_start is None or (brk_end is not None and brk_end < brk_start):
+                        error(location, "invalid break")
+                        continue
+
+                    breaks.append({"start": brk_start, "end": brk_end, "note": brk.get("note"), "user_id": user_id})
+
+                valid.time.append(
+                    {"start": start, "end": end, "note": rec.get("note"), "user_id": user_id, "breaks": breaks}
+                )
+
+            case "leave":
+                if rec.get("leave_type") not in LEAVE_TYPES:
+                    error(location, f"leave_type must be one of {', '.join(LEAVE_TYPES)}")
+                    continue
+
+                try:
+                    duration = float(rec.get("duration"))  # type: ignore[arg-type]
+                except (TypeError, ValueError):
+                    error(location, "invalid duration")
+                    continue
+
+                public_holiday = rec.get("public_holiday") in (True, "True", "true", "1", 1)
+
+                valid.leave.append(
+                    {
+                        "leave_type": rec["leave_type"],
+                        "start": start,
+                        "duration": duration,
+                        "public_holiday": public_holiday,
+                        "note": rec.get("note"),
+                        "user_id": user_id,
+                    }
+                )
+
+    return valid
+
+
+def import_data(user: User, file: IO[str], format: str) -> ImportResult:
+    """
+    Imports time, break and leave records for a user
+    Raises `InvalidImport` if any records are invalid
+
+    `file`: The file to import, opened in text mode
+    `format`: One of `IMPORT_FORMATS`
+    """
+    from app.controllers import daily_totals
+
+    started = time.perf_counter()
+
+    settings = db.session.scalars(sa.select(Settings).filter_by(user_id=user.id)).first()
+    tz = ZoneInfo(settings.timezone if settings else "Europe/London")
+
+    try:
+        records = _validate(user.id, _read(file, format), tz)
+    except (json.JSONDecodeError, csv.Error, UnicodeDecodeError, AttributeError, TypeError) as e:
+        raise InvalidImport([f"Could not read {format}: {e}"])
+    except (OSError, EOFError, zlib.error) as e:
+        # Corrupt or truncated gzip files
+        raise InvalidImport([f"Could not decompress the file: {e}"])
+
+    if records.errors:
+        raise InvalidImport(records.errors)
+
+    result = ImportResult()
+
+    try:
+        for i in range(0, len(records.time), BATCH_SIZE):
+            batch = records.time[i : i + BATCH_SIZE]
+
+            time_ids = db.session.scalars(
+                sa.insert(Time).returning(Time.id, sort_by_parameter_order=True),
+                [{key: value for key, value in rec.items() if key != "breaks"} for rec in batch],
+            ).all()
+
+            breaks = [{**brk, "time_id": time_id} for time_id, rec in zip(time_ids, batch) for brk in rec["breaks"]]
+            if breaks:
+                db.session.execute(sa.insert(Break), breaks)
+
+            result.time += len(batch)
+            result.breaks += len(breaks)
+
+        for i in range(0, len(records.leave), BATCH_SIZE):
+            batch = records.leave[i : i + BATCH_SIZE]
+            db.session.execute(sa.insert(Leave), batch)
+            result.leave += len(batch)
+
+        # Imported records can be on any day
+        daily_totals.invalidate_all(user.id)
+        mark_user_changed(db.session, user.id)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    result.seconds = time.perf_counter() - started
+    return result
@@ -1,28 +1,66 @@
 import typing
 from functools import wraps
 
-import sqlalchemy as sa
-from flask import flash, redirect
+from flask import flash, g, redirect
 from flask import session as flask_session
 
 from app import db
 from app.controllers.user.exceptions import UserNotLoggedIn
-from app.models import LoginSession, User
+from app.lib.session_store import StoredSession, session_store
+from app.models import User
+
+
+def get_login_session() -> StoredSession:
+    """
+    Fetch the login session for the current request from the session store (see `app.lib.session_store`)
+
+    The result is memoized on `flask.g` for the rest of the request so repeated calls don't hit the store,
+    if the session key changes (eg. on login or logout) it is looked up again
+    """
+    login_session_key = flask_session.get("login_session_key")
+
+    cached = g.get("_login_session")
+    if cached and cached[0] == login_session_key:
+        if cached[1]:
+            return cached[1]
+        raise UserNotLoggedIn()
+
+    login_session = None
+    if login_session_key:
+        login_session = session_store().get(login_session_key)
+
+        if login_session and login_session.expired:
+            flask_session.pop("login_session_key")
+            login_session_key, login_session = None, None
+
+        # Stores which don't load the user along with the session
+        if login_session and not login_session.user:
+            login_session.user = db.session.get(User, login_session.user_id)
+            if not login_session.user:
+                login_session = None
+
+    g._login_session = (login_session_key, login_session)
+
+    if not login_session:
+        raise UserNotLoggedIn()
+    return login_session
 
 
 def get_user() -> User:
     """
     Fetch the user ID from the login session and return the User
     """
-    import arrow
-
-    if login_session_key := flask_session.get("login_session_key"):
-        if login_session := db.session.scalars(sa.select(LoginSession).filter_by(key=login_session_key)).first():
-            if login_session.expires < arrow.utcnow().int_timestamp:
-                flask_session.pop("login_session_key")
-            else:
-                return login_session.user
-    raise UserNotLoggedIn()
+    # Always loaded by `get_login_session()`
+    return typing.cast(User, get_login_session().user)
+
+
+def forget_user():
+    """
+    Clear the memoized login session and settings for the current request
+    Should be called whenever the login session or settings change
+    """
+    g.pop("_login_session", None)
+    g.pop("_settings", None)
 
 
 def is_logged_in() -> bool:
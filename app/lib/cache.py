@@ -0,0 +1,233 @@
+"""
+cache.py
+---
+A read-through cache on top of the redis `CACHE` database.
+
+```python3
+from app.lib.cache import cache
+
+@cache.cached("week_list", ttl=3600, per_user=True)
+def week_list():
+    ...
+
+cache.set("holidays", "GB/SCT", holidays, ttl=86400)
+cache.get("holidays", "GB/SCT")
+```
+
+Keys are namespaced as `cache:{namespace}:{key}`, with `per_user=True` the key also includes the
+user ID and their data version. The data version is bumped whenever a user's time, leave, breaks
+or settings are committed, so everything cached for that user is invalidated at once.
+
+Values are pickled, this is only ever used for our own data.
+
+If redis can't be reached then values are computed directly and redis is left alone for `retry_after` seconds.
+"""
+
+import functools
+import pickle
+import time
+from collections import Counter
+from typing import Any, Callable, Optional
+
+import redis
+
+from app.lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+_MISSING = object()
+
+
+class Cache:
+    """
+    `prefix`: Prepended to every key
+    `retry_after`: How long to stop using redis for after it fails
+    """
+
+    def __init__(self, prefix: str = "cache", retry_after: float = 30.0):
+        self.prefix = prefix
+        self.retry_after = retry_after
+        self.counters: Counter[str] = Counter()
+
+        self._client: Optional[redis.Redis] = None
+        self._down_until = 0.0
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            from app.lib.redis import cache as client
+
+            self._client = client
+        return self._client
+
+    @client.setter
+    def client(self, client: redis.Redis):
+        self._client = client
+        self._down_until = 0.0
+
+    def _key(self, namespace: str, key: Any) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        """
+        Call a method on the redis client, returns `_MISSING` if redis is unavailable
+        """
+        if time.monotonic() < self._down_until:
+            return _MISSING
+
+        try:
+            return getattr(self.client, method)(*args, **kwargs)
+        except redis.RedisError as e:
+            logger.warning(f"Cache unavailable, skipping for {self.retry_after}s: {e}")
+            self.counters["error"] += 1
+            self._down_until = time.monotonic() + self.retry_after
+            return _MISSING
+
+    def get(self, namespace: str, key: Any, default: Any = None) -> Any:
+        """
+        Returns the cached value or `default` if there isn't one
+        """
+        raw = self._call("get", self._key(namespace, key))
+        if raw is _MISSING or raw is None:
+            self.counters[f"{namespace}:miss"] += 1
+            return default
+
+        self.counters[f"{namespace}:hit"] += 1
+        return pickle.loads(raw)
+
+    def set(self, namespace: str, key: Any, value: Any, ttl: int):
+        """
+        Caches `value` for `ttl` seconds
+        """
+        self._call("set", self._key(namespace, key), pickle.dumps(value), ex=ttl)
+
+    def delete(self, namespace: str, key: Any):
+        self._call("delete", self._key(namespace, key))
+
+    def publish(self, channel: str, message: str):
+        """
+        Publish `message` on a pub/sub channel, skipped while redis is unavailable
+        """
+        self._call("publish", channel, message)
+
+    def user_version(self, user_id: int) -> Optional[int]:
+        """
+        Returns the current data version for a user, or None if redis is unavailable
+
+        New versions start from the current time in milliseconds so if the key is ever lost
+        the version still moves forward rather than reusing an old one
+        """
+        key = self._key("version", user_id)
+
+        version = self._call("get", key)
+        if version is None:
+            self._call("set", key, time.time_ns() // 1_000_000, nx=True)
+            version = self._call("get", key)
+
+        if version is _MISSING or version is None:
+            return None
+        return int(version)
+
+    def bump_user_version(self, user_id: int):
+        """
+        Invalidates everything cached for a user
+        """
+        key = self._key("version", user_id)
+
+        if self._call("set", key, time.time_ns() // 1_000_000, nx=True) is _MISSING:
+            return
+        self._call("incr", key)
+
+    def cached(
+        self,
+        namespace: str,
+        ttl: int,
+        key: Optional[Callable[..., Any]] = None,
+        per_user: bool = False,
+    ):
+        """
+        Decorator to cache the return value of a function
+
+        `namespace`: The namespace to store values under
+        `ttl`: How long to cache values for in seconds
+        `key`: Called with the function arguments to build the cache key
+        `per_user`: Include the current user and their data version in the key
+        """
+
+        def decorator(f):
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                parts = [key(*args, **kwargs) if key else ""]
+
+                if per_user:
+                    from app.controllers.user.util import get_user
+
+                    user_id = get_user().id
+                    if (version := self.user_version(user_id)) is None:
+                        return f(*args, **kwargs)
+
+                    parts = [user_id, version, *parts]
+
+                cache_key = ":".join(str(part) for part in parts)
+
+                value = self.get(namespace, cache_key, default=_MISSING)
+                if value is _MISSING:
+                    value = f(*args, **kwargs)
+                    self.set(namespace, cache_key, value, ttl=ttl)
+
+                return value
+
+            return wrapper
+
+        return decorator
+
+
+cache = Cache()
+
+
+def mark_user_changed(session, user_id: int):
+    """
+    Bump the data version for a user when `session` commits
+
+    Changes made through the ORM are picked up automatically,
+    this is for bulk `INSERT` / `UPDATE` statements which the ORM doesn't track
+    """
+    session.info.setdefault("changed_user_ids", set()).add(user_id)
+
+
+def _collect_changed_users(session, flush_context, instances):
+    from app.models import Break, Leave, Settings, Time
+
+    changed = session.info.setdefault("changed_user_ids", set())
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        if isinstance(obj, (Time, Leave, Break, Settings)) and obj.user_id:
+            changed.add(obj.user_id)
+
+
+def _bump_changed_users(session):
+    from app.lib import events
+
+    for user_id in session.info.pop("changed_user_ids", ()):
+        cache.bump_user_version(user_id)
+        events.publish(user_id, "changed")
+
+
+def _forget_changed_users(session):
+    session.info.pop("changed_user_ids", None)
+
+
+def enable_cache_invalidation(app):
+    """
+    Bumps the data version for any user whose time, leave, breaks or settings are committed
+    and lets their open pages know (see `app.lib.events`)
+    """
+    import sqlalchemy as sa
+    from sqlalchemy.orm import Session
+
+    for event, listener in (
+        ("before_flush", _collect_changed_users),
+        ("after_commit", _bump_changed_users),
+        ("after_rollback", _forget_changed_users),
+    ):
+        if not sa.event.contains(Session, event, listener):
+            sa.event.listen(Session, event, listener)
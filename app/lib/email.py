@@ -1,30 +1,284 @@
+"""
+email.py
+---
+An outbox for sending emails without making requests wait on Postmark.
+
+`send_email()` saves the email to the `outbox_email` table and returns straight away.
+The outbox is drained in batches by a background thread in each process, or with `flask email drain`.
+
+The transport used to deliver emails is set with the `EMAIL_TRANSPORT` config value:
+- `postmark` (default): Sends using Postmark's batch API
+- `file`: Writes each email as a JSON file to `EMAIL_FILE_DIR`, handy for local development
+- `memory`: Keeps sent emails in a list, for tests
+
+Emails that fail to send are retried with backoff, after `MAX_ATTEMPTS` (or if the email is rejected outright)
+they are left in the table with a `failed` status.
+"""
+
+import json
+import os
+import secrets
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import arrow
+import sqlalchemy as sa
 from flask import current_app as app
 
+from app import db
 from app.lib.logger import get_logger
+from app.models import OutboxEmail
 
 logger = get_logger(__name__)
 
+POSTMARK_BATCH_URL = "https://api.postmarkapp.com/email/batch"
+
+# Postmark accepts up to 500 emails per batch
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 60
+
+# A worker that has held a claim on an email for this long is assumed to have died
+CLAIM_TIMEOUT = 300
+
+
+class EmailTransport(ABC):
+    """
+    Delivers a batch of emails
+
+    `send_batch()` returns an error for each email that was rejected (or None if it was sent),
+    if it raises then the whole batch is retried
+    """
+
+    @abstractmethod
+    def send_batch(self, emails: list[OutboxEmail]) -> list[Optional[str]]: ...
+
+
+class PostmarkTransport(EmailTransport):
+    """
+    Sends with Postmark's batch API, which accepts or rejects each email on its own
+
+    The batch is posted directly rather than with `postmark.PMBatchMail`, which raises once the batch
+    has been sent if any recipient is inactive, without saying which
+    """
+
+    def __init__(self, api_key: str, sender: str, url: str = POSTMARK_BATCH_URL, timeout: float = 30.0):
+        self.api_key = api_key
+        self.sender = sender
+        self.url = url
+        self.timeout = timeout
+
+    def send_batch(self, emails: list[OutboxEmail]) -> list[Optional[str]]:
+        import requests
+
+        response = requests.post(
+            self.url,
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "X-Postmark-Server-Token": self.api_key,
+            },
+            json=[
+                {"From": self.sender, "To": email.to_email, "Subject": email.subject, "HtmlBody": email.html}
+                for email in emails
+            ],
+            timeout=self.timeout,
+        )
+
+        # The whole request was refused (eg. the sender isn't confirmed), nothing was sent and resending won't help
+        if response.status_code == 422:
+            error = response.json().get("Message", "Unprocessable request")
+            return [error] * len(emails)
+
+        # Anything else which isn't a 200 means nothing was sent, so the batch is retried
+        response.raise_for_status()
+
+        return [
+            None if result.get("ErrorCode") == 0 else result.get("Message", "Unknown error")
+            for result in response.json()
+        ]
+
+
+class FileTransport(EmailTransport):
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def send_batch(self, emails: list[OutboxEmail]) -> list[Optional[str]]:
+        os.makedirs(self.directory, exist_ok=True)
+
+        for email in emails:
+            with open(os.path.join(self.directory, f"{email.created_at}-{email.id}.json"), "w") as f:
+                json.dump({"to": email.to_email, "subject": email.subject, "html": email.html}, f)
+
+        return [None] * len(emails)
+
+
+class MemoryTransport(EmailTransport):
+    def __init__(self):
+        self.sent: list[dict] = []
+
+    def send_batch(self, emails: list[OutboxEmail]) -> list[Optional[str]]:
+        self.sent.extend({"to": email.to_email, "subject": email.subject, "html": email.html} for email in emails)
+        return [None] * len(emails)
+
+
+def get_transport() -> EmailTransport:
+    """
+    Returns the transport configured by `EMAIL_TRANSPORT`
+    """
+    if transport := app.extensions.get("email_transport"):
+        return transport
+
+    match app.config.get("EMAIL_TRANSPORT", "postmark"):
+        case "file":
+            transport = FileTransport(app.config.get("EMAIL_FILE_DIR", "/tmp/log-my-time/emails"))
+        case "memory":
+            transport = MemoryTransport()
+        case _:
+            transport = PostmarkTransport(app.config["POSTMARK_API_KEY"], app.config["FROM_EMAIL"])
+
+    app.extensions["email_transport"] = transport
+    return transport
+
 
 def send_email(to_email: str, subject: str, html: str):
     """
-    Sends an email
+    Queues an email to be sent
 
     `to_email`: List of email receipients as a comma separated string
     `subject`: The mail subject line
     `html`: The HTML mail body
     """
-    from postmark import PMMail, PMMailSendException
+    now = arrow.utcnow().int_timestamp
+
+    db.session.add(
+        OutboxEmail(
+            to_email=to_email,
+            subject=subject,
+            html=html,
+            status="pending",
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now,
+        )
+    )
+    db.session.commit()
+
+    outbox_worker.wake()
+
+
+def drain_outbox(transport: Optional[EmailTransport] = None, limit: int = BATCH_SIZE) -> int:
+    """
+    Sends a single batch of due emails and returns how many were attempted
+
+    Emails are claimed with a single UPDATE first so multiple workers never send the same email
+    """
+    transport = transport or get_transport()
+    now = arrow.utcnow().int_timestamp
+    claim_token = secrets.token_hex(16)
+
+    claimable = sa.or_(
+        sa.and_(OutboxEmail.status == "pending", OutboxEmail.next_attempt_at <= now),
+        sa.and_(OutboxEmail.status == "sending", OutboxEmail.claimed_at < now - CLAIM_TIMEOUT),
+    )
 
-    message = PMMail(
-        api_key=app.config["POSTMARK_API_KEY"],
-        sender=app.config["FROM_EMAIL"],
-        to=to_email,
-        subject=subject,
-        html_body=html,
+    db.session.execute(
+        sa.update(OutboxEmail)
+        .where(
+            OutboxEmail.id.in_(sa.select(OutboxEmail.id).where(claimable).order_by(OutboxEmail.id).limit(limit)),
+            claimable,
+        )
+        .values(status="sending", claim_token=claim_token, claimed_at=now)
+        .execution_options(synchronize_session=False)
     )
+    db.session.commit()
+
+    emails = list(
+        db.session.scalars(
+            sa.select(OutboxEmail).filter(OutboxEmail.claim_token == claim_token).order_by(OutboxEmail.id)
+        ).all()
+    )
+    if not emails:
+        return 0
 
     try:
-        response = message.send()
-        return response
-    except PMMailSendException as e:
-        logger.exception(e)
+        errors = transport.send_batch(emails)
+    except Exception as e:
+        logger.exception(f"Failed to send a batch of {len(emails)} emails")
+        for email in emails:
+            _retry(email, str(e), now)
+    else:
+        for email, error in zip(emails, errors):
+            if error is None:
+                db.session.delete(email)
+            else:
+                # Rejected outright, there's no point trying again
+                logger.error(f"Email {email.id} was rejected: {error}")
+                email.update(status="failed", last_error=error, claim_token=None)
+
+    db.session.commit()
+    return len(emails)
+
+
+def _retry(email: OutboxEmail, error: str, now: int):
+    email.attempts += 1
+    email.last_error = error
+    email.claim_token = None
+
+    if email.attempts >= MAX_ATTEMPTS:
+        logger.error(f"Giving up on email {email.id} after {email.attempts} attempts")
+        email.status = "failed"
+    else:
+        email.status = "pending"
+        email.next_attempt_at = now + RETRY_BACKOFF * 2 ** (email.attempts - 1)
+
+
+class OutboxWorker:
+    """
+    Drains the outbox from a background thread
+    The thread is woken whenever an email is queued and also polls every `poll_interval` seconds for retries
+
+    Set `EMAIL_OUTBOX_WORKER = False` to disable it and drain with `flask email drain` instead
+    """
+
+    def __init__(self, poll_interval: float = 60.0):
+        self.poll_interval = poll_interval
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def wake(self):
+        flask_app = app._get_current_object()  # type: ignore[attr-defined]
+        if not flask_app.config.get("EMAIL_OUTBOX_WORKER", True):
+            return
+
+        self._ensure_started(flask_app)
+        self._wake.set()
+
+    def _ensure_started(self, flask_app):
+        # Threads don't survive a fork so each gunicorn worker starts its own
+        if self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+
+            self._wake = threading.Event()
+            threading.Thread(target=self._work, args=(flask_app,), name="email-outbox", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _work(self, flask_app):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+            with flask_app.app_context():
+                try:
+                    while drain_outbox() == BATCH_SIZE:
+                        pass
+                except Exception:
+                    logger.exception("Failed to drain the email outbox")
+
+
+outbox_worker = OutboxWorker()
@@ -0,0 +1,128 @@
+"""
+etag.py
+---
+ETags for frames based on the user's data version (see `app.lib.cache`).
+
+```python3
+from app.lib.etag import etag_frame, expires_at
+
+@v.get("/frames/stats")
+@etag_frame
+@login_required
+def stats():
+    expires_at(next_minute)
+    return render_template(...)
+```
+
+The data version is bumped whenever a user's time, leave, breaks or settings are committed,
+so a browser revalidating a frame with `If-None-Match` gets a 304 without rendering as long as nothing has changed.
+The only lookup is the login session itself, so a session which has been logged out or has expired never gets a 304.
+That is just its user ID and expiry: a single HGETALL with the `redis` session store, or with the default `sql` store
+one select of those two columns by the session's unique key.
+
+Frames which also depend on the current time call `expires_at()` while rendering, the expiry
+is part of the ETag so it stops matching once it has passed.
+
+If redis can't be reached then no ETags are sent and frames are always rendered.
+"""
+
+import hashlib
+import typing
+from functools import wraps
+
+import arrow
+from flask import g, make_response, request
+from flask import session as flask_session
+
+from app.lib.cache import cache
+
+
+def expires_at(timestamp: int):
+    """
+    Mark the frame being rendered as only valid until `timestamp`
+    If called more than once the earliest expiry is used
+    """
+    g._etag_expires = min(timestamp, g.get("_etag_expires") or timestamp)
+
+
+def _etag(user_id: int, version: int, expires: int) -> str:
+    """
+    Build the ETag for the current request
+    The login session key is included so a new login never matches an old tag
+    """
+    parts = [flask_session.get("login_session_key"), user_id, version, request.full_path, expires]
+    digest = hashlib.sha256(":".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f"{digest}.{expires}"
+
+
+def _matching_etag(user_id: int, version: int) -> typing.Optional[str]:
+    """
+    Returns the tag from `If-None-Match` which is still valid for the current request, if any
+    """
+    now = arrow.utcnow().int_timestamp
+
+    for tag in request.if_none_match.as_set(include_weak=True):
+        _, _, expires = tag.partition(".")
+        if not expires.isdigit():
+            continue
+
+        expires_int = int(expires)
+        if expires_int and expires_int <= now:
+            continue
+
+        if tag == _etag(user_id, version, expires_int):
+            return tag
+
+    return None
+
+
+def _session_is_valid(user_id: int) -> bool:
+    """
+    Checks the login session is still in the store, without loading the user
+    """
+    from app.lib.session_store import session_store
+
+    login_session = session_store().peek(flask_session["login_session_key"])
+    return bool(login_session) and not login_session.expired and login_session.user_id == user_id
+
+
+def etag_frame(f) -> typing.Any:
+    """
+    View decorator that adds an ETag to the response and answers `If-None-Match` with a 304
+    Should be applied before `login_required` so a 304 skips loading the user
+    """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        from app.controllers.user.util import get_user, is_logged_in
+
+        user_id = flask_session.get("user_id")
+        if not flask_session.get("login_session_key") or not user_id:
+            response = make_response(f(*args, **kwargs))
+
+            # Sessions from before user IDs were stored get one set here so the next request can use ETags
+            if is_logged_in():
+                flask_session["user_id"] = get_user().id
+            return response
+
+        # The version must be read before rendering, if anything is written meanwhile the tag is already stale
+        if (version := cache.user_version(user_id)) is None:
+            return f(*args, **kwargs)
+
+        # If the session is no longer valid the view is called, which sends them to log in again
+        if (tag := _matching_etag(user_id, version)) and _session_is_valid(user_id):
+            response = make_response("", 304)
+            response.set_etag(tag, weak=True)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        g._etag_expires = None
+        response = make_response(f(*args, **kwargs))
+
+        if response.status_code == 200 and is_logged_in() and get_user().id == user_id:
+            response.set_etag(_etag(user_id, version, g._etag_expires or 0), weak=True)
+            response.headers["Cache-Control"] = "private, no-cache"
+
+        return response
+
+    return decorated
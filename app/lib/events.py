@@ -0,0 +1,156 @@
+"""
+events.py
+---
+Pushes changes to a user's data to their open pages as server-sent events.
+
+```python3
+from app.lib import events
+
+events.publish(user.id, "changed")
+
+if stream := events.open_stream(user.id):
+    return Response(stream, mimetype="text/event-stream")
+```
+
+Events go through a redis pub/sub channel per user, so a change committed by any worker reaches the
+streams held open by every other worker. `changed` is published whenever a user's time, leave, breaks
+or settings are committed (see `app.lib.cache`).
+
+Each open stream holds a worker thread, so each process only serves `EVENTS_MAX_STREAMS` (default 24) at once.
+Everything is sized from that in `worker_threads()`:
+
+- Each gunicorn worker runs `EVENTS_MAX_STREAMS` + `OTHER_REQUEST_THREADS` threads (see `gunicorn.conf.py`),
+  so there are always threads left for ordinary requests while every stream slot is taken
+- The database pool holds a connection for every thread (see `create_app()`), so no request waits on the pool
+
+Raising `EVENTS_MAX_STREAMS` raises both, there's nothing else to change.
+Streams are closed after `EVENTS_STREAM_SECONDS` and the browser reconnects, which spreads them across workers.
+If there's no free slot or redis is unavailable no stream is opened and pages fall back to polling.
+"""
+
+import json
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+import redis
+from flask import current_app as app
+
+from app.lib.cache import cache
+from app.lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Sent as a comment while there are no events, to stop proxies closing the stream
+KEEPALIVE_SECONDS = 20
+
+# How long the browser waits before reconnecting in milliseconds
+RETRY_MS = 5000
+
+DEFAULT_MAX_STREAMS = 24
+
+# Threads per process kept free for requests other than event streams
+OTHER_REQUEST_THREADS = 4
+
+_slots: Optional[threading.BoundedSemaphore] = None
+_slots_lock = threading.Lock()
+
+
+def channel(user_id: int) -> str:
+    return f"events:{user_id}"
+
+
+def publish(user_id: int, event: str, data: Any = None):
+    """
+    Send `event` to every open stream for a user
+    """
+    cache.publish(channel(user_id), json.dumps({"event": event, "data": data}))
+
+
+def format_event(event: str, data: Any = None) -> str:
+    """
+    Formats an event for a `text/event-stream` response
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def worker_threads(config) -> int:
+    """
+    Returns how many threads each process should run for a given app config
+    """
+    return config.get("EVENTS_MAX_STREAMS", DEFAULT_MAX_STREAMS) + OTHER_REQUEST_THREADS
+
+
+def _stream_slots() -> threading.BoundedSemaphore:
+    """
+    Created on first use so each process has its own
+    """
+    global _slots
+
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(app.config.get("EVENTS_MAX_STREAMS", DEFAULT_MAX_STREAMS))
+        return _slots
+
+
+class EventStream:
+    """
+    The body of an event stream response, yields events from a subscribed pub/sub until `lifetime` seconds have passed
+
+    The server calls `close()` once the response is finished or the browser disconnects
+    """
+
+    def __init__(self, pubsub, slots: threading.BoundedSemaphore, lifetime: float):
+        self.pubsub = pubsub
+        self.slots = slots
+        self.lifetime = lifetime
+        self._closed = False
+
+    def __iter__(self) -> Iterator[str]:
+        yield f"retry: {RETRY_MS}\n\n"
+        yield format_event("ready")
+
+        closes_at = time.monotonic() + self.lifetime
+        try:
+            while (remaining := closes_at - time.monotonic()) > 0:
+                message = self.pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=min(KEEPALIVE_SECONDS, remaining)
+                )
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+
+                payload = json.loads(message["data"])
+                yield format_event(payload["event"], payload["data"])
+        except redis.RedisError as e:
+            logger.warning(f"Closing event stream: {e}")
+
+    def close(self):
+        if self._closed:
+            return
+
+        self._closed = True
+        self.pubsub.close()
+        self.slots.release()
+
+
+def open_stream(user_id: int) -> Optional[EventStream]:
+    """
+    Subscribes to a user's events, returns None if there's no free slot or redis is unavailable
+    """
+    from app.lib.redis import events as client
+
+    slots = _stream_slots()
+    if not slots.acquire(blocking=False):
+        return None
+
+    pubsub = client.pubsub()
+    try:
+        pubsub.subscribe(channel(user_id))
+    except redis.RedisError as e:
+        logger.warning(f"Event streams unavailable: {e}")
+        pubsub.close()
+        slots.release()
+        return None
+
+    return EventStream(pubsub, slots, lifetime=app.config.get("EVENTS_STREAM_SECONDS", 15 * 60))
@@ -0,0 +1,90 @@
+"""
+holiday_calendar.py
+---
+Public holiday calendars shared by every user in a location.
+
+```python3
+from app.lib.holiday_calendar import between, next_holiday
+
+between("GB/SCT", date(2024, 1, 1), date(2024, 12, 31))  # [(date(2024, 1, 1), "New Year's Day"), ...]
+next_holiday("GB/SCT", date.today())
+```
+
+Building a calendar with the `holidays` package is slow, so each year is built once and kept
+in an in-process LRU and in the redis cache for other workers. Calendars for `HOLIDAY_LOCATIONS`
+are built when the app starts, so with `--preload` every gunicorn worker starts with them.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import date
+from functools import lru_cache
+from typing import Optional
+
+from app.lib.cache import cache
+
+# The locations which can be picked in settings
+HOLIDAY_LOCATIONS = {
+    "GB/ENG": "England",
+    "GB/NIR": "Northern Ireland",
+    "GB/SCT": "Scotland",
+    "GB/WLS": "Wales",
+}
+
+# Holidays for past years don't change and future ones rarely do
+CACHE_TTL = 7 * 24 * 60 * 60
+
+Holiday = tuple[date, str]
+
+
+@lru_cache(maxsize=256)
+def _year(country: str, subdivision: str, year: int) -> tuple[Holiday, ...]:
+    """
+    Returns the holidays in a year sorted by date
+    """
+    key = f"{country}:{subdivision}:{year}"
+
+    if (holidays := cache.get("holidays", key)) is None:
+        import holidays as holidays_lib
+
+        calendar = holidays_lib.country_holidays(country, subdiv=subdivision or None, years=[year])
+        holidays = tuple(sorted(calendar.items()))
+        cache.set("holidays", key, holidays, ttl=CACHE_TTL)
+
+    return holidays
+
+
+def _years(location: str, start_year: int, end_year: int) -> list[Holiday]:
+    country, _, subdivision = location.partition("/")
+
+    holidays: list[Holiday] = []
+    for year in range(start_year, end_year + 1):
+        holidays.extend(_year(country, subdivision, year))
+    return holidays
+
+
+def between(location: str, start: date, end: date) -> list[Holiday]:
+    """
+    Returns the holidays from `start` to `end` (inclusive) sorted by date
+
+    `location`: A `holiday_location` setting, eg. "GB/SCT"
+    """
+    holidays = _years(location, start.year, end.year)
+    dates = [dt for dt, _ in holidays]
+    return holidays[bisect_left(dates, start) : bisect_right(dates, end)]
+
+
+def next_holiday(location: str, after: date) -> Optional[Holiday]:
+    """
+    Returns the first holiday after `after`, looking up to the end of next year
+    """
+    holidays = _years(location, after.year, after.year + 1)
+    i = bisect_right([dt for dt, _ in holidays], after)
+    return holidays[i] if i < len(holidays) else None
+
+
+def warm(years: range):
+    """
+    Build the calendars for every location in `HOLIDAY_LOCATIONS`
+    """
+    for location in HOLIDAY_LOCATIONS:
+        _years(location, years.start, years.stop - 1)
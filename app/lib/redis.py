@@ -11,11 +11,29 @@ from flask import current_app as app
 
 import redis
 
+from app.lib.timing import instrument_redis
+
 
 class RedisDatabase(Enum):
     SESSION = 0
     CACHE = 1
 
 
-session = redis.Redis(app.config["CACHE_HOST"], db=RedisDatabase.SESSION.value)
-cache = redis.Redis(app.config["CACHE_HOST"], db=RedisDatabase.CACHE.value)
+session = instrument_redis(redis.Redis(app.config["CACHE_HOST"], db=RedisDatabase.SESSION.value))
+
+# The cache is optional so don't let a slow or missing redis hold up requests
+cache = instrument_redis(
+    redis.Redis(
+        app.config["CACHE_HOST"],
+        db=RedisDatabase.CACHE.value,
+        socket_timeout=app.config.get("CACHE_TIMEOUT", 0.5),
+        socket_connect_timeout=app.config.get("CACHE_TIMEOUT", 0.5),
+    )
+)
+
+# Event streams wait on pub/sub messages so this has no read timeout
+events = redis.Redis(
+    app.config["CACHE_HOST"],
+    db=RedisDatabase.CACHE.value,
+    socket_connect_timeout=app.config.get("CACHE_TIMEOUT", 0.5),
+)
@@ -0,0 +1,223 @@
+"""
+session_store.py
+---
+Where login sessions are kept, picked with the `SESSION_STORE` config value:
+
+- `sql` (the default): The `login_session` table
+- `redis`: A redis hash per session which expires along with it, so any number of app nodes can share sessions
+- `write-through`: Written to both, read from redis falling back to the table (and copied into redis when found there)
+
+```python3
+from app.lib.session_store import StoredSession, session_store
+
+store = session_store()
+store.add(StoredSession(key, user_id=user.id, expires=expires))
+store.get(key)  # StoredSession or None
+store.peek(key)  # The same without loading the user, for checking the session is still valid
+```
+
+Moving to redis without logging everyone out:
+
+1. Switch to `write-through`, new sessions go to both and existing ones are copied into redis as they're used
+2. Run `flask data migrate-sessions` to copy the rest
+3. Switch to `redis`
+
+Expired sessions are removed from the table by `flask data sweep-sessions`, redis expires them itself.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import arrow
+import redis
+import sqlalchemy as sa
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.lib.logger import get_logger
+from app.models import LoginSession, User
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class StoredSession:
+    # Unique session ID, stored in user cookies
+    key: str
+    user_id: int
+    expires: int
+    # Loaded along with the session where the store can, saves looking the user up separately
+    user: Optional[User] = field(default=None, compare=False, repr=False)
+
+    @property
+    def expired(self) -> bool:
+        return self.expires < arrow.utcnow().int_timestamp
+
+
+class SessionStore(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[StoredSession]: ...
+
+    @abstractmethod
+    def add(self, session: StoredSession): ...
+
+    @abstractmethod
+    def delete(self, key: str): ...
+
+    def peek(self, key: str) -> Optional[StoredSession]:
+        """
+        Looks up just the user ID and expiry of a session
+        """
+        return self.get(key)
+
+    def sweep(self) -> int:
+        """
+        Removes expired sessions, returns how many were removed
+        """
+        return 0
+
+
+class SqlSessionStore(SessionStore):
+    def get(self, key: str) -> Optional[StoredSession]:
+        row = db.session.scalars(
+            sa.select(LoginSession).options(joinedload(LoginSession.user)).filter_by(key=key)
+        ).first()
+
+        if not row:
+            return None
+        return StoredSession(row.key, user_id=row.user_id, expires=row.expires, user=row.user)
+
+    def peek(self, key: str) -> Optional[StoredSession]:
+        row = db.session.execute(sa.select(LoginSession.user_id, LoginSession.expires).filter_by(key=key)).first()
+
+        if not row:
+            return None
+        return StoredSession(key, user_id=row.user_id, expires=row.expires)
+
+    def add(self, session: StoredSession):
+        db.session.add(LoginSession(key=session.key, user_id=session.user_id, expires=session.expires))
+        db.session.commit()
+
+    def delete(self, key: str):
+        db.session.execute(sa.delete(LoginSession).where(LoginSession.key == key))
+        db.session.commit()
+
+    def sweep(self) -> int:
+        result = db.session.execute(sa.delete(LoginSession).where(LoginSession.expires < arrow.utcnow().int_timestamp))
+        db.session.commit()
+        return result.rowcount
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions are stored in the redis `SESSION` database as `login_session:{key}`
+    """
+
+    @property
+    def client(self) -> redis.Redis:
+        from app.lib.redis import session
+
+        return session
+
+    def _key(self, key: str) -> str:
+        return f"login_session:{key}"
+
+    def get(self, key: str) -> Optional[StoredSession]:
+        if not (values := self.client.hgetall(self._key(key))):
+            return None
+        return StoredSession(key, user_id=int(values[b"user_id"]), expires=int(values[b"expires"]))
+
+    def add(self, session: StoredSession):
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(session.key), mapping={"user_id": session.user_id, "expires": session.expires})
+        pipe.expireat(self._key(session.key), session.expires)
+        pipe.execute()
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+
+class WriteThroughSessionStore(SessionStore):
+    """
+    Writes to redis and the table, reads from redis and falls back to the table
+
+    Sessions are still added while redis is unavailable, they're copied into redis when they're next read.
+    Deleting needs both, a session left behind in redis would be valid again once it's back,
+    so if redis fails the session is kept in the table too and the error is raised for the caller to retry.
+    """
+
+    def __init__(self):
+        self.redis = RedisSessionStore()
+        self.sql = SqlSessionStore()
+
+    def get(self, key: str) -> Optional[StoredSession]:
+        return self._read(key, self.sql.get)
+
+    def peek(self, key: str) -> Optional[StoredSession]:
+        return self._read(key, self.sql.peek)
+
+    def _read(self, key: str, from_sql: Callable[[str], Optional[StoredSession]]) -> Optional[StoredSession]:
+        try:
+            if session := self.redis.get(key):
+                return session
+        except redis.RedisError as e:
+            logger.warning(f"Session store unavailable, reading from the database: {e}")
+            return from_sql(key)
+
+        if (session := from_sql(key)) and not session.expired:
+            self._copy_to_redis(session)
+        return session
+
+    def _copy_to_redis(self, session: StoredSession):
+        try:
+            self.redis.add(session)
+        except redis.RedisError as e:
+            logger.warning(f"Session store unavailable, session {session.key[:8]}... is only in the database: {e}")
+
+    def add(self, session: StoredSession):
+        self.sql.add(session)
+        self._copy_to_redis(session)
+
+    def delete(self, key: str):
+        # Redis first, if that fails nothing has been revoked yet
+        self.redis.delete(key)
+        self.sql.delete(key)
+
+    def sweep(self) -> int:
+        return self.sql.sweep()
+
+
+SESSION_STORES: dict[str, type[SessionStore]] = {
+    "sql": SqlSessionStore,
+    "redis": RedisSessionStore,
+    "write-through": WriteThroughSessionStore,
+}
+
+
+def session_store() -> SessionStore:
+    """
+    Returns the configured session store
+    """
+    from flask import current_app as app
+
+    return SESSION_STORES[app.config.get("SESSION_STORE", "sql")]()
+
+
+def migrate_to_redis() -> int:
+    """
+    Copies every unexpired session from the table into redis, returns how many were copied
+    """
+    store = RedisSessionStore()
+
+    copied = 0
+    rows = db.session.execute(
+        sa.select(LoginSession.key, LoginSession.user_id, LoginSession.expires).filter(
+            LoginSession.expires >= arrow.utcnow().int_timestamp
+        )
+    )
+    for key, user_id, expires in rows:
+        store.add(StoredSession(key, user_id=user_id, expires=expires))
+        copied += 1
+
+    return copied
@@ -0,0 +1,216 @@
+"""
+slack.py
+---
+Sends Slack status updates from background threads so requests don't wait on the Slack API.
+
+```python3
+from app.lib.slack import status_updater
+
+status_updater.enqueue(token, {"status_text": "Away", "status_emoji": ":running:", "status_expiration": 0})
+```
+
+- Only the latest status for each token is sent, so rapid on/off toggles are coalesced
+- Only one request per token is in flight at a time so updates can't arrive out of order
+- Failed requests are retried with exponential backoff
+- Requests share a pooled HTTP session
+
+Updates are held in memory by each process, anything still queued when the process exits is lost.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+from flask import current_app as app
+from requests.adapters import HTTPAdapter
+
+from app.lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+SLACK_PROFILE_URL = "https://slack.com/api/users.profile.set"
+
+
+@dataclass
+class _Update:
+    profile: dict
+    attempt: int = 0
+    not_before: float = 0.0
+
+
+class StatusUpdater:
+    """
+    Queues and delivers Slack profile updates keyed on the Slack token
+
+    `url`: The Slack `users.profile.set` endpoint
+    `workers`: The number of threads sending updates
+    `max_attempts`: How many times to try sending an update before giving up
+    `backoff`: The delay in seconds before the first retry, doubled for each retry after that
+    `timeout`: The HTTP timeout in seconds
+    """
+
+    def __init__(
+        self,
+        url: str = SLACK_PROFILE_URL,
+        workers: int = 2,
+        max_attempts: int = 5,
+        backoff: float = 1.0,
+        timeout: float = 10.0,
+    ):
+        self.url = url
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def enqueue(self, token: str, profile: dict):
+        """
+        Queue a profile update for `token`, replacing any update for it that hasn't been sent yet
+        """
+        self._ensure_started()
+
+        with self._condition:
+            self._pending[token] = _Update(profile)
+            self._condition.notify()
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """
+        Wait until everything queued has been sent or given up on
+        Returns False if `timeout` is reached first
+        """
+        if self._pid != os.getpid():
+            return True
+
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _ensure_started(self):
+        """
+        Start the worker threads on first use
+
+        Threads don't survive a fork so this is checked per process, which means each gunicorn worker
+        starts its own threads rather than the master process when preloading
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+
+            self._condition = threading.Condition()
+            self._pending: dict[str, _Update] = {}
+            self._in_flight: set[str] = set()
+
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+            for i in range(self.workers):
+                threading.Thread(target=self._work, name=f"slack-status-{i}", daemon=True).start()
+
+            self._pid = os.getpid()
+
+    def _next(self) -> tuple[str, _Update]:
+        """
+        Wait for the next update which is due and whose token has nothing in flight
+        Must be called while holding `self._condition`
+        """
+        while True:
+            ready = [(u.not_before, token) for token, u in self._pending.items() if token not in self._in_flight]
+            if not ready:
+                self._condition.wait()
+                continue
+
+            not_before, token = min(ready)
+            if (delay := not_before - time.monotonic()) > 0:
+                self._condition.wait(delay)
+                continue
+
+            return token, self._pending.pop(token)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                token, update = self._next()
+                self._in_flight.add(token)
+
+            # Anything unexpected is logged and dropped, an exception here would kill the thread
+            retry_after: Optional[float] = None
+            try:
+                retry_after = self._send(token, update.profile)
+            except requests.RequestException as e:
+                logger.warning(f"Slack status update failed: {e}")
+                retry_after = 0.0
+            except Exception:
+                logger.exception("Unexpected error sending Slack status update")
+            finally:
+                with self._condition:
+                    self._in_flight.discard(token)
+                    self._retry(token, update, retry_after)
+                    self._condition.notify_all()
+
+    def _retry(self, token: str, update: _Update, retry_after: Optional[float]):
+        """
+        Queue `update` to be sent again after `retry_after` seconds, if it should be retried at all
+        Must be called while holding `self._condition`
+        """
+        # If a newer update was queued while this one was in flight then there's no point retrying
+        if retry_after is None or token in self._pending:
+            return
+
+        update.attempt += 1
+        if update.attempt < self.max_attempts:
+            update.not_before = time.monotonic() + max(retry_after, self.backoff * 2 ** (update.attempt - 1))
+            self._pending[token] = update
+        else:
+            logger.error(f"Giving up on Slack status update after {update.attempt} attempts")
+
+    def _send(self, token: str, profile: dict) -> Optional[float]:
+        """
+        Send a single update
+        Returns None when done, otherwise the minimum number of seconds to wait before retrying
+        """
+        response = self._session.post(
+            self.url,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": "Bearer " + token,
+            },
+            json={"profile": profile},
+            timeout=self.timeout,
+        )
+
+        if response.status_code == 429:
+            return float(response.headers.get("Retry-After", 0))
+
+        if response.status_code >= 500:
+            return 0.0
+
+        # Slack returns 200 with `ok: false` for most errors, only rate limiting is worth retrying
+        body = response.json()
+        if not body.get("ok"):
+            if body.get("error") == "ratelimited":
+                return 0.0
+            logger.warning(f"Slack rejected status update: {body.get('error')}")
+
+        return None
+
+
+status_updater = StatusUpdater(
+    url=app.config.get("SLACK_STATUS_URL", SLACK_PROFILE_URL),
+    workers=app.config.get("SLACK_STATUS_WORKERS", 2),
+)
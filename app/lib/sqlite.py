@@ -0,0 +1,81 @@
+"""
+sqlite.py
+---
+Tunes SQLite for a web app with several worker processes and threads sharing one database file.
+
+The pragmas in `DEFAULT_PRAGMAS` are run on every new connection, any of them can be
+overridden (or disabled with `None`) with the `SQLITE_PRAGMAS` config value:
+
+```python3
+SQLITE_PRAGMAS = {"mmap_size": 0, "foreign_keys": None}
+```
+
+WAL mode lets readers carry on while a write is in progress, so a clock in no longer blocks every other request.
+The WAL is checkpointed automatically as it grows, `flask data optimize` can also be run periodically
+to truncate it and refresh the query planner statistics.
+"""
+
+from typing import Any
+
+import sqlalchemy as sa
+
+DEFAULT_PRAGMAS: dict[str, Any] = {
+    "journal_mode": "WAL",
+    # Safe with WAL, a power cut can lose the last commits but never corrupts the database
+    "synchronous": "NORMAL",
+    # Wait for locks rather than failing straight away with "database is locked"
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    # Negative values are in KiB
+    "cache_size": -20 * 1024,
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+
+def pragmas_for(config: dict) -> dict[str, Any]:
+    """
+    Returns the pragmas to use with any overrides from `SQLITE_PRAGMAS` applied
+    """
+    pragmas = {**DEFAULT_PRAGMAS, **config.get("SQLITE_PRAGMAS", {})}
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def apply_pragmas(engine: sa.Engine, pragmas: dict[str, Any]):
+    """
+    Run `pragmas` on every new connection to `engine`
+    """
+
+    @sa.event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def enable_sqlite_pragmas(app, db):
+    """
+    Apply the configured pragmas to every SQLite engine
+    """
+    pragmas = pragmas_for(app.config)
+
+    for engine in db.engines.values():
+        if engine.dialect.name == "sqlite":
+            apply_pragmas(engine, pragmas)
+
+
+def optimize(engine: sa.Engine, analyze: bool = False) -> tuple[int, int, int]:
+    """
+    Checkpoint and truncate the WAL then update the query planner statistics
+
+    `analyze`: Run a full `ANALYZE` rather than `PRAGMA optimize`, which only analyzes tables that need it
+
+    Returns the result of the checkpoint, (busy, WAL pages, pages checkpointed)
+    """
+    with engine.connect() as conn:
+        busy, wal_pages, checkpointed = conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").one()
+        conn.exec_driver_sql("ANALYZE" if analyze else "PRAGMA optimize")
+        conn.commit()
+
+    return busy, wal_pages, checkpointed
@@ -0,0 +1,222 @@
+"""
+timing.py
+---
+Measures where the time goes in each request: SQL, redis, template rendering and outgoing HTTP.
+
+The totals are sent back in a `Server-Timing` header, which shows up in the browser's network tab:
+
+```
+Server-Timing: db;dur=4.1;desc="6 queries", redis;dur=0.8;desc="3 commands", render;dur=9.3;desc="1 templates", total;dur=15.2
+```
+
+The header shows how the app is put together, so it's only sent in debug mode unless `SERVER_TIMING = True` is set
+(or `False` to turn it off in debug mode too).
+
+Requests slower than `SLOW_REQUEST_MS` (default 500) or running more than `SLOW_REQUEST_QUERIES` (default 100)
+queries are always logged with a JSON breakdown, whether or not the header is sent.
+
+Time is only counted for requests, not background threads or CLI commands. Rendering includes any
+queries made from templates, so the parts can add up to more than the total.
+"""
+
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Optional
+
+import redis
+import sqlalchemy as sa
+from flask import g, has_request_context
+
+from app.lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+# The order parts are listed in the header and log line, along with what each one counts
+PARTS = {"db": "queries", "redis": "commands", "render": "templates", "http": "requests"}
+
+
+@dataclass
+class RequestTimings:
+    started: float = field(default_factory=time.perf_counter)
+    # Seconds spent on each part
+    durations: Counter[str] = field(default_factory=Counter)
+    counts: Counter[str] = field(default_factory=Counter)
+    # How many templates are being rendered, templates rendered from templates are only counted once
+    rendering: list[float] = field(default_factory=list)
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        """
+        The `Server-Timing` header value, durations are in milliseconds
+        """
+        metrics = [
+            f'{part};dur={self.durations[part] * 1000:.1f};desc="{self.counts[part]} {noun}"'
+            for part, noun in PARTS.items()
+            if self.counts[part]
+        ]
+        return ", ".join([*metrics, f"total;dur={self.total * 1000:.1f}"])
+
+
+def current() -> Optional[RequestTimings]:
+    """
+    Returns the timings for the current request, if there is one
+    """
+    return g.get("_timings") if has_request_context() else None
+
+
+def record(part: str, seconds: float):
+    """
+    Add `seconds` spent on `part` to the current request
+    """
+    if timings := current():
+        timings.durations[part] += seconds
+        timings.counts[part] += 1
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_timing_starts", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if starts := conn.info.get("_timing_starts"):
+        record("db", time.perf_counter() - starts.pop())
+
+
+def _handle_error(context):
+    if context.connection is not None and (starts := context.connection.info.get("_timing_starts")):
+        starts.pop()
+
+
+def instrument_engine(engine: sa.Engine):
+    """
+    Time every query run by `engine`
+    """
+    for event, listener in (
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+        ("handle_error", _handle_error),
+    ):
+        if not sa.event.contains(engine, event, listener):
+            sa.event.listen(engine, event, listener)
+
+
+def _timed(part: str, f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if not current():
+            return f(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            record(part, time.perf_counter() - start)
+
+    return wrapper
+
+
+def instrument_redis(client: redis.Redis) -> redis.Redis:
+    """
+    Time every command sent by `client`, pipelines are timed as one command
+    """
+    client.execute_command = _timed("redis", client.execute_command)  # type: ignore[method-assign]
+
+    pipeline = client.pipeline
+
+    @wraps(pipeline)
+    def timed_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        pipe.execute = _timed("redis", pipe.execute)  # type: ignore[method-assign]
+        return pipe
+
+    client.pipeline = timed_pipeline  # type: ignore[method-assign]
+    return client
+
+
+def _instrument_requests():
+    """
+    Time every outgoing HTTP request made with `requests`, eg. to Slack or Turnstile
+    """
+    import requests
+
+    if getattr(requests.Session.send, "_timed", False):
+        return
+
+    requests.Session.send = _timed("http", requests.Session.send)  # type: ignore[method-assign]
+    requests.Session.send._timed = True  # type: ignore[attr-defined]
+
+
+def _render_started(sender, **kwargs):
+    if timings := current():
+        timings.rendering.append(time.perf_counter())
+
+
+def _render_finished(sender, **kwargs):
+    if (timings := current()) and timings.rendering:
+        start = timings.rendering.pop()
+        if not timings.rendering:
+            record("render", time.perf_counter() - start)
+
+
+def _log_if_slow(app, timings: RequestTimings, response):
+    from flask import request
+
+    total_ms = timings.total * 1000
+    too_slow = total_ms >= app.config.get("SLOW_REQUEST_MS", 500)
+    too_many_queries = timings.counts["db"] > app.config.get("SLOW_REQUEST_QUERIES", 100)
+
+    if not too_slow and not too_many_queries:
+        return
+
+    fields = {
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "total_ms": round(total_ms, 1),
+    }
+    for part in PARTS:
+        fields[f"{part}_ms"] = round(timings.durations[part] * 1000, 1)
+        fields[f"{part}_count"] = timings.counts[part]
+
+    logger.warning(f"Slow request {json.dumps(fields)}")
+
+
+def enable_timing(app, db):
+    """
+    Time every request and add the `Server-Timing` header
+    """
+    from flask import before_render_template, template_rendered
+
+    from app.lib.blocks import before_render_template_block, template_block_rendered
+
+    for engine in db.engines.values():
+        instrument_engine(engine)
+
+    _instrument_requests()
+
+    before_render_template.connect(_render_started, app)
+    before_render_template_block.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    template_block_rendered.connect(_render_finished, app)
+
+    @app.before_request
+    def start_timing():
+        g._timings = RequestTimings()
+
+    @app.after_request
+    def add_timing(response):
+        if not (timings := current()):
+            return response
+
+        if app.config.get("SERVER_TIMING", app.debug):
+            response.headers["Server-Timing"] = timings.header()
+
+        _log_if_slow(app, timings, response)
+        return response
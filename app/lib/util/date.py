@@ -13,28 +13,19 @@ def humanize_seconds(seconds: int | float, short: bool = False):
 
     Seconds are never shown
     """
-    base = arrow.utcnow()
-    end = base.shift(seconds=seconds)
-
     if short:
         sign = ""
-        hours = 0
-        minutes = 0
 
         if seconds < 0:
             sign = "-"
             seconds = abs(seconds)
 
-        while seconds >= 60:
-            seconds -= 60
-            minutes += 1
-
-        while minutes >= 60:
-            minutes -= 60
-            hours += 1
-
+        hours, minutes = divmod(int(seconds // 60), 60)
         return f"{sign}{hours}h {minutes}m"
 
+    base = arrow.utcnow()
+    end = base.shift(seconds=seconds)
+
     return base.humanize(end, only_distance=True, granularity=["hour", "minute"])
 
 
@@ -48,32 +39,24 @@ def calculate_expected_hours(start: arrow.Arrow, end: arrow.Arrow, hours_per_day
     `hours_per_day`: The number of hours per day
     `days_worked`: A string of work days, e.g. "MTWTF--" with "-" for non-work days
     """
-    # Adjust our dates to be midnight
-    start = start.replace(hour=0, minute=0, second=0, microsecond=0)
-    end = end.replace(hour=0, minute=0, second=0, microsecond=0)
-
-    # Monday = 0, Sunday = 6
-    working_days = [False] * 7
-    for i, day in enumerate(days_worked):
-        if day != "-":
-            working_days[i] = True
+    start_date = start.date()
+    end_date = end.date()
 
-    days_to_check = (end - start).days
+    days = (end_date - start_date).days + 1
 
     # No days, no time expected
-    if days_to_check < 0:
+    if days <= 0:
         return 0
 
-    # If a single day check it's a work day, else 0 hours expected
-    if days_to_check == 0:
-        return hours_per_day if working_days[start.weekday()] else 0
+    # Monday = 0, Sunday = 6
+    working_days = [day != "-" for day in days_worked]
+
+    # Every full week has each work day once, then count the work days in what's left over
+    full_weeks, remainder = divmod(days, 7)
+    first_weekday = start_date.weekday()
 
-    # Count the number of work days between the two dates
-    work_days = 0
-    while start <= end:
-        if working_days[start.weekday()]:
-            work_days += 1
-        start = start.shift(days=1)
+    work_days = full_weeks * sum(working_days)
+    work_days += sum(working_days[(first_weekday + i) % 7] for i in range(remainder))
 
     # Calculate the expected hours
     expected_hours = work_days * hours_per_day
@@ -8,21 +8,49 @@ class InvalidCSRFToken(Exception):
 
 class MissingCSRFToken(Exception):
     """
-    Raised when a CSRF token is not found in redis for the user.
+    Raised when there is no CSRF token for the user.
     """
 
     pass
 
 
+# Signed tokens are valid for as long as a login session can last
+CSRF_TOKEN_MAX_AGE = 7 * 24 * 60 * 60
+
+
+def _csrf_mode() -> str:
+    """
+    Either "signed" (the default) for tokens signed over the login session, or "redis" for a token stored per user
+    """
+    from flask import current_app as app
+
+    return app.config.get("CSRF_TOKENS", "signed")
+
+
+def _sign(login_session_key: str, issued: int) -> str:
+    import hashlib
+    import hmac
+
+    from flask import current_app as app
+
+    message = f"{login_session_key}:{issued}".encode()
+    return hmac.new(app.config["SECRET_KEY"].encode(), message, hashlib.sha256).hexdigest()
+
+
 def generate_csrf_token(user_id: int):
     """
     Generates a new CSRF token for the specified user and stores it in redis under `csrf:{user.id}`
     The token should be generated upon log in persists for the duration of the login session.
+
+    Signed tokens don't need generating, they change with the login session key on every log in
     """
     import secrets
 
     from app.lib.redis import session
 
+    if _csrf_mode() != "redis":
+        return
+
     token = secrets.token_hex()
     csrf_key = f"csrf:{user_id}"
     session.set(csrf_key, token)
@@ -30,10 +58,40 @@ def generate_csrf_token(user_id: int):
 
 def get_csrf_token() -> str:
     """
-    Get the generated CSRF token for the current user from redis.
+    Get the CSRF token for the current user.
     If no token is found then a `MissingCSRFToken` exception is raised.
+
+    Signed tokens are `${issued}.${signature}`, an HMAC of the login session key and the time they were issued,
+    so they're made without any lookups. Either way the token is memoized for the rest of the request.
     """
+    from flask import g
+    from flask import session as flask_session
+
+    login_session_key = flask_session.get("login_session_key")
+
+    cached = g.get("_csrf_token")
+    if cached and cached[0] == login_session_key:
+        return cached[1]
 
+    if _csrf_mode() == "redis":
+        token = _stored_csrf_token()
+    else:
+        import arrow
+
+        if not login_session_key:
+            raise MissingCSRFToken("No login session to sign a CSRF token for")
+
+        issued = arrow.utcnow().int_timestamp
+        token = f"{issued}.{_sign(login_session_key, issued)}"
+
+    g._csrf_token = (login_session_key, token)
+    return token
+
+
+def _stored_csrf_token() -> str:
+    """
+    Get the generated CSRF token for the current user from redis.
+    """
     from app.controllers.user.util import get_user
     from app.lib.redis import session
 
@@ -49,26 +107,46 @@ def get_csrf_token() -> str:
 
 def validate_csrf_token(token: str):
     """
-    Validate a provided CSRF token against the one stored in redis for this user.
+    Validate a provided CSRF token, signed tokens are checked against the login session key
+    and the Redis-backed ones against the one stored for this user.
     If invalid an `InvalidCSRFToken` exception is raised.
     """
-    from app.controllers.user.util import get_user
-    from app.lib.redis import session
+    import hmac
 
-    user = get_user()
-    expected_token = session.get(f"csrf:{user.id}")
+    if _csrf_mode() == "redis":
+        from app.controllers.user.util import get_user
+        from app.lib.redis import session
+
+        user = get_user()
+        expected_token = session.get(f"csrf:{user.id}")
+
+        if not expected_token:
+            raise InvalidCSRFToken("Invalid CSRF token")
 
-    if not expected_token:
+        if not hmac.compare_digest(expected_token.decode("utf-8"), token):
+            raise InvalidCSRFToken("Invalid CSRF token")
+        return
+
+    import arrow
+    from flask import session as flask_session
+
+    login_session_key = flask_session.get("login_session_key")
+    issued, _, signature = token.partition(".")
+
+    if not login_session_key or not issued.isdigit():
         raise InvalidCSRFToken("Invalid CSRF token")
 
-    if expected_token.decode("utf-8") != token:
+    if arrow.utcnow().int_timestamp - int(issued) > CSRF_TOKEN_MAX_AGE:
+        raise InvalidCSRFToken("Expired CSRF token")
+
+    if not hmac.compare_digest(_sign(login_session_key, int(issued)), signature):
         raise InvalidCSRFToken("Invalid CSRF token")
 
 
 def enable_csrf_protection(app):
     """
     Enables CSRF token protection by checking all form submissions for a CSRF token
-    and validating it against the one stored in redis.
+    and validating it against the login session (or the one stored in redis, with `CSRF_TOKENS = "redis"`).
 
     If the form does not contain a CSRF token then no checks are done, so it is important
     that any route we want to protect with CSRF tokens has a CSRF token in the form.
@@ -0,0 +1,88 @@
+"""
+week.py
+---
+Works out the bounds of weeks and days in a user's timezone.
+
+```python3
+from app.lib.util.week import resolve_week
+
+week = resolve_week("2022-W25", week_start_0=0, tz="Europe/London", today=date(2022, 6, 24))
+week.start, week.end  # Unix timestamps, `end` is the start of the next week
+```
+
+Weeks are identified by the ISO week containing their first day, in the format ${year}-W${week}, eg. 2022-W25.
+
+These are pure functions of their arguments so the results are memoized, callers pass in `today`
+in the user's timezone rather than the current time.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Optional
+
+import arrow
+
+
+@dataclass(frozen=True)
+class Range:
+    # Unix timestamps of midnight in the user's timezone, `end` is not included in the range
+    start: int
+    end: int
+
+
+def week_key(day: date) -> str:
+    """
+    Returns the ISO week containing `day`, eg. 2022-W25
+    """
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02}"
+
+
+def current_week_key(week_start_0: int, today: date) -> str:
+    """
+    Returns the week containing `today`
+    """
+    # Adjust to the first working day of the week
+    return week_key(today - timedelta(days=max(today.weekday() - week_start_0, 0)))
+
+
+def weeks_between(week: str, later_week: str) -> int:
+    """
+    Returns how many weeks `week` is before `later_week`
+    """
+    year, number = (int(part) for part in week.split("-W"))
+    later_year, later_number = (int(part) for part in later_week.split("-W"))
+    return (date.fromisocalendar(later_year, later_number, 1) - date.fromisocalendar(year, number, 1)).days // 7
+
+
+@lru_cache(maxsize=1024)
+def resolve_day(day: date, tz: str) -> Range:
+    """
+    Returns the bounds of `day` in `tz`
+    """
+    return Range(
+        arrow.get(day, tzinfo=tz).int_timestamp,
+        arrow.get(day + timedelta(days=1), tzinfo=tz).int_timestamp,
+    )
+
+
+@lru_cache(maxsize=1024)
+def resolve_week(week: Optional[str], week_start_0: int, tz: str, today: date) -> Range:
+    """
+    Returns the bounds of a week in `tz`
+
+    `week`: eg. 2022-W25, defaults to the week containing `today`
+    `week_start_0`: The first day of the week, 0 for Monday
+    `today`: Today in `tz`
+    """
+    week = week or current_week_key(week_start_0, today)
+    year, number = (int(part) for part in week.split("-W"))
+
+    # Adjust for the first day of the week, if that's later in the week than today then
+    # the week which contains today started in the previous ISO week
+    first_day = date.fromisocalendar(year, number, 1) + timedelta(days=week_start_0)
+    if week_start_0 > today.weekday():
+        first_day -= timedelta(weeks=1)
+
+    return Range(resolve_day(first_day, tz).start, resolve_day(first_day + timedelta(weeks=1), tz).start)
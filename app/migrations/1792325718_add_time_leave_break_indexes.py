@@ -0,0 +1,40 @@
+"""Add indexes for time, leave and break lookups
+
+Revision ID: 1792325718
+Revises: 1743184516
+Create Date: 2026-10-18 10:55:18.339120
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "1792325718"
+down_revision: Union[str, None] = "1743184516"
+branch_labels: Union[str, Sequence[str], None] = ()
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_time_user_id_start", "time", ["user_id", "start"])
+    op.create_index("ix_time_user_id_start_open", "time", ["user_id", "start"], sqlite_where=sa.text('"end" IS NULL'))
+
+    op.create_index("ix_leave_user_id_start", "leave", ["user_id", "start"])
+
+    op.create_index("ix_break_user_id_start", "break", ["user_id", "start"])
+    op.create_index("ix_break_time_id", "break", ["time_id"])
+    op.create_index("ix_break_user_id_start_open", "break", ["user_id", "start"], sqlite_where=sa.text('"end" IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_break_user_id_start_open", table_name="break")
+    op.drop_index("ix_break_time_id", table_name="break")
+    op.drop_index("ix_break_user_id_start", table_name="break")
+
+    op.drop_index("ix_leave_user_id_start", table_name="leave")
+
+    op.drop_index("ix_time_user_id_start_open", table_name="time")
+    op.drop_index("ix_time_user_id_start", table_name="time")
@@ -1,3 +1,4 @@
+from datetime import date
 from typing import Literal, Optional, Self
 
 import arrow
@@ -112,6 +113,9 @@ class User(BaseModel):
     slack_tokens: Mapped[list["UserToSlackToken"]] = relationship(
         "UserToSlackToken", back_populates="user", cascade="all, delete-orphan"
     )
+    daily_totals: Mapped[list["DailyTotal"]] = relationship(
+        "DailyTotal", back_populates="user", cascade="all, delete-orphan"
+    )
 
     def verify(self):
         """
@@ -165,6 +169,12 @@ class LoginSession(BaseModel):
 
 
 class Time(TimeHelperMixin, BaseModel):
+    __table_args__ = (
+        sa.Index("ix_time_user_id_start", "user_id", "start"),
+        # Only open records, for finding the current clocked in record
+        sa.Index("ix_time_user_id_start_open", "user_id", "start", sqlite_where=sa.text('"end" IS NULL')),
+    )
+
     start: Mapped[UnixTimestamp] = mapped_column(sa.Integer, nullable=False)
     end: Mapped[Optional[UnixTimestamp]] = mapped_column(sa.Integer, nullable=True)
     note: Mapped[Optional[str]] = mapped_column(sa.String(255), nullable=True)
@@ -189,6 +199,13 @@ class Time(TimeHelperMixin, BaseModel):
 
 
 class Break(BaseModel):
+    __table_args__ = (
+        sa.Index("ix_break_user_id_start", "user_id", "start"),
+        sa.Index("ix_break_time_id", "time_id"),
+        # Only open breaks, for finding the current break
+        sa.Index("ix_break_user_id_start_open", "user_id", "start", sqlite_where=sa.text('"end" IS NULL')),
+    )
+
     time_id: Mapped[int] = mapped_column(sa.Integer, sa.ForeignKey("time.id"))
     start: Mapped[UnixTimestamp] = mapped_column(sa.Integer)
     end: Mapped[Optional[UnixTimestamp]] = mapped_column(sa.Integer, nullable=True)
@@ -217,6 +234,8 @@ class Break(BaseModel):
 
 
 class Leave(TimeHelperMixin, BaseModel):
+    __table_args__ = (sa.Index("ix_leave_user_id_start", "user_id", "start"),)
+
     leave_type: Mapped[str] = mapped_column(sa.String(255), nullable=False)  # sick / annual
     start: Mapped[UnixTimestamp] = mapped_column(sa.Integer, nullable=False)
     duration: Mapped[DurationDays] = mapped_column(sa.Float, nullable=False)
@@ -289,6 +308,60 @@ class Settings(BaseModel):
         return DAYS_OF_WEEK[day] in self.work_days_list()
 
 
+class DailyTotal(BaseModel):
+    """
+    The time worked, on break, on leave and expected for a user on a single closed day in their timezone,
+    along with running totals from their first day, so the totals for any range of days are the difference of two rows
+    Maintained by `app.controllers.daily_totals`
+    """
+
+    __table_args__ = (
+        sa.UniqueConstraint("user_id", "local_date"),
+        sa.Index("ix_daily_total_user_id_day_start", "user_id", "day_start"),
+    )
+
+    user_id: Mapped[int] = mapped_column(sa.Integer, sa.ForeignKey("user.id"), nullable=False)
+    local_date: Mapped[date] = mapped_column(sa.Date, nullable=False)
+    # Unix timestamp of midnight at the start of the day in the user's timezone
+    day_start: Mapped[UnixTimestamp] = mapped_column(sa.Integer, nullable=False)
+
+    worked: Mapped[TimeInSeconds] = mapped_column(sa.Integer, nullable=False)
+    breaks: Mapped[TimeInSeconds] = mapped_column(sa.Integer, nullable=False)
+    leave: Mapped[TimeInSeconds] = mapped_column(sa.Integer, nullable=False)
+    expected: Mapped[TimeInSeconds] = mapped_column(sa.Integer, nullable=False)
+
+    # Running totals up to and including this day
+    worked_to_date: Mapped[TimeInSeconds] = mapped_column(sa.Integer, nullable=False)
+    breaks_to_date: Mapped[TimeInSeconds] = mapped_column(sa.Integer, nullable=False)
+    leave_to_date: Mapped[TimeInSeconds] = mapped_column(sa.Integer, nullable=False)
+    expected_to_date: Mapped[TimeInSeconds] = mapped_column(sa.Integer, nullable=False)
+
+    user: Mapped[User] = relationship("User", viewonly=True, back_populates="daily_totals")
+
+
+class OutboxEmail(BaseModel):
+    """
+    An email waiting to be sent by `app.lib.email`
+    Rows are deleted once sent, so anything left with a `failed` status has been given up on
+    """
+
+    __table_args__ = (sa.Index("ix_outbox_email_status_next_attempt_at", "status", "next_attempt_at"),)
+
+    to_email: Mapped[str] = mapped_column(sa.String(255), nullable=False)
+    subject: Mapped[str] = mapped_column(sa.String(255), nullable=False)
+    html: Mapped[str] = mapped_column(sa.Text, nullable=False)
+    status: Mapped[Literal["pending", "sending", "failed"]] = mapped_column(
+        sa.String(20), nullable=False, default="pending"
+    )
+    attempts: Mapped[int] = mapped_column(sa.Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[UnixTimestamp] = mapped_column(sa.Integer, nullable=False)
+    created_at: Mapped[UnixTimestamp] = mapped_column(sa.Integer, nullable=False)
+    # Set while a worker is sending the email so other workers leave it alone
+    claim_token: Mapped[Optional[str]] = mapped_column(sa.String(64), nullable=True)
+    claimed_at: Mapped[Optional[UnixTimestamp]] = mapped_column(sa.Integer, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(sa.Text, nullable=True)
+
+
 class WhatsNew(BaseModel):
     title: Mapped[str] = mapped_column(sa.String(255), nullable=False)
     content: Mapped[str] = mapped_column(sa.Text, nullable=False)
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -9,3 +9,18 @@ class TimeStats:
     remaining_today: str
     overtime: str
     estimated_finish_time: str
+    # While `running` the browser counts the values in `seconds` on from `as_of` rather than polling
+    running: bool = False
+    as_of: int = 0
+    # When today ends, the stats have to be fetched again
+    day_ends: int = 0
+    seconds: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class DashboardSnapshot:
+    clocked_in: bool
+    on_break: bool
+    stats: TimeStats
+    # Time and leave records for the week being viewed, most recent first
+    records: list
@@ -1,8 +1,10 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, jsonify, render_template, request
 
-from app.controllers import core, leave, time
+from app.controllers import core
 from app.controllers.user.util import login_required
+from app.lib.etag import etag_frame, expires_at
 from app.lib.logger import get_logger
+from app.models import Time
 
 v = Blueprint("core", __name__)
 logger = get_logger(__name__)
@@ -15,13 +17,23 @@ def home():
     return app.send_static_file("html/home.html")
 
 
+def _week_options(offset: int) -> dict:
+    """
+    A page of weeks for the week picker, and the offset of the next page if there are more
+    """
+    weeks = core.week_list(offset=offset, limit=core.WEEK_LIST_PAGE_SIZE + 1)
+
+    return {
+        "weeks": weeks[: core.WEEK_LIST_PAGE_SIZE],
+        "next_offset": offset + core.WEEK_LIST_PAGE_SIZE if len(weeks) > core.WEEK_LIST_PAGE_SIZE else None,
+        "weeks_ago": core.weeks_ago,
+    }
+
+
 @v.get("/dash")
 @login_required
 def dash():
-    return render_template(
-        "pages/dash.html.j2",
-        week_list=core.week_list(),
-    )
+    return render_template("pages/dash.html.j2", **_week_options(offset=0))
 
 
 @v.get("/whats_new")
@@ -50,20 +62,106 @@ def privacy_page():
 
 # FRAMES
 @v.get("/frames/entries")
+@etag_frame
 @login_required
 def time_log_table():
+    import arrow
+
+    from app.controllers import settings
+
     week_number = request.args.get("week")
 
-    time_entries = time.all_for_week(week_number)
-    leave_entries = leave.all_for_week(week_number)
+    records = core.records_for_week(week_number)
 
-    records = sorted((time_entries + leave_entries), key=lambda x: x.start, reverse=True)
+    # Open records count up to now, otherwise only the current week changes when the day does
+    if any(isinstance(rec, Time) and rec.end is None for rec in records):
+        expires_at(arrow.utcnow().ceil("minute").int_timestamp + 1)
+    else:
+        expires_at(arrow.now(settings.fetch().timezone).ceil("day").int_timestamp + 1)
 
     return render_template("frames/entries_table.html.j2", records=records, type_of=lambda thing: type(thing).__name__)
 
 
+@v.get("/frames/week_options")
+@login_required
+def week_options():
+    offset = request.args.get("offset", 0, type=int)
+    return render_template("frames/week_options.html.j2", **_week_options(offset=max(offset, 0)))
+
+
 @v.get("/frames/stats")
+@etag_frame
 @login_required
 def stats():
+    import arrow
+
+    # Stats are shown to the minute
+    expires_at(arrow.utcnow().ceil("minute").int_timestamp + 1)
+
     time_stats = core.stats()
     return render_template("frames/time_stats.html.j2", stats=time_stats)
+
+
+@v.get("/frames/dashboard")
+@etag_frame
+@login_required
+def dashboard():
+    """
+    The clock in form, stats and entries for a week in one request, for refreshing the dashboard
+
+    Returns each frame's HTML in a `<template data-frame="...">`, or JSON with `?format=json`
+    """
+    from dataclasses import asdict
+
+    import arrow
+
+    snapshot = core.dashboard(request.args.get("week"))
+
+    # Stats are shown to the minute
+    expires_at(arrow.utcnow().ceil("minute").int_timestamp + 1)
+
+    if request.args.get("format") == "json":
+        entries = []
+        for rec in snapshot.records:
+            entry = {"type": type(rec).__name__, **rec.asdict(exclude=["user_id"])}
+            if isinstance(rec, Time):
+                entry["breaks"] = [brk.asdict(exclude=["user_id", "time_id"]) for brk in rec.breaks]
+            entries.append(entry)
+
+        return jsonify(
+            clocked_in=snapshot.clocked_in,
+            on_break=snapshot.on_break,
+            stats=asdict(snapshot.stats),
+            entries=entries,
+        )
+
+    return render_template(
+        "frames/dashboard.html.j2",
+        clocked_in=snapshot.clocked_in,
+        on_break=snapshot.on_break,
+        stats=snapshot.stats,
+        records=snapshot.records,
+        type_of=lambda thing: type(thing).__name__,
+    )
+
+
+@v.get("/events")
+@login_required
+def event_stream():
+    """
+    Server-sent events for the current user, see `app.lib.events`
+    """
+    from flask import Response
+
+    from app.controllers.user.util import get_user
+    from app.lib import events
+
+    # No stream, the page polls instead
+    if not (stream := events.open_stream(get_user().id)):
+        return "", 204
+
+    return Response(
+        stream,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,49 @@
+from flask import Blueprint, abort, redirect
+
+from app.controllers import reports
+from app.controllers.user.util import login_required
+from app.lib.blocks import render
+from app.lib.logger import get_logger
+
+v = Blueprint("reports", __name__)
+logger = get_logger(__name__)
+
+
+def _years() -> list[int]:
+    return [int(summary.label) for summary in reports.all_years()]
+
+
+@v.get("/reports")
+@login_required
+def reports_page():
+    import arrow
+
+    from app.controllers import settings
+
+    return redirect(f"/reports/{arrow.now(settings.fetch().timezone).year}")
+
+
+@v.get("/reports/all")
+@login_required
+def all_years():
+    return render(
+        "pages/reports.html.j2",
+        page="all",
+        years=_years(),
+        summaries=reports.all_years(),
+    )
+
+
+@v.get("/reports/<int:year>")
+@login_required
+def year(year: int):
+    # Dates can only be built for years 1 to 9999
+    if not 1 <= year <= 9999:
+        abort(404)
+
+    return render(
+        "pages/reports.html.j2",
+        page=str(year),
+        years=_years(),
+        report=reports.year_report(year),
+    )
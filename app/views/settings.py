@@ -21,13 +21,14 @@ def general_settings():
 
         if request.form.get("validate"):
             from app.lib import validate as v
+            from app.lib.holiday_calendar import HOLIDAY_LOCATIONS
 
             validation = v.validate_form(
                 values=dict(request.form),
                 checks={
                     # TODO: Run this through arrow or pytz to validate
                     "timezone": v.Check(regex=r"\w+\/\w+"),
-                    "holiday_location": v.Check(options=["", "GB/ENG", "GB/NIR", "GB/WLS", "GB/SCT"]),
+                    "holiday_location": v.Check(options=["", *HOLIDAY_LOCATIONS]),
                     "week_start": v.Check(options=["0", "1", "2", "3", "4", "5", "6"]),
                     "theme": v.Check(options=["light", "dark"]),
                     "hours_per_day": v.Check(
@@ -68,15 +69,22 @@ def account_settings():
             flash("Your account has been deleted.", "success")
             return redirect("/login")
         elif submit == "export":
-            from flask import make_response
+            from flask import Response, abort, stream_with_context
 
-            from app.controllers.user import export_data
+            from app.controllers.user.export import EXPORT_FORMATS, export_data
 
-            response = make_response(
-                export_data(user),
+            # eg. "csv" or "csv.gz"
+            export_format, _, compression = request.form.get("export_format", "json").partition(".")
+            if export_format not in EXPORT_FORMATS or compression not in ("", "gz"):
+                abort(400)
+
+            filename = f"log-my-time.{export_format}" + (".gz" if compression else "")
+
+            return Response(
+                stream_with_context(export_data(user, export_format, compress=bool(compression))),
+                content_type="application/gzip" if compression else EXPORT_FORMATS[export_format],
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'},
             )
-            response.headers["Content-Type"] = "application/json"
-            return response
 
         if new_password := request.form.get("password"):
             has_changed = True
@@ -97,6 +105,39 @@ def account_settings():
     return render("pages/settings.html.j2", page="account", email=user.email)
 
 
+@v.post("/settings/account/import")
+@login_required
+def import_history():
+    from flask import flash, redirect
+
+    from app.controllers.user.importer import IMPORT_FORMATS, InvalidImport, import_data, open_upload
+    from app.controllers.user.util import get_user
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        flash("Choose a file to import.", "warning")
+        return redirect("/settings/account")
+
+    # eg. "export.csv" or "export.csv.gz"
+    compressed = upload.filename.endswith(".gz")
+    file_format = upload.filename.removesuffix(".gz").rsplit(".", 1)[-1]
+    if file_format not in IMPORT_FORMATS:
+        flash(f"Imports must be one of: {', '.join(IMPORT_FORMATS)}.", "danger")
+        return redirect("/settings/account")
+
+    # The upload itself is capped by `MAX_CONTENT_LENGTH`
+    with open_upload(upload.stream, compressed) as file:
+        try:
+            result = import_data(get_user(), file, file_format)
+        except InvalidImport as e:
+            flash("Nothing was imported: " + "; ".join(e.errors[:5]), "danger")
+            return redirect("/settings/account")
+
+    logger.info(f"Imported {result.rows} rows in {result.seconds:.2f}s ({result.rows_per_second:.0f} rows/s)")
+    flash(f"Imported {result.time} time, {result.breaks} break and {result.leave} leave records.", "success")
+    return redirect("/dash")
+
+
 @v.route("/settings/slack", methods=["GET", "POST"])
 @login_required
 def slack_settings():
@@ -2,6 +2,7 @@ from flask import Blueprint, redirect, render_template, request
 
 from app.controllers import time
 from app.controllers.user.util import login_required
+from app.lib.etag import etag_frame
 from app.lib.logger import get_logger
 
 v = Blueprint("time", __name__)
@@ -40,6 +41,7 @@ def delete_time(row_id):
 
 # FRAMES
 @v.get("/frames/clock_in_form")
+@etag_frame
 @login_required
 def clock_in_form():
     clocked_in = time.current() is not None
@@ -59,13 +61,6 @@ def time_form(row_id: str = ""):
         from collections import defaultdict
 
         if row_id:
-            time.update(
-                row_id,
-                start=request.json["start"],
-                end=request.json["end"],
-                note=request.json["note"],
-            )
-
             breaks = defaultdict(dict)
 
             # Handle any edits to existing breaks
@@ -74,19 +69,18 @@ def time_form(row_id: str = ""):
                     _, field, break_id = key.split("-")
                     breaks[break_id][field] = value
 
-            time.bulk_update(table="break", data=breaks)
-
             # Handle any new breaks
             new_breaks_starts = ensure_list(request.json.get("new-break-start", []))
             new_breaks_ends = ensure_list(request.json.get("new-break-end", []))
-            new_breaks = zip(new_breaks_starts, new_breaks_ends)
-
-            for new_break in new_breaks:
-                time.add_break(
-                    time_id=row_id,
-                    break_start=new_break[0],
-                    break_end=new_break[1],
-                )
+
+            time.update(
+                row_id,
+                start=request.json["start"],
+                end=request.json["end"],
+                note=request.json["note"],
+                breaks=breaks,
+                new_breaks=list(zip(new_breaks_starts, new_breaks_ends)),
+            )
 
         else:
             time.create(
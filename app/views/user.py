@@ -56,6 +56,7 @@ def handle_login():
             try:
                 login_session = login(email, password)
                 flask_session["login_session_key"] = login_session.key
+                flask_session["user_id"] = login_session.user_id
                 flask_session.permanent = True
                 return redirect("/dash")
             except UserAuthFailed:
@@ -5,7 +5,7 @@ if [[ $FLASK_DEBUG == 1 ]]; then
 else
   exec gunicorn \
     --workers 2 \
-    --threads 4 \
+    --config gunicorn.conf.py \
     --worker-class gthread \
     --bind 0.0.0.0:5000 \
     --worker-tmp-dir /dev/shm \
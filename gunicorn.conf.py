@@ -0,0 +1,15 @@
+"""
+Gunicorn settings which depend on the app config, everything else is passed in `entrypoint.sh`
+"""
+
+import os
+
+from flask import Config
+
+from app.lib.events import worker_threads
+
+_config = Config(os.path.dirname(os.path.abspath(__file__)))
+_config.from_pyfile("config/app_config.py")
+
+# Enough for every event stream plus ordinary requests, see `app.lib.events`
+threads = worker_threads(_config)
@@ -10,16 +10,49 @@ def app():
     with app.app_context(), app.test_request_context():
         engine = db.engine
 
-    # Create tables
-    Model.metadata.create_all(engine)
+        # Create tables
+        Model.metadata.drop_all(engine)
+        Model.metadata.create_all(engine)
 
-    # Add any necessary test data
-    from app.models import User
+        # Add any necessary test data
+        from app.models import User
 
-    test_user = User(email="test@example.com")
-    db.session.add(test_user)
+        test_user = User(email="test@example.com")
+        db.session.add(test_user)
 
-    test_user.set_password("test")
-    test_user.verify()
+        test_user.set_password("test")
+        test_user.verify()
 
-    yield app
+        yield app
+
+        db.session.rollback()
+        Model.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def user(app):
+    """
+    Logs in the test user for the current request context and returns it
+    """
+    import secrets
+
+    import arrow
+    import sqlalchemy as sa
+    from flask import session as flask_session
+
+    from app import db
+    from app.models import LoginSession, User
+
+    test_user = db.session.scalars(sa.select(User).filter_by(email="test@example.com")).one()
+
+    login_session = LoginSession(
+        key=secrets.token_hex(),
+        expires=arrow.utcnow().shift(hours=1).int_timestamp,
+        user_id=test_user.id,
+    )
+    db.session.add(login_session)
+    db.session.commit()
+
+    flask_session["login_session_key"] = login_session.key
+    flask_session["user_id"] = test_user.id
+    return test_user
@@ -0,0 +1,106 @@
+import queue
+
+import pytest
+
+
+class FakePubSub:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.messages: queue.Queue = queue.Queue()
+        self.channels: set[str] = set()
+
+    def subscribe(self, channel):
+        self.channels.add(channel)
+        self.redis.subscribers.append(self)
+
+    def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        if self in self.redis.subscribers:
+            self.redis.subscribers.remove(self)
+
+
+class FakePipeline:
+    """
+    Queues up calls and runs them on `execute()`
+    """
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.calls: list = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeRedis:
+    """
+    Just enough of the redis client for the cache, sessions and event streams, backed by a dict
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.subscribers: list[FakePubSub] = []
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k.encode(): str(v).encode() for k, v in mapping.items()})
+        return len(mapping)
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def expireat(self, key, when):
+        self.expires[key] = when
+        return key in self.data
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def publish(self, channel, message):
+        subscribers = [sub for sub in self.subscribers if channel in sub.channels]
+        for sub in subscribers:
+            sub.messages.put({"type": "message", "channel": channel.encode(), "data": message.encode()})
+        return len(subscribers)
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+@pytest.fixture
+def fake_redis(app, monkeypatch):
+    """
+    Points the app cache, session storage and event streams at a `FakeRedis`
+    """
+    from app.lib import redis as app_redis
+    from app.lib.cache import cache
+
+    fake = FakeRedis()
+    monkeypatch.setattr(app_redis, "session", fake)
+    monkeypatch.setattr(app_redis, "events", fake)
+    monkeypatch.setattr(cache, "_client", fake)
+    monkeypatch.setattr(cache, "_down_until", 0.0)
+    return fake
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from typing import Any, NamedTuple
+
+import pytest
+import sqlalchemy as sa
+
+
+class Query(NamedTuple):
+    statement: str
+    parameters: Any
+
+
+class Queries(list[Query]):
+    def selecting_from(self, *tables: str) -> list[Query]:
+        """
+        Just the SELECTs from any of `tables`
+        """
+        return [
+            query
+            for query in self
+            if query.statement.lstrip().upper().startswith("SELECT")
+            and any(f"FROM {table}" in query.statement for table in tables)
+        ]
+
+
+@pytest.fixture
+def capture_queries(app):
+    """
+    Returns a context manager which yields the list of `Query` run against the database while it's open
+    """
+    from app import db
+
+    @contextmanager
+    def capture():
+        queries = Queries()
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            queries.append(Query(statement, parameters))
+
+        sa.event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield queries
+        finally:
+            sa.event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    return capture
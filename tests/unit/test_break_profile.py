@@ -0,0 +1,81 @@
+import arrow
+import pytest
+
+from app import db
+from app.models import Break, Time
+
+
+def _add_break(user, day: arrow.Arrow, minutes: int):
+    start = day.replace(hour=12)
+    t = Time(start=day.replace(hour=9).int_timestamp, end=day.replace(hour=17).int_timestamp, user_id=user.id)
+    t.breaks.append(Break(start=start.int_timestamp, end=start.shift(minutes=minutes).int_timestamp, user_id=user.id))
+    db.session.add(t)
+
+
+@pytest.fixture
+def now():
+    # A Wednesday just after the clocks went back
+    return arrow.get("2024-11-06T10:00:00", tzinfo="Europe/London")
+
+
+def test_profile_averages_days_with_breaks(user, now):
+    from app.controllers.core import break_profile
+
+    # Wednesdays, two breaks on one of them and none on another
+    _add_break(user, now.shift(weeks=-1), 30)
+    _add_break(user, now.shift(weeks=-1), 15)
+    _add_break(user, now.shift(weeks=-2), 45)
+    _add_break(user, now.shift(weeks=-4), 60)
+
+    # Too long ago, today and tomorrow aren't counted
+    _add_break(user, now.shift(weeks=-6), 120)
+    _add_break(user, now, 120)
+    _add_break(user, now.shift(days=1), 120)
+
+    # Monday, either side of the clocks changing
+    _add_break(user, now.shift(days=-2), 20)
+    _add_break(user, now.shift(days=-9), 40)
+
+    db.session.commit()
+
+    profile = break_profile(now)
+
+    assert profile[2] == 50 * 60
+    assert profile[0] == 30 * 60
+    assert profile[1] == profile[3] == profile[4] == profile[5] == profile[6] == 0
+
+    assert break_profile(now, weeks=1) == {0: 20 * 60, 1: 0, 2: 45 * 60, 3: 0, 4: 0, 5: 0, 6: 0}
+
+
+def test_profile_is_one_query(user, now, capture_queries):
+    from app.controllers.core import break_profile
+    from app.controllers.user.util import get_user
+
+    for week in range(1, 6):
+        _add_break(user, now.shift(weeks=-week), 30)
+    db.session.commit()
+
+    # Reload the login session after the commit so only the profile is counted
+    assert get_user().id == user.id
+
+    with capture_queries() as queries:
+        break_profile(now)
+
+    assert len(queries) == 1
+
+
+@pytest.mark.parametrize(
+    "config, duration, expected",
+    [
+        ({}, 4 * 60, 0),
+        ({}, 22 * 60, 20 * 60),
+        ({}, 23 * 60, 25 * 60),
+        ({"BREAK_PROFILE_ROUND_TO": 15 * 60}, 23 * 60, 30 * 60),
+        ({"BREAK_PROFILE_MINIMUM": 0, "BREAK_PROFILE_ROUND_TO": 0}, 4 * 60, 4 * 60),
+    ],
+)
+def test_expected_break_duration_rounding(app, config, duration, expected):
+    from app.controllers.core import _expected_break_duration
+
+    app.config.update(config)
+    assert _expected_break_duration(duration) == expected
@@ -0,0 +1,79 @@
+import pytest
+import redis
+
+from app.lib.cache import Cache
+from tests.fixtures.cache import FakeRedis
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise redis.ConnectionError("Connection refused")
+
+        return fail
+
+
+@pytest.fixture
+def cache():
+    cache = Cache()
+    cache.client = FakeRedis()  # type: ignore[assignment]
+    return cache
+
+
+def test_get_and_set(cache):
+    assert cache.get("things", "a") is None
+
+    cache.set("things", "a", {"b": [1, 2]}, ttl=60)
+    assert cache.get("things", "a") == {"b": [1, 2]}
+    assert cache.counters == {"things:miss": 1, "things:hit": 1}
+
+
+def test_decorator_reads_through(cache):
+    calls = []
+
+    @cache.cached("double", ttl=60, key=lambda x: x)
+    def double(x):
+        calls.append(x)
+        return x * 2
+
+    assert [double(1), double(1), double(2)] == [2, 2, 4]
+    assert calls == [1, 2]
+
+
+def test_per_user_cache_is_invalidated_by_writes(user, cache, monkeypatch):
+    import arrow
+
+    from app import db
+    from app.controllers import core, settings
+    from app.models import Time
+
+    monkeypatch.setattr("app.lib.cache.cache", cache)
+    monkeypatch.setattr("app.controllers.core.cache", cache)
+
+    stats = cache.cached("stats", ttl=60, per_user=True)(core.stats.__wrapped__)
+    settings.fetch()
+
+    assert stats().logged_today == "0h 0m"
+    assert stats().logged_today == "0h 0m"
+    assert cache.counters["stats:hit"] == 1
+
+    now = arrow.utcnow()
+    db.session.add(Time(start=now.shift(minutes=-90).int_timestamp, end=now.int_timestamp, user_id=user.id))
+    db.session.commit()
+
+    assert stats().logged_today == "1h 30m"
+
+
+def test_falls_back_when_redis_is_down():
+    cache = Cache()
+    cache.client = DownRedis()  # type: ignore[assignment]
+
+    @cache.cached("double", ttl=60, key=lambda x: x)
+    def double(x):
+        return x * 2
+
+    assert double(2) == 4
+    assert double(2) == 4
+
+    # Redis is only tried once then skipped until `retry_after` has passed
+    assert cache.counters["error"] == 1
@@ -124,3 +124,32 @@ def test_large_range_alt_schedule():
     )
 
     assert hours == 405  # 54 days
+
+
+# == COMPARED TO COUNTING DAY BY DAY == #
+def _count_day_by_day(start: arrow.Arrow, end: arrow.Arrow, hours_per_day: float, days_worked: str) -> float:
+    start = start.floor("day")
+    end = end.floor("day")
+
+    work_days = 0
+    while start <= end:
+        if days_worked[start.weekday()] != "-":
+            work_days += 1
+        start = start.shift(days=1)
+
+    return work_days * hours_per_day
+
+
+def test_matches_counting_day_by_day():
+    import random
+
+    rand = random.Random(1234)
+
+    for _ in range(500):
+        start = arrow.get("2000-01-01", tzinfo="Europe/London").shift(
+            days=rand.randint(0, 9000), hours=rand.randint(0, 23)
+        )
+        end = start.shift(days=rand.randint(-3, 800), hours=rand.randint(-23, 23))
+        days_worked = "".join(day if rand.random() < 0.7 else "-" for day in "MTWTFSS")
+
+        assert calculate_expected_hours(start, end, 7.5, days_worked) == _count_day_by_day(start, end, 7.5, days_worked)
@@ -0,0 +1,84 @@
+import arrow
+import pytest
+
+
+class NoRedis:
+    def __getattr__(self, name):
+        raise AssertionError(f"redis.{name} called")
+
+
+@pytest.fixture
+def no_redis(app, monkeypatch):
+    from app.lib import redis as app_redis
+
+    monkeypatch.setattr(app_redis, "session", NoRedis())
+
+
+def test_signed_token_round_trip(user, no_redis):
+    from app.lib.util.security import generate_csrf_token, get_csrf_token, validate_csrf_token
+
+    generate_csrf_token(user.id)
+
+    token = get_csrf_token()
+    assert get_csrf_token() == token
+    validate_csrf_token(token)
+
+
+@pytest.mark.parametrize("tamper", ["signature", "issued", "garbage"])
+def test_tampered_token_is_rejected(user, no_redis, tamper):
+    from app.lib.util.security import InvalidCSRFToken, get_csrf_token, validate_csrf_token
+
+    issued, _, signature = get_csrf_token().partition(".")
+    token = {
+        "signature": f"{issued}.{signature[::-1]}",
+        "issued": f"{int(issued) + 1}.{signature}",
+        "garbage": "not-a-token",
+    }[tamper]
+
+    with pytest.raises(InvalidCSRFToken):
+        validate_csrf_token(token)
+
+
+def test_expired_token_is_rejected(user, no_redis):
+    from flask import session as flask_session
+
+    from app.lib.util.security import CSRF_TOKEN_MAX_AGE, InvalidCSRFToken, _sign, validate_csrf_token
+
+    issued = arrow.utcnow().int_timestamp - CSRF_TOKEN_MAX_AGE - 1
+    token = f"{issued}.{_sign(flask_session['login_session_key'], issued)}"
+
+    with pytest.raises(InvalidCSRFToken):
+        validate_csrf_token(token)
+
+
+def test_token_rotates_with_login_session(user, no_redis):
+    from flask import session as flask_session
+
+    from app.lib.util.security import InvalidCSRFToken, get_csrf_token, validate_csrf_token
+
+    token = get_csrf_token()
+    flask_session["login_session_key"] = "new-login"
+
+    assert get_csrf_token() != token
+    with pytest.raises(InvalidCSRFToken):
+        validate_csrf_token(token)
+
+
+def test_redis_tokens(app, user, fake_redis):
+    from app.lib.util.security import (
+        InvalidCSRFToken,
+        generate_csrf_token,
+        get_csrf_token,
+        validate_csrf_token,
+    )
+
+    app.config["CSRF_TOKENS"] = "redis"
+    generate_csrf_token(user.id)
+
+    token = get_csrf_token()
+    assert fake_redis.get(f"csrf:{user.id}").decode() == token
+    validate_csrf_token(token)
+
+    generate_csrf_token(user.id)
+    with pytest.raises(InvalidCSRFToken):
+        validate_csrf_token(token)
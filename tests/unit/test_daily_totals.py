@@ -0,0 +1,164 @@
+from datetime import timedelta
+
+import arrow
+import sqlalchemy as sa
+
+from app import db
+from app.controllers import daily_totals, settings
+from app.models import Break, DailyTotal, Leave, Time
+
+
+def _add_history(user, days: int):
+    """
+    Add a day of work with a break for every weekday and some leave for the last `days` days, ending yesterday
+    """
+    start = arrow.now("Europe/London").floor("day").shift(days=-days, hours=9)
+
+    for day in range(days):
+        clock_in = start.shift(days=day)
+        if clock_in.weekday() > 4:
+            continue
+
+        if day % 11 == 0:
+            db.session.add(Leave(leave_type="annual", start=clock_in.int_timestamp, duration=1, user_id=user.id))
+            continue
+
+        t = Time(
+            start=clock_in.int_timestamp, end=clock_in.shift(hours=8, minutes=day % 60).int_timestamp, user_id=user.id
+        )
+        t.breaks.append(
+            Break(
+                start=clock_in.shift(hours=3).int_timestamp,
+                end=clock_in.shift(hours=3, minutes=30).int_timestamp,
+                user_id=user.id,
+            )
+        )
+        db.session.add(t)
+
+    db.session.commit()
+
+
+def _scan(start: arrow.Arrow, end: arrow.Arrow) -> int:
+    """
+    Returns the time logged between two days by loading every record
+    """
+    records = [
+        *Time.between(start.int_timestamp, end.int_timestamp),
+        *Leave.between(start.int_timestamp, end.int_timestamp),
+    ]
+    return sum(rec.logged() for rec in records)
+
+
+def test_totals_match_full_scan(user):
+    _add_history(user, days=120)
+    _settings = settings.fetch()
+
+    today = arrow.now("Europe/London").floor("day")
+    for start, end in [(-120, -1), (-90, -60), (-35, -29), (-7, 0), (-1, 0)]:
+        expected = _scan(today.shift(days=start), today.shift(days=end + 1, seconds=-1))
+        totals = daily_totals.between(_settings, today.shift(days=start).date(), today.shift(days=end).date())
+        assert totals.logged == expected, (start, end)
+
+    # Every day from the first record up to yesterday is stored
+    first_record = db.session.scalar(sa.select(sa.func.min(Time.start)))
+    days = (today.date() - arrow.get(first_record).to("Europe/London").date()).days
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(DailyTotal)) == days
+
+
+def _overtime_scan() -> int:
+    """
+    Returns the all time overtime up to the end of today by loading every record
+    """
+    from app.lib.util.date import calculate_expected_hours
+
+    _settings = settings.fetch()
+    today_end = arrow.now(_settings.timezone).ceil("day")
+
+    records = [*Time.between(0, today_end.int_timestamp), *Leave.between(0, today_end.int_timestamp)]
+    first_day = arrow.get(min(rec.start for rec in records)).to(_settings.timezone).floor("day")
+
+    expected_hours = calculate_expected_hours(first_day, today_end, _settings.hours_per_day, _settings.work_days)
+    return int(sum(rec.logged() for rec in records) - expected_hours * 60 * 60)
+
+
+def test_overtime_matches_full_scan(user):
+    from app.controllers import core
+
+    _add_history(user, days=120)
+
+    assert core.stats().seconds["overtime"] == _overtime_scan()
+
+
+def test_overtime_is_rebuilt_when_settings_change(user):
+    from app.controllers import core
+
+    _add_history(user, days=60)
+    core.stats()
+
+    settings.update(hours_per_day="6", work_day_Monday="on", work_day_Tuesday="on")
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(DailyTotal)) == 0
+    assert core.stats().seconds["overtime"] == _overtime_scan()
+
+
+def test_range_is_two_lookups(user, capture_queries):
+    _add_history(user, days=400)
+    _settings = settings.fetch()
+
+    yesterday = arrow.now("Europe/London").date() - timedelta(days=1)
+    daily_totals.between(_settings, yesterday - timedelta(days=365), yesterday)
+
+    with capture_queries() as queries:
+        daily_totals.between(_settings, yesterday - timedelta(days=200), yesterday - timedelta(days=30))
+
+    assert len(queries) == 2, queries
+
+
+def test_totals_are_invalidated_on_write(user):
+    from app.controllers import time
+
+    _add_history(user, days=60)
+    _settings = settings.fetch()
+
+    today = arrow.now("Europe/London").floor("day")
+    before = daily_totals.between(_settings, today.shift(days=-60).date(), today.date())
+
+    # Extend an entry from a few weeks ago by an hour
+    old = db.session.scalars(sa.select(Time).filter(Time.start < today.shift(days=-20).int_timestamp)).first()
+    assert old
+    start = arrow.get(old.start).to("Europe/London")
+    end = arrow.get(old.end).to("Europe/London").shift(hours=1)
+    time.update(str(old.id), start=start.format("YYYY-MM-DD HH:mm:ss"), end=end.format("YYYY-MM-DD HH:mm:ss"))
+
+    # Only the days from the edit onwards are removed
+    stored = db.session.scalar(sa.select(sa.func.max(DailyTotal.local_date)))
+    assert stored < start.date()
+    assert stored >= start.date() - timedelta(days=2)
+
+    after = daily_totals.between(_settings, today.shift(days=-60).date(), today.date())
+    assert after.worked == before.worked + 60 * 60
+    assert after.expected == before.expected
+
+
+def test_open_records_are_not_stored(user):
+    _add_history(user, days=10)
+    _settings = settings.fetch()
+
+    clock_in = arrow.now("Europe/London").floor("day").shift(days=-3, hours=9)
+    db.session.add(Time(start=clock_in.int_timestamp, user_id=user.id))
+    db.session.commit()
+
+    today = arrow.now("Europe/London").date()
+    totals = daily_totals.between(_settings, today - timedelta(days=10), today)
+
+    assert db.session.scalar(sa.select(sa.func.max(DailyTotal.local_date))) == clock_in.date() - timedelta(days=1)
+    # The open record is counted up to now, which may have moved on by a second or two
+    scan = _scan(arrow.get(today - timedelta(days=10), tzinfo="Europe/London"), arrow.now("Europe/London").ceil("day"))
+    assert abs(totals.logged - scan) <= 5
+
+
+def test_rebuild_cli(app, user):
+    _add_history(user, days=30)
+
+    result = app.test_cli_runner().invoke(args=["data", "rebuild-totals", user.email])
+    assert result.exit_code == 0, result.output
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(DailyTotal)) >= 28
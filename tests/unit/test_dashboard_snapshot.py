@@ -0,0 +1,87 @@
+import arrow
+import pytest
+
+from app import db
+from app.models import Break, Time
+
+
+@pytest.fixture
+def client(app, user, fake_redis):
+    from flask import session as flask_session
+
+    from app.controllers import settings
+    from app.lib.util.security import generate_csrf_token
+
+    generate_csrf_token(user.id)
+    settings.fetch()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = flask_session["login_session_key"]
+        session["user_id"] = user.id
+    return client
+
+
+def _clock_in(user, on_break: bool = False):
+    start = arrow.utcnow().shift(minutes=-30).int_timestamp
+    rec = Time(start=start, user_id=user.id)
+    if on_break:
+        rec.breaks.append(Break(start=start + 60, user_id=user.id))
+
+    db.session.add(rec)
+    db.session.commit()
+
+
+def test_snapshot_json(client, user):
+    _clock_in(user, on_break=True)
+
+    response = client.get("/frames/dashboard?format=json")
+    assert response.status_code == 200
+
+    snapshot = response.get_json()
+    assert snapshot["clocked_in"] is True
+    assert snapshot["on_break"] is True
+    assert set(snapshot["stats"]) >= {"logged_today", "overtime", "estimated_finish_time"}
+
+    [entry] = snapshot["entries"]
+    assert entry["type"] == "Time"
+    assert entry["end"] is None
+    assert len(entry["breaks"]) == 1
+
+
+def test_snapshot_clock_state_outside_viewed_week(client, user):
+    _clock_in(user)
+
+    response = client.get("/frames/dashboard?format=json&week=2000-W01")
+    snapshot = response.get_json()
+
+    assert snapshot["clocked_in"] is True
+    assert snapshot["on_break"] is False
+    assert snapshot["entries"] == []
+
+
+def test_snapshot_html_has_every_frame(client, user):
+    _clock_in(user)
+
+    response = client.get("/frames/dashboard")
+    html = response.get_data(as_text=True)
+
+    for frame in ["stats", "clock-form", "log-table"]:
+        assert f'<template data-frame="{frame}">' in html
+    assert 'value="out"' in html
+
+
+def test_snapshot_uses_fewer_queries_than_the_frames(client, user, capture_queries):
+    _clock_in(user, on_break=True)
+
+    # Stats are cached for the minute, load them first so only the other frames are compared
+    client.get("/frames/stats")
+
+    with capture_queries() as separate:
+        for url in ["/frames/clock_in_form", "/frames/entries"]:
+            client.get(url)
+
+    with capture_queries() as combined:
+        client.get("/frames/dashboard")
+
+    assert len(combined) < len(separate)
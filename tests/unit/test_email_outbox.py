@@ -0,0 +1,162 @@
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.models import OutboxEmail
+
+
+@pytest.fixture
+def outbox(app):
+    """
+    Send emails through an in-memory transport and drain the outbox by hand
+    """
+    from app.lib.email import MemoryTransport
+
+    app.config["EMAIL_OUTBOX_WORKER"] = False
+    app.extensions["email_transport"] = MemoryTransport()
+    return app.extensions["email_transport"]
+
+
+class FailingTransport:
+    def send_batch(self, emails):
+        raise ConnectionError("Postmark is down")
+
+
+class RejectingTransport:
+    def send_batch(self, emails):
+        return ["Inactive recipient" if "bounce" in e.to_email else None for e in emails]
+
+
+def _statuses() -> list[tuple[str, str, int]]:
+    return [
+        (e.to_email, e.status, e.attempts) for e in db.session.scalars(sa.select(OutboxEmail).order_by(OutboxEmail.id))
+    ]
+
+
+def test_send_email_is_queued_until_drained(outbox):
+    from app.lib.email import drain_outbox, send_email
+
+    send_email("one@example.com", "Hello", "<p>Hello</p>")
+    send_email("two@example.com", "Hello", "<p>Hello</p>")
+
+    assert outbox.sent == []
+    assert _statuses() == [("one@example.com", "pending", 0), ("two@example.com", "pending", 0)]
+
+    assert drain_outbox() == 2
+    assert [m["to"] for m in outbox.sent] == ["one@example.com", "two@example.com"]
+
+    # Sent emails are removed from the outbox
+    assert _statuses() == []
+    assert drain_outbox() == 0
+
+
+def test_failed_batch_is_retried_then_given_up_on(outbox):
+    from app.lib import email
+
+    email.send_email("one@example.com", "Hello", "<p>Hello</p>")
+
+    assert email.drain_outbox(FailingTransport()) == 1  # type: ignore[arg-type]
+    assert _statuses() == [("one@example.com", "pending", 1)]
+
+    # Not due again until the backoff has passed
+    assert email.drain_outbox(FailingTransport()) == 0  # type: ignore[arg-type]
+
+    for attempt in range(2, email.MAX_ATTEMPTS + 1):
+        db.session.execute(sa.update(OutboxEmail).values(next_attempt_at=0))
+        assert email.drain_outbox(FailingTransport()) == 1  # type: ignore[arg-type]
+
+    assert _statuses() == [("one@example.com", "failed", email.MAX_ATTEMPTS)]
+
+
+def test_rejected_email_does_not_hold_up_batch(outbox):
+    from app.lib.email import drain_outbox, send_email
+
+    send_email("bounce@example.com", "Hello", "<p>Hello</p>")
+    send_email("ok@example.com", "Hello", "<p>Hello</p>")
+
+    assert drain_outbox(RejectingTransport()) == 2  # type: ignore[arg-type]
+    assert _statuses() == [("bounce@example.com", "failed", 0)]
+
+
+def test_file_transport(outbox, tmp_path):
+    import json
+
+    from app.lib.email import FileTransport, drain_outbox, send_email
+
+    send_email("one@example.com", "Hello", "<p>Hello</p>")
+    drain_outbox(FileTransport(str(tmp_path)))
+
+    [written] = tmp_path.iterdir()
+    assert json.loads(written.read_text()) == {"to": "one@example.com", "subject": "Hello", "html": "<p>Hello</p>"}
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+def _postmark(monkeypatch, response: FakeResponse):
+    import requests
+
+    from app.lib.email import PostmarkTransport
+
+    sent = []
+
+    def post(url, json, **kwargs):
+        sent.append(json)
+        return response
+
+    monkeypatch.setattr(requests, "post", post)
+    return PostmarkTransport("token", "from@example.com"), sent
+
+
+def test_postmark_only_fails_rejected_recipients(outbox, monkeypatch):
+    from app.lib.email import drain_outbox, send_email
+
+    send_email("inactive@example.com", "Hello", "<p>Hello</p>")
+    send_email("ok@example.com", "Hello", "<p>Hello</p>")
+
+    transport, sent = _postmark(
+        monkeypatch,
+        FakeResponse(
+            200,
+            [
+                {"ErrorCode": 406, "Message": "You tried to send to a recipient that has been marked as inactive."},
+                {"ErrorCode": 0, "Message": "OK"},
+            ],
+        ),
+    )
+
+    assert drain_outbox(transport) == 2
+    assert [message["To"] for message in sent[0]] == ["inactive@example.com", "ok@example.com"]
+
+    # The delivered email isn't sent again
+    assert _statuses() == [("inactive@example.com", "failed", 0)]
+
+
+@pytest.mark.parametrize(
+    "response, status, attempts",
+    [
+        (FakeResponse(422, {"ErrorCode": 400, "Message": "Sender signature not confirmed"}), "failed", 0),
+        (FakeResponse(500, {}), "pending", 1),
+    ],
+)
+def test_postmark_request_errors(outbox, monkeypatch, response, status, attempts):
+    from app.lib.email import drain_outbox, send_email
+
+    send_email("one@example.com", "Hello", "<p>Hello</p>")
+
+    transport, _ = _postmark(monkeypatch, response)
+
+    assert drain_outbox(transport) == 1
+    assert _statuses() == [("one@example.com", status, attempts)]
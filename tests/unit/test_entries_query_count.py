@@ -0,0 +1,55 @@
+import arrow
+
+from app import db
+from app.models import Break, Leave, Time
+
+
+def _add_entries(user, count: int):
+    """
+    Add `count` time records, each with two breaks, and `count` leave records to the current week
+    """
+    week_start = arrow.now("Europe/London").floor("week").shift(hours=12)
+
+    for i in range(count):
+        clock_in = week_start.shift(minutes=i * 5)
+        t = Time(start=clock_in.int_timestamp, end=clock_in.shift(minutes=4).int_timestamp, user_id=user.id)
+        for b in range(2):
+            t.breaks.append(
+                Break(
+                    start=clock_in.shift(minutes=b).int_timestamp,
+                    end=clock_in.shift(minutes=b + 1).int_timestamp,
+                    user_id=user.id,
+                )
+            )
+        db.session.add(t)
+        db.session.add(Leave(leave_type="annual", start=clock_in.int_timestamp, duration=0.1, user_id=user.id))
+
+    db.session.commit()
+
+
+def _queries_for_entries_frame(app, capture_queries) -> int:
+    from flask import session as flask_session
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = flask_session["login_session_key"]
+
+    with capture_queries() as queries:
+        response = client.get("/frames/entries")
+
+    assert response.status_code == 200
+    return len(queries)
+
+
+def test_entries_query_count_is_constant(app, user, capture_queries):
+    from app.controllers import settings
+
+    settings.fetch()
+
+    _add_entries(user, 2)
+    few = _queries_for_entries_frame(app, capture_queries)
+
+    _add_entries(user, 20)
+    many = _queries_for_entries_frame(app, capture_queries)
+
+    assert few == many
@@ -0,0 +1,129 @@
+import json
+
+import arrow
+import pytest
+
+from app import db
+from app.models import Time
+
+
+@pytest.fixture
+def client(app, user, fake_redis):
+    from flask import session as flask_session
+
+    from app.controllers import settings
+    from app.lib.util.security import generate_csrf_token
+
+    generate_csrf_token(user.id)
+    settings.fetch()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = flask_session["login_session_key"]
+        session["user_id"] = user.id
+    return client
+
+
+@pytest.fixture
+def slots(monkeypatch):
+    import threading
+
+    from app.lib import events
+
+    slots = threading.BoundedSemaphore(2)
+    monkeypatch.setattr(events, "_slots", slots)
+    return slots
+
+
+def _events(body: str) -> list[tuple[str, object]]:
+    parsed = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith((":", "retry")))
+        if "event" in fields:
+            parsed.append((fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+def test_commit_publishes_changed(user, fake_redis, slots):
+    from app.lib import events
+
+    stream = events.open_stream(user.id)
+    assert stream is not None
+    messages = iter(stream)
+
+    assert next(messages).startswith("retry:")
+    assert next(messages) == events.format_event("ready")
+
+    db.session.add(Time(start=arrow.utcnow().int_timestamp, user_id=user.id))
+    db.session.commit()
+
+    assert next(messages) == events.format_event("changed")
+    stream.close()
+
+
+def test_streams_are_per_user(user, fake_redis, slots):
+    from app.lib import events
+
+    stream = events.open_stream(user.id)
+    messages = iter(stream)
+    next(messages), next(messages)
+
+    events.publish(user.id + 1, "changed")
+
+    stream.lifetime = 0.1
+    assert next(messages) == ": keepalive\n\n"
+    stream.close()
+
+
+def test_closing_a_stream_frees_its_slot(user, fake_redis, slots):
+    from app.lib import events
+
+    streams = [events.open_stream(user.id), events.open_stream(user.id)]
+    assert events.open_stream(user.id) is None
+
+    streams[0].close()
+    streams[0].close()
+    assert fake_redis.subscribers == [streams[1].pubsub]
+
+    assert events.open_stream(user.id) is not None
+
+
+def test_event_stream_response(app, client, user, slots):
+    app.config["EVENTS_STREAM_SECONDS"] = 0.1
+
+    response = client.get("/events")
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert _events(response.get_data(as_text=True)) == [("ready", None)]
+
+    # The slot is handed back once the server closes the response
+    response.close()
+    assert slots.acquire(blocking=False) and slots.acquire(blocking=False)
+
+
+def test_no_free_slots_falls_back_to_polling(client, slots):
+    slots.acquire()
+    slots.acquire()
+
+    assert client.get("/events").status_code == 204
+
+
+def test_stats_baseline_while_clocked_in(user, fake_redis):
+    from app.controllers import core, settings
+
+    settings.fetch()
+    db.session.add(Time(start=arrow.utcnow().shift(minutes=-30).int_timestamp, user_id=user.id))
+    db.session.commit()
+
+    stats = core.stats()
+    assert stats.running
+    assert stats.as_of == pytest.approx(arrow.utcnow().int_timestamp, abs=5)
+    assert stats.seconds["logged_today"] == pytest.approx(30 * 60, abs=5)
+    assert stats.day_ends > stats.as_of
+
+
+def test_threads_and_pool_are_sized_from_max_streams(app):
+    from app.lib.events import OTHER_REQUEST_THREADS, worker_threads
+
+    assert worker_threads({"EVENTS_MAX_STREAMS": 10}) == 10 + OTHER_REQUEST_THREADS
+    assert db.engine.pool.size() == worker_threads(app.config)  # type: ignore[attr-defined]
@@ -0,0 +1,122 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from app import db
+from app.models import Break, Leave, Time, UserToSlackToken
+
+
+@pytest.fixture
+def history(user, monkeypatch):
+    """
+    Time records with and without breaks, leave and a Slack team, with a small page size so every format pages
+    """
+    from app.controllers import settings
+    from app.controllers.user import export
+
+    monkeypatch.setattr(export, "PAGE_SIZE", 2)
+
+    settings.fetch()
+
+    for i in range(5):
+        t = Time(start=1_700_000_000 + i * 86400, end=1_700_028_800 + i * 86400, note=f"day {i}", user_id=user.id)
+        for b in range(i % 3):
+            start = t.start + 3600 * (b + 1)
+            t.breaks.append(Break(start=start, end=start + 600, user_id=user.id))
+        db.session.add(t)
+
+    for i in range(3):
+        db.session.add(Leave(leave_type="annual", start=1_701_000_000 + i * 86400, duration=1, user_id=user.id))
+
+    db.session.add(UserToSlackToken(slack_token="xoxp-secret", team_name="Acme", user_id=user.id))
+    db.session.commit()
+
+    return user
+
+
+def _export(user, format: str, compress: bool = False) -> str:
+    from app.controllers.user.export import export_data
+
+    output = b"".join(export_data(user, format, compress=compress))
+    return (gzip.decompress(output) if compress else output).decode()
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_json_export(history, compress):
+    export = json.loads(_export(history, "json", compress))
+
+    assert export["user"]["email"] == "test@example.com"
+    assert export["settings"]["timezone"] == "Europe/London"
+    assert export["slack_teams"] == ["Acme"]
+
+    assert [t["note"] for t in export["time"]] == [f"day {i}" for i in range(5)]
+    assert [len(t["breaks"]) for t in export["time"]] == [0, 1, 2, 0, 1]
+    assert export["time"][2]["breaks"][1] == {
+        "time_id": export["time"][2]["id"],
+        "start": 1_700_000_000 + 2 * 86400 + 7200,
+        "end": 1_700_000_000 + 2 * 86400 + 7800,
+        "note": None,
+        "user_id": history.id,
+    }
+
+    assert len(export["leave"]) == 3
+    assert "xoxp-secret" not in json.dumps(export)
+
+
+def test_ndjson_export(history):
+    lines = [json.loads(line) for line in _export(history, "ndjson").splitlines()]
+
+    assert [line["type"] for line in lines] == ["user", "settings", "slack_team"] + ["time"] * 5 + ["leave"] * 3
+    assert sum(len(line["breaks"]) for line in lines if line["type"] == "time") == 4
+
+
+def test_csv_export(history):
+    rows = list(csv.DictReader(io.StringIO(_export(history, "csv"))))
+
+    assert [row["type"] for row in rows] == [
+        *["time", "time", "break", "time", "break", "break", "time", "time", "break"],
+        *["leave"] * 3,
+    ]
+    assert rows[0]["note"] == "day 0"
+    assert rows[-1]["leave_type"] == "annual"
+
+    # Each break has the ID of the time record it follows
+    time_id = None
+    for row in rows:
+        if row["type"] == "time":
+            time_id = row["id"]
+        elif row["type"] == "break":
+            assert row["time_id"] == time_id
+
+
+def test_unknown_format(history):
+    from app.controllers.user.export import export_data
+
+    with pytest.raises(ValueError):
+        export_data(history, "xml")
+
+
+def test_export_is_streamed(app, history, fake_redis):
+    from flask import session as flask_session
+
+    from app.lib.util.security import generate_csrf_token, get_csrf_token
+
+    generate_csrf_token(history.id)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = flask_session["login_session_key"]
+
+    response = client.post(
+        "/settings/account",
+        data={"submit": "export", "export_format": "ndjson.gz", "csrf_token": get_csrf_token()},
+    )
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers["Content-Type"] == "application/gzip"
+    assert response.headers["Content-Disposition"] == 'attachment; filename="log-my-time.ndjson.gz"'
+    assert len(gzip.decompress(response.data).splitlines()) == 11
@@ -0,0 +1,89 @@
+import arrow
+import pytest
+
+from app import db
+from app.models import Time
+
+
+@pytest.fixture
+def client(app, user, fake_redis):
+    from flask import session as flask_session
+
+    from app.controllers import settings
+    from app.lib.util.security import generate_csrf_token
+
+    generate_csrf_token(user.id)
+
+    # Default settings are created on first use, which would count as a change
+    settings.fetch()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = flask_session["login_session_key"]
+        session["user_id"] = user.id
+    return client
+
+
+@pytest.mark.parametrize("url", ["/frames/entries", "/frames/clock_in_form", "/frames/stats", "/frames/dashboard"])
+def test_unchanged_frame_is_not_modified(client, url, capture_queries):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["ETag"]
+
+    with capture_queries() as queries:
+        response = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+
+    assert response.status_code == 304
+    # Only the login session is checked, without loading the user
+    [(statement, _)] = queries
+    assert "FROM login_session" in statement
+    assert "JOIN" not in statement
+
+
+def test_logged_out_session_is_not_modified(client, user):
+    from flask import session as flask_session
+
+    from app.controllers.user.util import forget_user
+    from app.lib.session_store import session_store
+
+    url = "/frames/stats"
+    etag = client.get(url).headers["ETag"]
+
+    session_store().delete(flask_session["login_session_key"])
+    # The test client shares `g` with the fixture
+    forget_user()
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code != 304
+    assert "ETag" not in response.headers
+
+
+def test_write_changes_etag(client, user):
+    etag = client.get("/frames/clock_in_form").headers["ETag"]
+
+    db.session.add(Time(start=arrow.utcnow().shift(hours=-1).int_timestamp, user_id=user.id))
+    db.session.commit()
+
+    response = client.get("/frames/clock_in_form", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_expired_etag_is_not_matched(client):
+    etag = client.get("/frames/stats").headers["ETag"]
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(arrow, "utcnow", lambda: arrow.Arrow.utcnow().shift(minutes=1))
+        response = client.get("/frames/stats", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+
+
+def test_no_etag_without_cache(client, monkeypatch):
+    from app.lib.cache import cache
+
+    monkeypatch.setattr(cache, "_down_until", float("inf"))
+
+    response = client.get("/frames/clock_in_form")
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
@@ -0,0 +1,44 @@
+from datetime import date
+
+import holidays
+import pytest
+
+
+@pytest.fixture
+def calendar(app, fake_redis):
+    from app.lib import holiday_calendar
+
+    holiday_calendar._year.cache_clear()
+    yield holiday_calendar
+    holiday_calendar._year.cache_clear()
+
+
+def test_between_matches_holidays(calendar):
+    expected = sorted(holidays.country_holidays("GB", subdiv="SCT", years=[2023, 2024]).items())
+    expected = [(dt, name) for dt, name in expected if date(2023, 3, 1) <= dt <= date(2024, 11, 30)]
+
+    assert calendar.between("GB/SCT", date(2023, 3, 1), date(2024, 11, 30)) == expected
+
+    # St Andrew's Day is the last day of the range
+    assert calendar.between("GB/SCT", date(2024, 11, 30), date(2024, 11, 30)) == [
+        (date(2024, 11, 30), "Saint Andrew's Day")
+    ]
+
+
+def test_next_holiday(calendar):
+    assert calendar.next_holiday("GB/ENG", date(2024, 12, 25)) == (date(2024, 12, 26), "Boxing Day")
+    assert calendar.next_holiday("GB/ENG", date(2024, 12, 26)) == (date(2025, 1, 1), "New Year's Day")
+
+
+def test_calendars_are_shared(calendar, fake_redis, monkeypatch):
+    calendar.warm(range(2024, 2026))
+    assert calendar._year.cache_info().currsize == len(calendar.HOLIDAY_LOCATIONS) * 2
+
+    # Another worker gets them from redis rather than building them again
+    calendar._year.cache_clear()
+    monkeypatch.setattr(holidays, "country_holidays", lambda *args, **kwargs: pytest.fail("Calendar was rebuilt"))
+
+    assert calendar.between("GB/WLS", date(2024, 1, 1), date(2025, 12, 31))[:2] == [
+        (date(2024, 1, 1), "New Year's Day"),
+        (date(2024, 3, 29), "Good Friday"),
+    ]
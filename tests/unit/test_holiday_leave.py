@@ -0,0 +1,91 @@
+from datetime import date
+
+import arrow
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.models import Leave, Settings, User
+
+
+@pytest.fixture
+def users(app, fake_redis):
+    """
+    Users in a few locations and timezones, one of whom has already added Christmas
+    """
+    from app.lib import holiday_calendar
+
+    holiday_calendar._year.cache_clear()
+
+    users = {}
+    for email, location, timezone, work_days in (
+        ("scotland@example.com", "GB/SCT", "Europe/London", "MTWTF--"),
+        ("england@example.com", "GB/ENG", "Europe/London", "MTWTF--"),
+        ("part-time@example.com", "GB/ENG", "Europe/London", "M-W----"),
+        ("abroad@example.com", "GB/ENG", "America/New_York", "MTWTF--"),
+        ("nowhere@example.com", None, "Europe/London", "MTWTF--"),
+    ):
+        user = User(email=email)
+        db.session.add(user)
+        db.session.flush()
+
+        settings = Settings.default(user.id)
+        settings.holiday_location = location
+        settings.timezone = timezone
+        settings.work_days = work_days
+        db.session.add(settings)
+
+        users[email] = user
+
+    christmas = arrow.get(date(2024, 12, 25), tzinfo="Europe/London").int_timestamp
+    db.session.add(
+        Leave(
+            leave_type="annual",
+            start=christmas,
+            duration=1,
+            public_holiday=True,
+            user_id=users["england@example.com"].id,
+        )
+    )
+    db.session.commit()
+
+    yield users
+
+    holiday_calendar._year.cache_clear()
+
+
+def _holidays(user: User) -> list[tuple[date, str]]:
+    tz = db.session.scalars(sa.select(Settings.timezone).filter_by(user_id=user.id)).one()
+    leave = db.session.scalars(sa.select(Leave).filter_by(user_id=user.id, public_holiday=True).order_by(Leave.start))
+    return [(arrow.get(rec.start).to(tz).date(), rec.note) for rec in leave]
+
+
+def test_holiday_leave_is_added(users):
+    from app.controllers.holidays import generate_public_holiday_leave
+
+    added = generate_public_holiday_leave(2024, since=date(2024, 11, 1), batch_size=2)
+
+    assert _holidays(users["scotland@example.com"]) == [
+        (date(2024, 12, 2), "Saint Andrew's Day (observed)"),
+        (date(2024, 12, 25), "Christmas Day"),
+        (date(2024, 12, 26), "Boxing Day"),
+    ]
+    assert [dt for dt, _ in _holidays(users["england@example.com"])] == [date(2024, 12, 25), date(2024, 12, 26)]
+    assert [dt for dt, _ in _holidays(users["part-time@example.com"])] == [date(2024, 12, 25)]
+    assert [dt for dt, _ in _holidays(users["abroad@example.com"])] == [date(2024, 12, 25), date(2024, 12, 26)]
+    assert _holidays(users["nowhere@example.com"]) == []
+
+    assert added == 3 + 1 + 1 + 2
+
+    # Running again adds nothing
+    assert generate_public_holiday_leave(2024, since=date(2024, 11, 1), batch_size=2) == 0
+
+
+def test_holiday_leave_cli(app, users):
+    result = app.test_cli_runner().invoke(args=["data", "holiday-leave", "--year", "2024", "--include-past"])
+
+    assert result.exit_code == 0, result.output
+    assert "Added" in result.output
+
+    # Saint Andrew's Day itself is on a Saturday
+    assert len(_holidays(users["scotland@example.com"])) == 9
@@ -0,0 +1,207 @@
+import io
+import json
+
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.models import Break, Leave, Time
+
+
+@pytest.fixture
+def history(user):
+    from app.controllers import settings
+
+    settings.fetch()
+
+    for i in range(5):
+        t = Time(start=1_700_000_000 + i * 86400, end=1_700_028_800 + i * 86400, note=f"day {i}", user_id=user.id)
+        for b in range(i % 3):
+            start = t.start + 3600 * (b + 1)
+            t.breaks.append(Break(start=start, end=start + 600, note="lunch", user_id=user.id))
+        db.session.add(t)
+
+    db.session.add(Time(start=1_700_500_000, user_id=user.id))
+    db.session.add(Leave(leave_type="sick", start=1_701_000_000, duration=0.5, public_holiday=False, user_id=user.id))
+    db.session.add(Leave(leave_type="annual", start=1_701_086_400, duration=1, public_holiday=True, user_id=user.id))
+    db.session.commit()
+
+    return user
+
+
+def _snapshot(user_id: int) -> list:
+    times = db.session.execute(
+        sa.select(Time.start, Time.end, Time.note).filter_by(user_id=user_id).order_by(Time.start)
+    )
+    breaks = db.session.execute(
+        sa.select(Break.start, Break.end, Break.note).filter_by(user_id=user_id).order_by(Break.start)
+    )
+    leave = db.session.execute(
+        sa.select(Leave.leave_type, Leave.start, Leave.duration, Leave.public_holiday).filter_by(user_id=user_id)
+    )
+    return [times.all(), breaks.all(), sorted(leave.all())]
+
+
+def _clear(user_id: int):
+    for model in (Break, Time, Leave):
+        db.session.execute(sa.delete(model).filter_by(user_id=user_id))
+    db.session.commit()
+
+
+@pytest.mark.parametrize("file_format", ["json", "ndjson", "csv"])
+def test_export_round_trips(history, file_format):
+    from app.controllers.user.export import export_data
+    from app.controllers.user.importer import import_data
+
+    before = _snapshot(history.id)
+    exported = b"".join(export_data(history, file_format)).decode()
+
+    _clear(history.id)
+    result = import_data(history, io.StringIO(exported), file_format)
+
+    assert (result.time, result.breaks, result.leave) == (6, 4, 2)
+    assert _snapshot(history.id) == before
+
+
+def test_breaks_must_belong_to_their_time_record(user):
+    from app.controllers.user.importer import InvalidImport, import_data
+
+    file = io.StringIO(
+        "type,id,time_id,start,end\n"
+        "time,7,,1710000000,1710028800\n"
+        "break,,7,1710003600,1710004200\n"
+        "time,8,,1710086400,1710115200\n"
+        "break,,7,1710090000,1710090600\n"
+    )
+
+    with pytest.raises(InvalidImport) as e:
+        import_data(user, file, "csv")
+
+    assert e.value.errors == ["line 4: break for time record 7 is listed under 8"]
+
+
+def test_local_times_use_the_users_timezone(user):
+    from app.controllers import settings
+    from app.controllers.user.importer import import_data
+
+    settings.fetch().timezone = "America/New_York"
+    db.session.commit()
+
+    file = io.StringIO(
+        "type,start,end,duration,leave_type,public_holiday,note\n"
+        "time,2024-07-01T09:00:00,2024-07-01T17:00:00,,,,\n"
+        "break,2024-07-01T12:00:00+00:00,2024-07-01T12:30:00+00:00,,,,\n"
+    )
+    import_data(user, file, "csv")
+
+    t = db.session.scalars(sa.select(Time).filter_by(user_id=user.id)).one()
+    assert (t.start, t.end) == (1719838800, 1719867600)
+    assert [(b.start, b.end) for b in t.breaks] == [(1719835200, 1719837000)]
+
+
+def test_invalid_records_import_nothing(history):
+    from app.controllers.user.importer import InvalidImport, import_data
+
+    before = _snapshot(history.id)
+    lines = [
+        {"type": "time", "start": 1_710_000_000, "end": 1_710_003_600},
+        {"type": "time", "start": 1_710_000_000, "end": 1_709_000_000},
+        {"type": "leave", "start": 1_710_000_000, "duration": 1, "leave_type": "holiday"},
+        {"type": "time", "start": "yesterday"},
+    ]
+
+    with pytest.raises(InvalidImport) as e:
+        import_data(history, io.StringIO("\n".join(json.dumps(line) for line in lines)), "ndjson")
+
+    assert e.value.errors == [
+        "line 2: ends before it starts",
+        "line 3: leave_type must be one of annual, sick",
+        "line 4: invalid start or end",
+    ]
+    assert _snapshot(history.id) == before
+
+
+def test_large_import_is_batched(user):
+    import time
+
+    from app.controllers.user.importer import import_data
+
+    lines = (
+        json.dumps(
+            {
+                "type": "time",
+                "start": 1_600_000_000 + i * 3600,
+                "end": 1_600_001_800 + i * 3600,
+                "breaks": [{"start": 1_600_000_600 + i * 3600, "end": 1_600_000_900 + i * 3600}],
+            }
+        )
+        for i in range(20_000)
+    )
+
+    started = time.perf_counter()
+    result = import_data(user, io.StringIO("\n".join(lines)), "ndjson")
+
+    assert (result.time, result.breaks) == (20_000, 20_000)
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(Break).filter_by(user_id=user.id)) == 20_000
+    assert time.perf_counter() - started < 10
+
+
+def test_import_cli(app, history, tmp_path):
+    from app.controllers.user.export import export_data
+
+    path = tmp_path / "export.ndjson.gz"
+    path.write_bytes(b"".join(export_data(history, "ndjson", compress=True)))
+
+    result = app.test_cli_runner().invoke(args=["data", "import", "test@example.com", str(path)])
+
+    assert result.exit_code == 0, result.output
+    assert "Imported 6 time, 4 break and 2 leave records" in result.output
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(Time).filter_by(user_id=history.id)) == 12
+
+
+def test_decompressed_size_is_capped(user):
+    import gzip
+
+    from app.controllers.user.importer import InvalidImport, import_data, open_upload
+
+    bomb = io.BytesIO(gzip.compress(b"[" + b" " * 10_000_000 + b"]"))
+
+    with pytest.raises(InvalidImport), open_upload(bomb, compressed=True, limit=1_000_000) as file:
+        import_data(user, file, "json")
+
+
+@pytest.fixture
+def client(app, history, fake_redis):
+    from flask import session as flask_session
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = flask_session["login_session_key"]
+    return client
+
+
+def _upload(client, content: bytes, filename: str):
+    from app.lib.util.security import get_csrf_token
+
+    return client.post(
+        "/settings/account/import",
+        data={"file": (io.BytesIO(content), filename), "csrf_token": get_csrf_token()},
+        content_type="multipart/form-data",
+    )
+
+
+@pytest.mark.parametrize("content", [b"not gzip at all", b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\x03truncated"])
+def test_corrupt_upload_is_an_invalid_import(client, content):
+    response = _upload(client, content, "export.json.gz")
+
+    assert response.status_code == 302
+    assert response.location == "/settings/account"
+
+
+def test_upload_size_is_capped(app, client):
+    app.config["MAX_CONTENT_LENGTH"] = 1024
+
+    response = _upload(client, b"[]" + b" " * 2048, "export.json")
+
+    assert response.status_code == 302
+    assert response.location == "/settings/account"
@@ -0,0 +1,115 @@
+import re
+
+import arrow
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.models import Break, Leave, Time
+
+# Tables which grow with a user's history and must never be fully scanned
+HISTORY_TABLES = ("time", "leave", "break", "daily_total")
+
+
+@pytest.fixture
+def history(user):
+    """
+    A few weeks of time, break and leave records with the user currently clocked in and on a break
+    """
+    start = arrow.now("Europe/London").floor("day").shift(weeks=-6, hours=9)
+
+    for day in range(6 * 7):
+        clock_in = start.shift(days=day)
+        t = Time(start=clock_in.int_timestamp, end=clock_in.shift(hours=8).int_timestamp, user_id=user.id)
+        t.breaks.append(
+            Break(
+                start=clock_in.shift(hours=3).int_timestamp, end=clock_in.shift(hours=4).int_timestamp, user_id=user.id
+            )
+        )
+        db.session.add(t)
+
+    db.session.add(Leave(leave_type="annual", start=start.shift(days=3).int_timestamp, duration=1, user_id=user.id))
+
+    current = Time(start=arrow.utcnow().shift(hours=-2).int_timestamp, user_id=user.id)
+    current.breaks.append(Break(start=arrow.utcnow().shift(minutes=-5).int_timestamp, user_id=user.id))
+    db.session.add(current)
+    db.session.commit()
+
+
+def _history_tables(statement: str) -> dict[str, str]:
+    """
+    Maps each name a history table goes by in `statement`, including its aliases, to the table
+    """
+    tables = {table: table for table in HISTORY_TABLES}
+    for table, alias in re.findall(r'(?:FROM|JOIN) "?(\w+)"? AS (\w+)', statement):
+        if table in HISTORY_TABLES:
+            tables[alias] = table
+    return tables
+
+
+def _full_scans(statement: str, parameters: tuple) -> list[str]:
+    """
+    Returns any steps of the query plan that scan a history table without an index
+    """
+    plan = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    tables = _history_tables(statement)
+
+    scans = []
+    for _, _, _, detail in plan:
+        if (match := re.match(r"SCAN (\w+)", detail)) and match.group(1) in tables and "USING" not in detail:
+            scans.append(detail)
+    return scans
+
+
+def _hot_queries():
+    """
+    What the dashboard runs
+    """
+    from app.controllers import core, daily_totals, settings, time
+
+    _settings = settings.fetch()
+    now = arrow.now(_settings.timezone)
+    yesterday = now.shift(days=-1).date()
+
+    core.stats()
+    core.dashboard()
+    core.week_list()
+    core.break_profile(now)
+    [rec.logged() for rec in core.records_for_week()]
+    time.current()
+    time.current_break()
+    daily_totals.stored_until(_settings, yesterday)
+    daily_totals.between(_settings, yesterday.replace(day=1), yesterday)
+
+
+def test_hot_queries_use_indexes(history, capture_queries):
+    with capture_queries() as queries:
+        _hot_queries()
+
+    assert queries
+
+    for statement, parameters in queries:
+        assert not _full_scans(statement, parameters), statement
+
+
+def test_aliased_scans_are_found(history):
+    query = sa.select(sa.orm.aliased(Time)).filter_by(note="nothing")
+    compiled = query.compile(db.engine)
+    statement = str(compiled)
+    assert "AS time_1" in statement
+
+    assert _full_scans(statement, tuple(compiled.params.values()))
+
+
+def test_open_records_use_partial_indexes(history, capture_queries):
+    from app.controllers import time
+
+    for func, index in (
+        (time.current, "ix_time_user_id_start_open"),
+        (time.current_break, "ix_break_user_id_start_open"),
+    ):
+        with capture_queries() as queries:
+            func()
+
+        plans = [db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {s}", p).all() for s, p in queries]
+        assert any(index in row[3] for plan in plans for row in plan)
@@ -0,0 +1,165 @@
+import time
+from datetime import date, timedelta
+
+import arrow
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.controllers import daily_totals, reports, settings
+from app.models import Break, Leave, Time
+
+
+def _add_history(user, start: date, end: date):
+    """
+    Add a day of work with a break for every weekday, and a day of leave each month, using bulk inserts
+    """
+    times, leave = [], []
+    day = start
+    while day <= end:
+        clock_in = arrow.get(day, tzinfo="Europe/London").shift(hours=9)
+        if day.day == 15:
+            leave.append({"leave_type": "annual", "start": clock_in.int_timestamp, "duration": 1, "user_id": user.id})
+        elif day.weekday() < 5:
+            times.append(
+                {
+                    "start": clock_in.int_timestamp,
+                    "end": clock_in.shift(hours=8, minutes=day.day).int_timestamp,
+                    "user_id": user.id,
+                }
+            )
+        day += timedelta(days=1)
+
+    time_ids = db.session.scalars(sa.insert(Time).returning(Time.id, sort_by_parameter_order=True), times).all()
+    db.session.execute(
+        sa.insert(Break),
+        [
+            {
+                "time_id": time_id,
+                "start": rec["start"] + 3 * 60 * 60,
+                "end": rec["start"] + 4 * 60 * 60,
+                "user_id": user.id,
+            }
+            for time_id, rec in zip(time_ids, times)
+        ],
+    )
+    if leave:
+        db.session.execute(sa.insert(Leave), leave)
+    db.session.commit()
+
+
+@pytest.fixture
+def client(app, user, fake_redis):
+    from flask import session as flask_session
+
+    settings.fetch()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = flask_session["login_session_key"]
+        session["user_id"] = user.id
+    return client
+
+
+def test_month_summaries_match_records(user):
+    _settings = settings.fetch()
+    _add_history(user, date(2023, 11, 20), date(2024, 3, 10))
+
+    months = reports.summaries(_settings, date(2023, 12, 1), date(2024, 2, 29), "month")
+    assert [month.label for month in months] == ["2023-12", "2024-01", "2024-02"]
+
+    for month, (start, end) in zip(
+        months, [("2023-12-01", "2024-01-01"), ("2024-01-01", "2024-02-01"), ("2024-02-01", "2024-03-01")]
+    ):
+        start_ts = arrow.get(start, tzinfo="Europe/London").int_timestamp
+        end_ts = arrow.get(end, tzinfo="Europe/London").int_timestamp - 1
+        times = Time.between(start_ts, end_ts)
+        leave = Leave.between(start_ts, end_ts)
+
+        assert month.worked == sum(rec.logged() for rec in times)
+        assert month.breaks == len(times) * 60 * 60
+        assert month.leave == sum(rec.logged() for rec in leave)
+        assert month.days_worked == len(times)
+
+    quarters = reports.summaries(_settings, date(2023, 12, 1), date(2024, 2, 29), "quarter")
+    assert [quarter.label for quarter in quarters] == ["2023-Q4", "2024-Q1"]
+    assert sum(q.worked for q in quarters) == sum(m.worked for m in months)
+
+
+def test_summaries_include_today(user):
+    _settings = settings.fetch()
+    today = arrow.now("Europe/London").date()
+    _add_history(user, today - timedelta(days=40), today)
+
+    summary = reports.summaries(_settings, today - timedelta(days=40), today, "year")
+    start_ts = arrow.get(today - timedelta(days=40), tzinfo="Europe/London").int_timestamp
+    records = [
+        *Time.between(start_ts, arrow.utcnow().ceil("day").int_timestamp),
+        *Leave.between(start_ts, arrow.utcnow().ceil("day").int_timestamp),
+    ]
+
+    assert sum(year.logged for year in summary) == sum(rec.logged() for rec in records)
+
+
+def test_heatmap(user):
+    _settings = settings.fetch()
+    _add_history(user, date(2024, 1, 1), date(2024, 12, 31))
+
+    weeks = reports.heatmap(_settings, date(2024, 1, 1), date(2024, 12, 31))
+    days = [day for week in weeks for day in week if day]
+
+    assert all(len(week) == 7 for week in weeks)
+    assert len(days) == 366
+    # 1st Jan 2024 was a Monday, which is the start of the week
+    assert weeks[0][0].day == date(2024, 1, 1)
+
+    by_day = {day.day: day for day in days}
+    assert by_day[date(2024, 1, 6)].level == 0
+    # Over 7.5 hours worked
+    assert by_day[date(2024, 1, 2)].level == reports.HEATMAP_LEVELS
+
+
+def test_decade_report_is_fast(client, user):
+    _settings = settings.fetch()
+    today = arrow.now("Europe/London").date()
+    _add_history(user, date(today.year - 10, 1, 1), today - timedelta(days=1))
+
+    # Build the daily totals and compile the templates first, as they would be in use
+    daily_totals.stored_until(_settings, today)
+    client.get(f"/reports/{today.year - 6}")
+
+    started = time.perf_counter()
+    response = client.get(f"/reports/{today.year - 5}")
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    assert "heatmap-level-4" in response.text
+    assert elapsed < 0.1, f"{elapsed * 1000:.0f}ms"
+
+    response = client.get("/reports/all")
+    assert response.status_code == 200
+    assert str(today.year - 10) in response.text
+
+
+@pytest.mark.parametrize("year", [0, 10000, 99999999999])
+def test_out_of_range_year_is_not_found(client, user, year):
+    settings.fetch()
+
+    assert client.get(f"/reports/{year}").status_code == 404
+
+
+@pytest.mark.parametrize("week_start", ["1", "3", "7"])
+@pytest.mark.parametrize("year", [1, 9999])
+def test_first_and_last_years_can_be_shown(client, user, week_start, year):
+    from app.controllers.user.util import forget_user
+
+    settings.fetch()
+    settings.update(week_start=week_start)
+    forget_user()
+
+    response = client.get(f"/reports/{year}")
+    assert response.status_code == 200
+
+    weeks = reports.year_report(year).heatmap
+    assert all(len(week) == 7 for week in weeks)
+    assert weeks[0][(date(year, 1, 1).weekday() - (int(week_start) - 1)) % 7].day == date(year, 1, 1)
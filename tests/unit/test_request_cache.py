@@ -0,0 +1,47 @@
+def test_login_session_is_loaded_once_per_request(app, user, capture_queries):
+    from flask import session as flask_session
+
+    from app.controllers import settings
+    from app.controllers.user.util import forget_user
+
+    # Create the default settings up front
+    settings.fetch()
+
+    # The test client shares this app context, so make the request load everything itself
+    forget_user()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = flask_session["login_session_key"]
+
+    with capture_queries() as queries:
+        response = client.get("/frames/stats")
+
+    assert response.status_code == 200
+    assert len(queries.selecting_from("login_session")) == 1
+    assert len(queries.selecting_from("settings")) == 1
+
+
+def test_settings_update_is_visible_in_same_request(user):
+    from app.controllers import settings
+
+    assert settings.fetch().hours_per_day == 7.5
+
+    settings.update(hours_per_day=6)
+    assert settings.fetch().hours_per_day == 6
+
+
+def test_logout_forgets_user(user):
+    import pytest
+
+    from app.controllers.user import logout
+    from app.controllers.user.exceptions import UserNotLoggedIn
+    from app.controllers.user.util import get_user, is_logged_in
+
+    assert get_user().id == user.id
+
+    logout()
+
+    assert not is_logged_in()
+    with pytest.raises(UserNotLoggedIn):
+        get_user()
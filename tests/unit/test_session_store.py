@@ -0,0 +1,188 @@
+import arrow
+import pytest
+import redis
+import sqlalchemy as sa
+
+from app import db
+from app.models import LoginSession
+
+
+def _client_for(app, key: str):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = key
+    return client
+
+
+def _forget():
+    from app.controllers.user.util import forget_user
+
+    # The test client shares this app context, make each request look the session up again
+    forget_user()
+
+
+def _login(app, store: str):
+    from app.controllers.user import login
+
+    app.config["SESSION_STORE"] = store
+    return login("test@example.com", "test")
+
+
+def test_redis_store(app, fake_redis):
+    from flask import session as flask_session
+
+    from app.controllers.user import logout
+
+    session = _login(app, "redis")
+
+    key = f"login_session:{session.key}"
+    assert fake_redis.hgetall(key) == {
+        b"user_id": str(session.user_id).encode(),
+        b"expires": str(session.expires).encode(),
+    }
+    assert fake_redis.expires[key] == session.expires
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(LoginSession)) == 0
+
+    lookups = []
+    hgetall = fake_redis.hgetall
+    fake_redis.hgetall = lambda key: lookups.append(key) or hgetall(key)
+
+    _forget()
+    client = _client_for(app, session.key)
+    assert client.get("/dash").status_code == 200
+    assert lookups == [key]
+
+    flask_session["login_session_key"] = session.key
+    logout()
+    assert fake_redis.hgetall(key) == {}
+
+
+def test_unknown_session_is_logged_out(app, fake_redis):
+    app.config["SESSION_STORE"] = "redis"
+
+    _forget()
+    assert _client_for(app, "missing").get("/dash").status_code == 302
+
+
+def test_write_through_reads_existing_sessions(app, user, fake_redis):
+    from flask import session as flask_session
+
+    from app.controllers.user.util import get_user
+
+    app.config["SESSION_STORE"] = "write-through"
+    key = flask_session["login_session_key"]
+
+    _forget()
+    assert get_user().id == user.id
+
+    # Copied into redis when it was first read
+    assert fake_redis.hgetall(f"login_session:{key}")[b"user_id"] == str(user.id).encode()
+
+
+def test_write_through_falls_back_to_the_database(app, user, fake_redis, monkeypatch):
+    from app.controllers.user.util import get_user
+
+    def unavailable(key):
+        raise redis.ConnectionError("down")
+
+    monkeypatch.setattr(fake_redis, "hgetall", unavailable)
+    app.config["SESSION_STORE"] = "write-through"
+
+    _forget()
+    assert get_user().id == user.id
+
+
+@pytest.mark.parametrize("store", ["sql", "redis", "write-through"])
+def test_peek_matches_get(app, fake_redis, capture_queries, store):
+    from app.lib.session_store import session_store
+
+    session = _login(app, store)
+
+    with capture_queries() as queries:
+        peeked = session_store().peek(session.key)
+
+    assert peeked == session_store().get(session.key)
+    assert peeked.user is None
+    # Redis has it all, otherwise it's just the two columns
+    assert len(queries) == (0 if store in ("redis", "write-through") else 1)
+    assert all("JOIN" not in statement for statement, _ in queries)
+    assert session_store().peek("missing") is None
+
+
+def test_login_leaves_expired_sessions_for_the_sweeper(app, user):
+    from app.lib.session_store import session_store
+
+    db.session.add(LoginSession(key="expired", expires=arrow.utcnow().shift(days=-1).int_timestamp, user_id=user.id))
+    db.session.commit()
+
+    _login(app, "sql")
+    assert db.session.scalars(sa.select(LoginSession).filter_by(key="expired")).first()
+
+    assert session_store().sweep() == 1
+    assert not db.session.scalars(sa.select(LoginSession).filter_by(key="expired")).first()
+
+
+def test_migrate_to_redis(app, user, fake_redis):
+    from flask import session as flask_session
+
+    from app.lib.session_store import migrate_to_redis
+
+    db.session.add(LoginSession(key="expired", expires=arrow.utcnow().shift(days=-1).int_timestamp, user_id=user.id))
+    db.session.commit()
+
+    assert migrate_to_redis() == 1
+    assert fake_redis.hgetall(f"login_session:{flask_session['login_session_key']}")
+    assert not fake_redis.hgetall("login_session:expired")
+
+
+def test_write_through_login_survives_redis_outage(app, fake_redis, monkeypatch):
+    from app.controllers.user.util import get_user
+
+    def unavailable(*args, **kwargs):
+        raise redis.ConnectionError("down")
+
+    monkeypatch.setattr(fake_redis, "pipeline", unavailable)
+    session = _login(app, "write-through")
+
+    assert db.session.scalars(sa.select(LoginSession).filter_by(key=session.key)).first()
+
+    from flask import session as flask_session
+
+    flask_session["login_session_key"] = session.key
+    _forget()
+    assert get_user().id == session.user_id
+
+
+def test_write_through_logout_needs_redis(app, fake_redis, monkeypatch):
+    from flask import session as flask_session
+
+    from app.controllers.user import logout
+
+    session = _login(app, "write-through")
+    flask_session["login_session_key"] = session.key
+
+    def unavailable(key):
+        raise redis.ConnectionError("down")
+
+    with monkeypatch.context() as m, pytest.raises(redis.ConnectionError):
+        m.setattr(fake_redis, "delete", unavailable)
+        logout()
+
+    # Nothing was revoked, so the session is still consistent in both
+    assert db.session.scalars(sa.select(LoginSession).filter_by(key=session.key)).first()
+    assert fake_redis.hgetall(f"login_session:{session.key}")
+
+    logout()
+    assert not db.session.scalars(sa.select(LoginSession).filter_by(key=session.key)).first()
+    assert not fake_redis.hgetall(f"login_session:{session.key}")
+
+
+def test_stores_must_implement_every_method():
+    from app.lib.session_store import SessionStore
+
+    class Incomplete(SessionStore):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore[abstract]
@@ -0,0 +1,131 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class StubSlack(ThreadingHTTPServer):
+    """
+    A local stand in for the Slack API which records every profile update it receives
+
+    `responses`: Status codes to reply with in order, once used up every request succeeds
+    `delay`: Seconds to wait before replying
+    """
+
+    def __init__(self, responses: list[int] | None = None, delay: float = 0):
+        self.responses = list(responses or [])
+        self.delay = delay
+        self.received: list[tuple[str, dict]] = []
+        super().__init__(("127.0.0.1", 0), StubSlackHandler)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api/users.profile.set"
+
+
+class StubSlackHandler(BaseHTTPRequestHandler):
+    server: StubSlack
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.received.append((self.headers["Authorization"], body["profile"]))
+
+        time.sleep(self.server.delay)
+
+        status = self.server.responses.pop(0) if self.server.responses else 200
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps({"ok": status == 200}).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_slack(request):
+    server = StubSlack(**getattr(request, "param", {}))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+def _updater(app, url: str):
+    with app.app_context():
+        from app.lib.slack import StatusUpdater
+
+    return StatusUpdater(url=url, backoff=0.01, max_attempts=3)
+
+
+def _away(on_break: bool) -> dict:
+    return {"status_text": "Away" if on_break else "", "status_emoji": ":running:" if on_break else ""}
+
+
+def test_update_is_sent(app, stub_slack):
+    updater = _updater(app, stub_slack.url)
+    updater.enqueue("token-1", _away(True))
+
+    assert updater.flush(timeout=5)
+    assert stub_slack.received == [("Bearer token-1", _away(True))]
+
+
+@pytest.mark.parametrize("stub_slack", [{"responses": [500, 429]}], indirect=True)
+def test_failed_update_is_retried(app, stub_slack):
+    updater = _updater(app, stub_slack.url)
+    updater.enqueue("token-1", _away(True))
+
+    assert updater.flush(timeout=5)
+    assert stub_slack.received == [("Bearer token-1", _away(True))] * 3
+
+
+@pytest.mark.parametrize("stub_slack", [{"responses": [500] * 5}], indirect=True)
+def test_update_is_given_up_on(app, stub_slack):
+    updater = _updater(app, stub_slack.url)
+    updater.enqueue("token-1", _away(True))
+
+    assert updater.flush(timeout=5)
+    assert len(stub_slack.received) == 3
+
+
+@pytest.mark.parametrize("stub_slack", [{"delay": 0.2}], indirect=True)
+def test_rapid_toggles_are_coalesced(app, stub_slack):
+    updater = _updater(app, stub_slack.url)
+
+    # The first update goes out straight away, the rest queue up behind it and only the last is sent
+    updater.enqueue("token-1", _away(True))
+    time.sleep(0.05)
+    for on_break in (False, True, False):
+        updater.enqueue("token-1", _away(on_break))
+
+    # Other tokens aren't held up
+    updater.enqueue("token-2", _away(True))
+
+    assert updater.flush(timeout=5)
+    assert [p for t, p in stub_slack.received if t == "Bearer token-1"] == [_away(True), _away(False)]
+    assert [p for t, p in stub_slack.received if t == "Bearer token-2"] == [_away(True)]
+
+
+def test_unexpected_errors_dont_stop_the_worker(app, stub_slack, monkeypatch):
+    updater = _updater(app, stub_slack.url)
+    updater.workers = 1
+
+    send = updater._send
+    calls = []
+
+    def broken_once(token, profile):
+        calls.append(token)
+        if len(calls) == 1:
+            raise ValueError("unexpected")
+        return send(token, profile)
+
+    monkeypatch.setattr(updater, "_send", broken_once)
+
+    updater.enqueue("token-1", _away(True))
+    assert updater.flush(timeout=5)
+
+    # The failed update isn't retried, but the token isn't left in flight and the thread is still running
+    updater.enqueue("token-1", _away(False))
+    assert updater.flush(timeout=5)
+    assert stub_slack.received == [("Bearer token-1", _away(False))]
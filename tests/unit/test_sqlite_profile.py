@@ -0,0 +1,47 @@
+import sqlalchemy as sa
+
+from app.lib.sqlite import DEFAULT_PRAGMAS, apply_pragmas
+
+
+def test_pragmas_are_applied(app):
+    from app import db
+
+    with db.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+        assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+
+
+def test_pragmas_can_be_overridden():
+    from app.lib.sqlite import pragmas_for
+
+    pragmas = pragmas_for({"SQLITE_PRAGMAS": {"busy_timeout": 100, "mmap_size": None}})
+
+    assert pragmas["busy_timeout"] == 100
+    assert "mmap_size" not in pragmas
+    assert pragmas["journal_mode"] == "WAL"
+
+
+def test_optimize_truncates_wal(app):
+    from app import db
+    from app.lib.sqlite import optimize
+
+    result = app.test_cli_runner().invoke(args=["data", "optimize"])
+    assert result.exit_code == 0, result.output
+
+    assert optimize(db.engine, analyze=True) == (0, 0, 0)
+
+
+def test_profile_is_applied_to_every_connection(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'profile.db'}", pool_size=2)
+    apply_pragmas(engine, DEFAULT_PRAGMAS)
+
+    try:
+        with engine.connect() as first, engine.connect() as second:
+            for conn in (first, second):
+                assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+                assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+                assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+    finally:
+        engine.dispose()
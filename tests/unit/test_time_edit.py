@@ -0,0 +1,85 @@
+import arrow
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.models import Break, Time
+
+
+@pytest.fixture
+def entry(user):
+    from app.controllers import settings
+
+    settings.fetch()
+
+    start = arrow.get("2024-03-04T09:00:00", tzinfo="Europe/London")
+    t = Time(start=start.int_timestamp, end=start.shift(hours=8).int_timestamp, user_id=user.id)
+    for i in range(20):
+        brk_start = start.shift(minutes=i * 20)
+        t.breaks.append(
+            Break(start=brk_start.int_timestamp, end=brk_start.shift(minutes=5).int_timestamp, user_id=user.id)
+        )
+    db.session.add(t)
+    db.session.commit()
+
+    return t
+
+
+def test_edit_with_20_breaks_is_batched(entry, capture_queries):
+    from app.controllers import time
+    from app.controllers.user.util import get_user
+
+    breaks = {
+        brk.id: {"start": f"2024-03-04 10:{i:02}", "end": f"2024-03-04 10:{i + 1:02}"}
+        for i, brk in enumerate(entry.breaks)
+    }
+    new_breaks = [(f"2024-03-04 15:{i:02}", f"2024-03-04 15:{i + 1:02}") for i in range(20)]
+
+    # Only count the statements for the edit itself
+    assert get_user().id == entry.user_id
+
+    with capture_queries() as statements:
+        time.update(
+            str(entry.id),
+            start="2024-03-04 08:30",
+            end="2024-03-04 17:00",
+            note="edited",
+            breaks=breaks,
+            new_breaks=new_breaks,
+        )
+
+    # Load the settings, the record and its breaks, clear the daily totals, update the record,
+    # update the breaks and insert the new breaks, however many breaks there are
+    assert len(statements) == 7, statements
+
+    t = db.session.scalars(sa.select(Time).filter_by(id=entry.id)).one()
+    assert t.note == "edited"
+    assert len(t.breaks) == 40
+    assert sorted(brk.end - brk.start for brk in t.breaks) == [60] * 20 + [60] * 20
+
+
+def test_cannot_edit_another_users_breaks(entry):
+    from werkzeug.exceptions import Forbidden
+
+    from app.controllers import time
+    from app.models import User
+
+    other = User(email="other@example.com")
+    db.session.add(other)
+    db.session.flush()
+
+    other_time = Time(start=entry.start, user_id=other.id)
+    other_time.breaks.append(Break(start=entry.start, user_id=other.id))
+    db.session.add(other_time)
+    db.session.commit()
+
+    other_break_id = other_time.breaks[0].id
+
+    with pytest.raises(Forbidden):
+        time.update(str(entry.id), start="2024-03-04 09:00", breaks={other_break_id: {"note": "mine now"}})
+
+    with pytest.raises(Forbidden):
+        time.bulk_update(table="break", data={other_break_id: {"note": "mine now"}})
+
+    db.session.rollback()
+    assert db.session.get(Break, other_break_id).note is None
@@ -0,0 +1,118 @@
+import json
+import logging
+import re
+
+import pytest
+
+
+@pytest.fixture
+def client(app, user, fake_redis):
+    from flask import session as flask_session
+
+    from app.controllers import settings
+
+    settings.fetch()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = flask_session["login_session_key"]
+    return client
+
+
+@pytest.fixture
+def timings(app):
+    from flask import g
+
+    from app.lib.timing import RequestTimings
+
+    g._timings = RequestTimings()
+    yield g._timings
+    g.pop("_timings")
+
+
+def _metrics(header: str) -> dict[str, dict[str, str]]:
+    metrics = {}
+    for metric in header.split(", "):
+        name, *params = metric.split(";")
+        metrics[name] = dict(re.match(r'(\w+)="?([^"]*)"?', param).groups() for param in params)
+    return metrics
+
+
+def test_server_timing_header(app, client, capture_queries):
+    app.config["SERVER_TIMING"] = True
+
+    with capture_queries() as queries:
+        response = client.get("/frames/stats")
+
+    metrics = _metrics(response.headers["Server-Timing"])
+
+    assert metrics["db"]["desc"] == f"{len(queries)} queries"
+    assert metrics["render"]["desc"] == "1 templates"
+    assert float(metrics["total"]["dur"]) >= float(metrics["render"]["dur"])
+
+
+def test_server_timing_is_off_outside_debug(app, client):
+    assert "Server-Timing" not in client.get("/frames/stats").headers
+
+    app.debug = True
+    assert "Server-Timing" in client.get("/frames/stats").headers
+
+    app.config["SERVER_TIMING"] = False
+    assert "Server-Timing" not in client.get("/frames/stats").headers
+
+
+def test_slow_request_log(app, client, caplog):
+    app.config["SLOW_REQUEST_MS"] = 0
+
+    with caplog.at_level(logging.WARNING, logger="app.lib.timing"):
+        client.get("/frames/stats")
+
+    [line] = [record.getMessage() for record in caplog.records if record.name == "app.lib.timing"]
+    fields = json.loads(line.removeprefix("Slow request "))
+
+    assert fields["path"] == "/frames/stats"
+    assert fields["status"] == 200
+    assert fields["db_count"] > 0
+    assert fields["render_count"] == 1
+
+
+def test_redis_commands_are_timed(timings):
+    from app.lib.timing import instrument_redis
+
+    class Client:
+        def execute_command(self, *args):
+            return "OK"
+
+        def pipeline(self):
+            return Pipeline()
+
+    class Pipeline:
+        def execute(self):
+            return []
+
+    client = instrument_redis(Client())  # type: ignore[arg-type]
+    client.execute_command("GET", "key")
+    client.pipeline().execute()
+
+    assert timings.counts["redis"] == 2
+
+
+def test_http_requests_are_timed(timings):
+    import requests
+    from requests.adapters import BaseAdapter
+
+    class StubAdapter(BaseAdapter):
+        def send(self, request, **kwargs):
+            response = requests.Response()
+            response.status_code = 200
+            response.request = request
+            return response
+
+        def close(self):
+            pass
+
+    session = requests.Session()
+    session.mount("https://", StubAdapter())
+    session.get("https://slack.com/api/test")
+
+    assert timings.counts["http"] == 1
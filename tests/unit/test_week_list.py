@@ -0,0 +1,85 @@
+import arrow
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.controllers import core, settings
+from app.models import Leave, Time
+
+
+def _add_weeks(user, weeks_ago: list[int]):
+    """
+    Add a day of work on the Tuesday of each of the given weeks
+    """
+    tuesday = arrow.now("Europe/London").floor("week").shift(days=1, hours=9)
+    for weeks in weeks_ago:
+        start = tuesday.shift(weeks=-weeks)
+        db.session.add(Time(start=start.int_timestamp, end=start.shift(hours=8).int_timestamp, user_id=user.id))
+    db.session.commit()
+
+
+def _loop_week_list(first: arrow.Arrow, week_start_0: int) -> list[str]:
+    """
+    The week list built a week at a time, as it used to be
+    """
+    while first.weekday() > week_start_0:
+        first = first.shift(days=-1)
+
+    weeks = []
+    while first.date() <= arrow.now("Europe/London").date():
+        weeks.append(first.format("W").rsplit("-", 1)[0])
+        first = first.shift(weeks=1)
+    return list(reversed(weeks))
+
+
+@pytest.mark.parametrize("week_start", [1, 3, 7])
+def test_week_list_matches_loop(user, fake_redis, week_start):
+    settings.fetch()
+    settings.update(week_start=week_start)
+    _add_weeks(user, [300, 2])
+
+    first = db.session.scalar(sa.select(sa.func.min(Time.start)))
+    expected = _loop_week_list(arrow.get(first).to("Europe/London"), settings.fetch().week_start_0)
+
+    weeks = core.week_list()
+    assert weeks == expected
+    assert [core.weeks_ago(week) for week in weeks] == list(range(len(weeks)))
+
+
+def test_week_list_pages(user, fake_redis):
+    _add_weeks(user, [120])
+
+    weeks = core.week_list()
+    assert len(weeks) == 121
+    assert core.week_list(offset=0, limit=52) == weeks[:52]
+    assert core.week_list(offset=104, limit=52) == weeks[104:]
+
+
+def test_weeks_with_data_only(user, fake_redis):
+    _add_weeks(user, [30, 10, 9, 1])
+    leave = arrow.now("Europe/London").floor("week").shift(weeks=-5, days=2)
+    db.session.add(Leave(leave_type="annual", start=leave.int_timestamp, duration=1, user_id=user.id))
+    db.session.commit()
+
+    weeks = core.week_list(with_data_only=True)
+    assert [core.weeks_ago(week) for week in weeks] == [0, 1, 5, 9, 10, 30]
+
+
+def test_week_picker_loads_more(app, user, fake_redis):
+    from flask import session as flask_session
+
+    _add_weeks(user, [60])
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["login_session_key"] = flask_session["login_session_key"]
+        session["user_id"] = user.id
+
+    response = client.get("/dash")
+    assert response.text.count("<option") == core.WEEK_LIST_PAGE_SIZE + 1
+    assert f'data-more="{core.WEEK_LIST_PAGE_SIZE}"' in response.text
+
+    response = client.get(f"/frames/week_options?offset={core.WEEK_LIST_PAGE_SIZE}")
+    assert response.text.count("<option") == 61 - core.WEEK_LIST_PAGE_SIZE
+    assert "60 weeks ago" in response.text
+    assert "data-more" not in response.text
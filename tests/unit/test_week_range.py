@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+
+import arrow
+import pytest
+
+from app import db
+from app.lib.util.week import current_week_key, resolve_week
+from app.models import Break, Leave, Time
+
+
+def _loop_week_start(week: str, week_start_0: int, today: date) -> arrow.Arrow:
+    """
+    The start of the week as it used to be worked out, in UTC
+    """
+    week_start = arrow.get(week)
+    if week_start_0 > 0:
+        week_start = week_start.shift(weekday=week_start_0)
+        if week_start_0 > today.weekday():
+            week_start = week_start.shift(weeks=-1)
+    return week_start
+
+
+@pytest.mark.parametrize("week_start_0", range(7))
+def test_resolve_week_matches_old_logic(week_start_0):
+    for offset in range(0, 400, 3):
+        today = date(2024, 1, 1) + timedelta(days=offset)
+        for week in (current_week_key(week_start_0, today), "2024-W01", "2024-W13", "2024-W44"):
+            expected = _loop_week_start(week, week_start_0, today)
+            week_range = resolve_week(week, week_start_0, "UTC", today)
+
+            assert week_range.start == expected.int_timestamp
+            assert week_range.end == expected.shift(days=7).int_timestamp
+
+        # The current week always contains today
+        current = resolve_week(None, week_start_0, "UTC", today)
+        assert current.start <= arrow.get(today).int_timestamp < current.end
+
+
+def test_resolve_week_is_local():
+    # The clocks went forward on the 31st of March 2024
+    week_range = resolve_week("2024-W13", 0, "Europe/London", date(2024, 4, 1))
+
+    assert arrow.get(week_range.start).to("Europe/London").format("YYYY-MM-DD HH:mm") == "2024-03-25 00:00"
+    assert arrow.get(week_range.end).to("Europe/London").format("YYYY-MM-DD HH:mm") == "2024-04-01 00:00"
+    assert week_range.end - week_range.start == 7 * 24 * 60 * 60 - 60 * 60
+
+
+def test_records_for_week(user, capture_queries):
+    from app.controllers import core, settings
+
+    settings.fetch()
+
+    week_start = arrow.now("Europe/London").floor("week")
+    for day in range(5):
+        clock_in = week_start.shift(days=day, hours=9)
+        if day == 2:
+            db.session.add(Leave(leave_type="annual", start=clock_in.int_timestamp, duration=1, user_id=user.id))
+            continue
+
+        t = Time(start=clock_in.int_timestamp, end=clock_in.shift(hours=8).int_timestamp, user_id=user.id)
+        t.breaks.append(
+            Break(
+                start=clock_in.shift(hours=3).int_timestamp, end=clock_in.shift(hours=4).int_timestamp, user_id=user.id
+            )
+        )
+        db.session.add(t)
+
+    # And one from last week
+    db.session.add(Time(start=week_start.shift(days=-1).int_timestamp, end=week_start.int_timestamp, user_id=user.id))
+    db.session.commit()
+    # Records already in the session are reused, the user is reloaded first so it isn't counted
+    db.session.expire_all()
+    db.session.refresh(user)
+
+    with capture_queries() as queries:
+        records = core.records_for_week()
+        logged = [rec.logged() for rec in records]
+
+    # The records are loaded as they are in the database, with nothing to write back
+    assert not db.session.dirty
+
+    # The time records, the leave records and all the breaks
+    history = queries.selecting_from("time", "leave", "break")
+    assert len(history) == 3, history
+
+    # Only this week's, most recent first
+    assert [type(rec) for rec in records] == [Time, Time, Leave, Time, Time]
+    assert [rec.start for rec in records] == sorted((rec.start for rec in records), reverse=True)
+    assert logged == [7 * 60 * 60, 7 * 60 * 60, 7.5 * 60 * 60, 7 * 60 * 60, 7 * 60 * 60]